@@ -25,7 +25,7 @@ config.set_main_option("sqlalchemy.url", os.getenv("DATABASE_URL", "sqlite:///./
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
     fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
@@ -69,6 +69,14 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # connection ที่ส่งมาจากโค้ด (schema_bootstrap) ใช้ต่อเลย ผู้เรียกเป็นคน commit
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -0,0 +1,41 @@
+"""Add lookup indexes and unique constraints
+
+Revision ID: 7c2d4e9a1b3f
+Revises: 0611e9753669
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d4e9a1b3f'
+down_revision: Union[str, Sequence[str], None] = '0611e9753669'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_assignments_course_id'), 'assignments', ['course_id'], unique=False)
+    op.create_index(op.f('ix_courses_status'), 'courses', ['status'], unique=False)
+    op.create_index('ix_modules_course_published_order', 'modules', ['course_id', 'is_published', 'order_index'], unique=False)
+    # batch mode so SQLite (no ALTER ... ADD CONSTRAINT) rebuilds the table
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.create_unique_constraint('uq_submissions_assignment_student', ['assignment_id', 'student_id'])
+    with op.batch_alter_table('enrollments') as batch_op:
+        batch_op.create_unique_constraint('uq_enrollments_user_course', ['user_id', 'course_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('enrollments') as batch_op:
+        batch_op.drop_constraint('uq_enrollments_user_course', type_='unique')
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_constraint('uq_submissions_assignment_student', type_='unique')
+    op.drop_index('ix_modules_course_published_order', table_name='modules')
+    op.drop_index(op.f('ix_courses_status'), table_name='courses')
+    op.drop_index(op.f('ix_assignments_course_id'), table_name='assignments')
@@ -0,0 +1,30 @@
+"""Add file blob last referenced at
+
+Revision ID: 7e9ab731883b
+Revises: fc1831bf9d82
+Create Date: 2026-10-17 19:51:54.193032
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e9ab731883b'
+down_revision: Union[str, Sequence[str], None] = 'fc1831bf9d82'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows stay NULL: the upload GC falls back to created_at
+    op.add_column('file_blobs', sa.Column('last_referenced_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('file_blobs') as batch_op:
+        batch_op.drop_column('last_referenced_at')
@@ -0,0 +1,52 @@
+"""Add storage usage counters
+
+Revision ID: 81643098eb22
+Revises: e9b2f6a4c718
+Create Date: 2026-10-17 19:08:08.561998
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '81643098eb22'
+down_revision: Union[str, Sequence[str], None] = 'e9b2f6a4c718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('storage_used_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('submissions', sa.Column('file_size', sa.BigInteger(), nullable=True))
+    op.add_column('users', sa.Column('storage_used_bytes', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Backfill from blob sizes; legacy files are counted by migrate_upload_layout.py once their size is known
+    op.execute(
+        "UPDATE submissions SET file_size = "
+        "(SELECT size FROM file_blobs WHERE file_blobs.sha256 = submissions.blob_sha256) "
+        "WHERE blob_sha256 IS NOT NULL"
+    )
+    op.execute(
+        "UPDATE users SET storage_used_bytes = "
+        "(SELECT COALESCE(SUM(file_size), 0) FROM submissions WHERE submissions.student_id = users.id)"
+    )
+    op.execute(
+        "UPDATE courses SET storage_used_bytes = "
+        "(SELECT COALESCE(SUM(submissions.file_size), 0) FROM submissions "
+        "JOIN assignments ON assignments.id = submissions.assignment_id "
+        "WHERE assignments.course_id = courses.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('storage_used_bytes')
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('file_size')
+    with op.batch_alter_table('courses') as batch_op:
+        batch_op.drop_column('storage_used_bytes')
@@ -0,0 +1,29 @@
+"""Add user token version
+
+Revision ID: b5e81f6d2a90
+Revises: 7c2d4e9a1b3f
+Create Date: 2026-10-17 13:40:02.517933
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e81f6d2a90'
+down_revision: Union[str, Sequence[str], None] = '7c2d4e9a1b3f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
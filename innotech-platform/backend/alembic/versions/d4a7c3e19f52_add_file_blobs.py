@@ -0,0 +1,44 @@
+"""Add content-addressed file blobs
+
+Revision ID: d4a7c3e19f52
+Revises: b5e81f6d2a90
+Create Date: 2026-10-17 15:21:37.804126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a7c3e19f52'
+down_revision: Union[str, Sequence[str], None] = 'b5e81f6d2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('file_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('storage_path', sa.String(length=500), nullable=False),
+    sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    # batch mode so SQLite (no ALTER ... ADD CONSTRAINT) rebuilds the table
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_submissions_blob_sha256'), ['blob_sha256'], unique=False)
+        batch_op.create_foreign_key('fk_submissions_blob_sha256_file_blobs', 'file_blobs', ['blob_sha256'], ['sha256'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_constraint('fk_submissions_blob_sha256_file_blobs', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_submissions_blob_sha256'))
+        batch_op.drop_column('blob_sha256')
+    op.drop_table('file_blobs')
@@ -0,0 +1,30 @@
+"""Add submission content type
+
+Revision ID: fc1831bf9d82
+Revises: 81643098eb22
+Create Date: 2026-10-17 19:12:18.122469
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fc1831bf9d82'
+down_revision: Union[str, Sequence[str], None] = '81643098eb22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows stay NULL: downloads fall back to guessing from the file name
+    op.add_column('submissions', sa.Column('content_type', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('content_type')
@@ -1,28 +1,171 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Optional, Union
+from datetime import datetime, timedelta, timezone
+import uuid
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.user import User, UserRole
+from ..models.file_blob import FileBlob
 from ..models.course import Course
 from ..models.assignment import Assignment, Submission, SubmissionStatus
+from ..models.upload_session import UploadSession
 from ..schemas.assignment import (
-    AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentWithSubmissions,
-    SubmissionCreate, SubmissionUpdate, SubmissionResponse, SubmissionWithAssignment
+    AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentSummary, AssignmentWithSubmissions,
+    SubmissionCreate, SubmissionUpdate, SubmissionResponse, SubmissionWithAssignment,
+    UploadUrlRequest, UploadUrlResponse, DownloadUrlResponse,
+    UploadSessionCreate, UploadSessionResponse, UploadSessionComplete
 )
-from ..utils.auth import get_current_user
-from ..utils.file_handler import save_submission_file, delete_submission_file
+from ..utils.auth import Principal, get_current_user, get_current_principal
+from ..utils.file_handler import (
+    save_submission_file,
+    release_submission_statements,
+    submission_usage_query,
+    presign_submission_upload,
+    register_uploaded_file,
+    submission_download_url,
+    store_file,
+    validate_file_name,
+    MAX_FILE_SIZE,
+    get_storage,
+    submission_storage_key,
+)
+from ..utils.archive import ArchiveEntry, stream_zip
+from ..utils.chunked_upload import (
+    UPLOAD_SESSION_CHUNK_SIZE,
+    UPLOAD_SESSION_TTL_HOURS,
+    assemble_chunks,
+    discard_staging,
+    ensure_resumable_uploads,
+    session_status,
+    write_chunk,
+)
+from ..utils.quota import check_storage_quota
+from ..utils.storage import PRESIGNED_URL_EXPIRE_SECONDS
+from ..schemas.pagination import Page
+from ..utils.loaders import loader_profile
+from ..utils.pagination import paginate, page_response
 
 router = APIRouter(prefix="/assignments", tags=["assignments"])
 
+def assignments_with_counts(schema=AssignmentResponse):
+    """select Assignment พร้อม submissions_count ในคิวรีเดียว (correlated subquery ใช้ index ของ submissions)"""
+    submissions_count = (
+        select(func.count(Submission.id))
+        .where(Submission.assignment_id == Assignment.id)
+        .correlate(Assignment)
+        .scalar_subquery()
+    )
+    return (
+        select(Assignment, submissions_count.label("submissions_count"))
+        .options(*loader_profile(Assignment, schema))
+    )
+
+async def fetch_assignments(db: AsyncSession, query) -> List[Assignment]:
+    """รันคิวรีจาก assignments_with_counts() แล้วใส่ submissions_count ให้แต่ละ assignment"""
+    rows = (await db.execute(query)).all()
+    for assignment, submissions_count in rows:
+        assignment.submissions_count = submissions_count
+    return [assignment for assignment, _ in rows]
+
+async def fetch_assignment(db: AsyncSession, assignment_id: int) -> Optional[Assignment]:
+    """โหลด assignment เดียวพร้อม submissions_count"""
+    query = (
+        assignments_with_counts()
+        .where(Assignment.id == assignment_id)
+        .execution_options(populate_existing=True)
+    )
+    assignments = await fetch_assignments(db, query)
+    return assignments[0] if assignments else None
+
+async def _load_submission(db: AsyncSession, submission_id: int) -> Optional[Submission]:
+    """โหลด submission พร้อม relationship ที่ response ต้องใช้ (AsyncSession lazy-load ไม่ได้)"""
+    query = (
+        select(Submission)
+        .options(*loader_profile(Submission, SubmissionResponse))
+        .where(Submission.id == submission_id)
+        .execution_options(populate_existing=True)
+    )
+    return await db.scalar(query)
+
+async def ensure_can_view_submission(
+    db: AsyncSession, submission: Submission, course_id: int, current_user: Principal
+) -> None:
+    """นักเรียนดูได้เฉพาะของตัวเอง trainer ดูได้เฉพาะหลักสูตรของตัวเอง admin ดูได้ทั้งหมด"""
+    if current_user.role == UserRole.STUDENT and submission.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view your own submissions"
+        )
+    elif current_user.role == UserRole.TRAINER:
+        course = await db.scalar(select(Course).where(Course.id == course_id))
+        if course.instructor_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only view submissions for your own courses"
+            )
+
+async def ensure_can_submit(db: AsyncSession, assignment_id: int, current_user: Principal) -> Optional[int]:
+    """เฉพาะนักเรียน, assignment ต้องมีอยู่ และยังไม่เคยส่ง คืน course_id (สำหรับโควตา)"""
+    if current_user.role != UserRole.STUDENT:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only students can submit assignments"
+        )
+    
+    assignment = (await db.execute(
+        select(Assignment.id, Assignment.course_id).where(Assignment.id == assignment_id)
+    )).first()
+    if not assignment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    
+    # ตรวจสอบว่าส่งงานแล้วหรือยัง
+    existing_submission = await db.scalar(
+        select(Submission.id).where(
+            Submission.assignment_id == assignment_id,
+            Submission.student_id == current_user.id
+        ).limit(1)
+    )
+    
+    if existing_submission:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already submitted this assignment"
+        )
+    return assignment.course_id
+
+async def commit_submission(db: AsyncSession, db_submission: Submission) -> Submission:
+    """บันทึก submission ใหม่ (รวมการเปลี่ยนแปลงอื่นใน transaction เช่น ref_count ของ blob)"""
+    db.add(db_submission)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # ส่งพร้อมกันสองครั้ง: unique constraint (assignment_id, student_id) กันไว้
+        # rollback ยกเลิกการเพิ่ม ref_count ด้วย ไฟล์ที่เพิ่งเขียนจะถูก GC เก็บ
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already submitted this assignment"
+        )
+    
+    return await _load_submission(db, db_submission.id)
+
 # Assignment Management Endpoints
 
 @router.post("/", response_model=AssignmentResponse)
 async def create_assignment(
     assignment: AssignmentCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """สร้างงานที่มอบหมาย (สำหรับ trainer และ admin เท่านั้น)"""
     if current_user.role not in [UserRole.TRAINER, UserRole.ADMIN]:
@@ -32,7 +175,7 @@ async def create_assignment(
         )
     
     # ตรวจสอบว่ามีหลักสูตรนี้อยู่จริง
-    course = db.query(Course).filter(Course.id == assignment.course_id).first()
+    course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -48,54 +191,47 @@ async def create_assignment(
     
     db_assignment = Assignment(**assignment.model_dump())
     db.add(db_assignment)
-    db.commit()
-    db.refresh(db_assignment)
+    await db.commit()
     
-    # Add submissions_count
-    db_assignment.submissions_count = 0
-    
-    return db_assignment
+    return await fetch_assignment(db, db_assignment.id)
 
-@router.get("/", response_model=List[AssignmentResponse])
+@router.get("/", response_model=Union[List[AssignmentSummary], Page[AssignmentSummary]])
 async def get_assignments(
     course_id: Optional[int] = None,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """ดูรายการงานที่มอบหมาย"""
-    query = db.query(Assignment)
+    """ดูรายการงานที่มอบหมาย
+
+    ส่ง cursor (ค่าว่างสำหรับหน้าแรก) เพื่อรับผลแบบ {items, next_cursor}
+    """
+    query = assignments_with_counts(AssignmentSummary)
     
     if course_id:
-        query = query.filter(Assignment.course_id == course_id)
+        query = query.where(Assignment.course_id == course_id)
         
         # ตรวจสอบว่าผู้ใช้มีสิทธิ์เข้าถึงหลักสูตรนี้
-        course = db.query(Course).filter(Course.id == course_id).first()
+        course = await db.scalar(select(Course).where(Course.id == course_id))
         if not course:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Course not found"
             )
     
-    assignments = query.offset(skip).limit(limit).all()
-    
-    # Add submissions count for each assignment
-    for assignment in assignments:
-        assignment.submissions_count = db.query(Submission).filter(
-            Submission.assignment_id == assignment.id
-        ).count()
-    
-    return assignments
+    assignments = await fetch_assignments(db, paginate(query, Assignment.id, skip, limit, cursor))
+    return page_response(assignments, limit, cursor)
 
 @router.get("/{assignment_id}", response_model=AssignmentWithSubmissions)
 async def get_assignment(
     assignment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """ดูรายละเอียดงานที่มอบหมาย"""
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    assignment = await fetch_assignment(db, assignment_id)
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -104,31 +240,41 @@ async def get_assignment(
     
     # ดูรายการ submissions (เฉพาะ trainer/admin ที่เป็นเจ้าของหลักสูตร)
     if current_user.role in [UserRole.TRAINER, UserRole.ADMIN]:
-        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
         if current_user.role == UserRole.TRAINER and course.instructor_id != current_user.id:
             # ถ้าเป็น trainer แต่ไม่ใช่เจ้าของหลักสูตร ให้ดู assignment เฉยๆ
-            assignment.submissions = []
+            submissions = []
         else:
             # ดูได้ทุก submissions
-            submissions = db.query(Submission).filter(Submission.assignment_id == assignment_id).all()
-            assignment.submissions = submissions
+            submissions = (await db.scalars(
+                select(Submission)
+                .options(*loader_profile(Submission, SubmissionResponse))
+                .where(Submission.assignment_id == assignment_id)
+            )).all()
     else:
         # ถ้าเป็น student ให้ดูเฉพาะ submission ของตัวเอง
-        user_submission = db.query(Submission).filter(
-            Submission.assignment_id == assignment_id,
-            Submission.student_id == current_user.id
-        ).first()
-        assignment.submissions = [user_submission] if user_submission else []
+        user_submission = await db.scalar(
+            select(Submission)
+            .options(*loader_profile(Submission, SubmissionResponse))
+            .where(
+                Submission.assignment_id == assignment_id,
+                Submission.student_id == current_user.id
+            )
+            .limit(1)
+        )
+        submissions = [user_submission] if user_submission else []
     
-    assignment.submissions_count = len(assignment.submissions)
+    # ใส่ค่าแบบ committed เพื่อไม่ให้ถือเป็นการแก้ไข collection (และไม่ trigger lazy-load)
+    set_committed_value(assignment, "submissions", list(submissions))
+    assignment.submissions_count = len(submissions)
     return assignment
 
 @router.put("/{assignment_id}", response_model=AssignmentResponse)
 async def update_assignment(
     assignment_id: int,
     assignment_update: AssignmentUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """แก้ไขงานที่มอบหมาย"""
     if current_user.role not in [UserRole.TRAINER, UserRole.ADMIN]:
@@ -137,7 +283,7 @@ async def update_assignment(
             detail="Only trainers and admins can update assignments"
         )
     
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    assignment = await db.scalar(select(Assignment).where(Assignment.id == assignment_id))
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -146,7 +292,7 @@ async def update_assignment(
     
     # ตรวจสอบสิทธิ์
     if current_user.role == UserRole.TRAINER:
-        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
         if course.instructor_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -159,20 +305,15 @@ async def update_assignment(
         setattr(assignment, field, value)
     
     assignment.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(assignment)
-    
-    assignment.submissions_count = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id
-    ).count()
+    await db.commit()
     
-    return assignment
+    return await fetch_assignment(db, assignment_id)
 
 @router.delete("/{assignment_id}")
 async def delete_assignment(
     assignment_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """ลบงานที่มอบหมาย"""
     if current_user.role not in [UserRole.TRAINER, UserRole.ADMIN]:
@@ -181,7 +322,11 @@ async def delete_assignment(
             detail="Only trainers and admins can delete assignments"
         )
     
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    assignment = await db.scalar(
+        select(Assignment)
+        .options(selectinload(Assignment.submissions))  # cascade delete ต้องรู้จัก submissions ทั้งหมด
+        .where(Assignment.id == assignment_id)
+    )
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -190,15 +335,18 @@ async def delete_assignment(
     
     # ตรวจสอบสิทธิ์
     if current_user.role == UserRole.TRAINER:
-        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
         if course.instructor_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only delete assignments for your own courses"
             )
     
-    db.delete(assignment)
-    db.commit()
+    usages = await db.execute(submission_usage_query(Submission.assignment_id == assignment_id))
+    for statement in release_submission_statements(usages):
+        await db.execute(statement)
+    await db.delete(assignment)
+    await db.commit()
     
     return {"message": "Assignment deleted successfully"}
 
@@ -209,49 +357,49 @@ async def create_submission(
     assignment_id: int,
     content: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    upload_sha256: str = Form(None),
+    upload_file_name: str = Form(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
-    """ส่งงาน"""
-    if current_user.role != UserRole.STUDENT:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only students can submit assignments"
-        )
-    
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
-    if not assignment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Assignment not found"
-        )
-    
-    # ตรวจสอบว่าส่งงานแล้วหรือยัง
-    existing_submission = db.query(Submission).filter(
-        Submission.assignment_id == assignment_id,
-        Submission.student_id == current_user.id
-    ).first()
-    
-    if existing_submission:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have already submitted this assignment"
-        )
+    """ส่งงาน
+
+    ไฟล์ส่งมาได้สองแบบ: แนบ file มากับคำขอ หรืออัปโหลดตรงไปที่ storage ผ่าน
+    /submissions/upload-url ก่อน แล้วส่ง upload_sha256 + upload_file_name มาแทน
+    ขนาดไฟล์ที่วัดได้ถูกนับเข้าโควตาของผู้ใช้และหลักสูตรใน transaction เดียวกับ submission
+    """
+    course_id = await ensure_can_submit(db, assignment_id, current_user)
     
     # ตรวจสอบว่ามี content หรือ file
-    if not content and not file:
+    if not content and not file and not upload_sha256:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Please provide either content or file"
         )
     
     # จัดการไฟล์
-    file_url = None
+    saved_file = None
     file_name = None
     if file:
         file_name = file.filename
         try:
-            file_url, file_path = save_submission_file(file, assignment_id, current_user.id)
+            saved_file = await save_submission_file(db, file, (current_user.id, course_id))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to upload file: {str(e)}"
+            )
+    elif upload_sha256:
+        if not upload_file_name:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="upload_file_name is required with upload_sha256"
+            )
+        file_name = upload_file_name
+        try:
+            saved_file = await register_uploaded_file(db, current_user.id, upload_sha256, upload_file_name, course_id)
         except HTTPException as e:
             raise e
         except Exception as e:
@@ -264,60 +412,292 @@ async def create_submission(
         assignment_id=assignment_id,
         student_id=current_user.id,
         content=content,
-        file_url=file_url,
+        file_url=saved_file.file_url if saved_file else None,
+        blob_sha256=saved_file.sha256 if saved_file else None,
         file_name=file_name,
+        file_size=saved_file.size if saved_file else None,
+        content_type=saved_file.content_type if saved_file else None,
         status=SubmissionStatus.SUBMITTED
     )
     
-    db.add(db_submission)
-    db.commit()
-    db.refresh(db_submission)
+    return await commit_submission(db, db_submission)
+
+@router.post("/{assignment_id}/submissions/upload-url", response_model=UploadUrlResponse)
+async def create_submission_upload_url(
+    assignment_id: int,
+    upload: UploadUrlRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """ขอ presigned URL เพื่ออัปโหลดไฟล์ตรงไปที่ storage (ไม่ผ่าน API)"""
+    course_id = await ensure_can_submit(db, assignment_id, current_user)
+    await check_storage_quota(db, current_user.id, course_id, upload.size)
+    
+    return await presign_submission_upload(db, current_user.id, upload.file_name, upload.size, upload.sha256)
+
+# Resumable Upload Endpoints
+
+async def _get_upload_session(db: AsyncSession, upload_id: str, current_user: Principal) -> UploadSession:
+    """session ที่ยังไม่หมดอายุของผู้ใช้คนนี้ (ของคนอื่นตอบ 404 เหมือนไม่มี)"""
+    session = await db.get(UploadSession, upload_id)
+    if not session or session.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    expires_at = session.expires_at
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if expires_at < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload session expired"
+        )
+    return session
+
+@router.post("/{assignment_id}/submissions/uploads", response_model=UploadSessionResponse)
+async def create_upload_session(
+    assignment_id: int,
+    upload: UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """เริ่มอัปโหลดแบบ resumable: ส่ง chunk ตามลำดับเลขแล้วเรียก complete
+
+    ถ้าขาดตอน ให้ GET session เพื่อดูช่วงที่ได้รับแล้ว และส่งเฉพาะ missing_chunks
+    """
+    ensure_resumable_uploads()
+    course_id = await ensure_can_submit(db, assignment_id, current_user)
+    validate_file_name(upload.file_name)
+    if upload.size > MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"File size too large (max {MAX_FILE_SIZE // (1024*1024)}MB)"
+        )
+    await check_storage_quota(db, current_user.id, course_id, upload.size)
+    
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        assignment_id=assignment_id,
+        student_id=current_user.id,
+        file_name=upload.file_name,
+        size=upload.size,
+        chunk_size=UPLOAD_SESSION_CHUNK_SIZE,
+        expires_at=datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_TTL_HOURS),
+    )
+    db.add(session)
+    await db.commit()
+    
+    return await run_in_threadpool(session_status, session)
+
+@router.get("/submissions/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ดูช่วง byte ที่ได้รับแล้วและ chunk ที่ยังขาด"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    return await run_in_threadpool(session_status, session)
+
+@router.put("/submissions/uploads/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    offset: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ส่ง chunk ที่ index (byte offset = index * chunk_size) ส่งซ้ำได้"""
+    session = await _get_upload_session(db, upload_id, current_user)
+    if offset is not None and offset != index * session.chunk_size:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk {index} starts at offset {index * session.chunk_size}"
+        )
+    
+    await write_chunk(session, index, request.stream())
+    return await run_in_threadpool(session_status, session)
+
+@router.post("/submissions/uploads/{upload_id}/complete", response_model=SubmissionResponse)
+async def complete_upload_session(
+    upload_id: str,
+    complete: UploadSessionComplete,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    """ต่อ chunk ทั้งหมด บันทึกไฟล์ และสร้าง Submission (ใน transaction เดียว)
+
+    ตรวจสิทธิ์และโควตาซ้ำ: ระหว่างที่อัปโหลดอยู่ assignment อาจถูกลบ บทบาทอาจเปลี่ยน
+    หรือโควตาอาจถูกใช้ไปโดยการส่งงานอื่นแล้ว
+    """
+    session = await _get_upload_session(db, upload_id, current_user)
+    upload = await run_in_threadpool(session_status, session)
+    if upload["missing_chunks"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Missing chunks: {upload['missing_chunks']}"
+        )
+    course_id = await ensure_can_submit(db, session.assignment_id, current_user)
+    await check_storage_quota(db, current_user.id, course_id, session.size)
+    
+    assembled = await run_in_threadpool(assemble_chunks, session)
+    source = await run_in_threadpool(open, assembled, "rb")
+    try:
+        saved_file = await store_file(db, source, session.file_name, (current_user.id, course_id))
+    finally:
+        source.close()
+    
+    db_submission = Submission(
+        assignment_id=session.assignment_id,
+        student_id=current_user.id,
+        content=complete.content,
+        file_url=saved_file.file_url,
+        blob_sha256=saved_file.sha256,
+        file_name=session.file_name,
+        file_size=saved_file.size,
+        content_type=saved_file.content_type,
+        status=SubmissionStatus.SUBMITTED
+    )
+    await db.delete(session)
+    submission = await commit_submission(db, db_submission)
+    
+    await run_in_threadpool(discard_staging, upload_id)
+    return submission
+
+@router.delete("/submissions/uploads/{upload_id}")
+async def cancel_upload_session(
+    upload_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ยกเลิกการอัปโหลดและลบ chunk ที่ได้รับแล้ว"""
+    session = await db.get(UploadSession, upload_id)
+    if not session or session.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload session not found"
+        )
+    
+    await db.delete(session)
+    await db.commit()
+    await run_in_threadpool(discard_staging, upload_id)
     
-    return db_submission
+    return {"message": "Upload cancelled"}
 
-@router.get("/{assignment_id}/submissions", response_model=List[SubmissionResponse])
+@router.get("/{assignment_id}/submissions/archive")
+async def download_submissions_archive(
+    assignment_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ดาวน์โหลดไฟล์ submissions ทั้งหมดเป็น ZIP พร้อม manifest.csv (สำหรับ trainer/admin)
+
+    ZIP ถูกสร้างระหว่างส่ง ไม่มีไฟล์ชั่วคราว คิวรีดึงเฉพาะ metadata ของแต่ละแถว
+    """
+    if current_user.role not in [UserRole.TRAINER, UserRole.ADMIN]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only trainers and admins can export submissions"
+        )
+    
+    course_id = await db.scalar(select(Assignment.course_id).where(Assignment.id == assignment_id))
+    if course_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    if current_user.role == UserRole.TRAINER:
+        course = await db.scalar(select(Course).where(Course.id == course_id))
+        if course.instructor_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only view submissions for your own courses"
+            )
+    
+    rows = await db.execute(
+        select(
+            Submission.id, Submission.student_id, Submission.status, Submission.score,
+            Submission.submitted_at, Submission.file_name, Submission.file_url,
+            User.email, User.first_name, User.last_name, FileBlob.storage_path,
+        )
+        .join(User, User.id == Submission.student_id)
+        .outerjoin(FileBlob, FileBlob.sha256 == Submission.blob_sha256)
+        .where(Submission.assignment_id == assignment_id)
+        .order_by(Submission.id)
+    )
+    entries = []
+    for row in rows:
+        entries.append(ArchiveEntry(
+            submission_id=row.id,
+            student_id=row.student_id,
+            student_email=row.email,
+            student_name=f"{row.first_name} {row.last_name}",
+            status=SubmissionStatus(row.status).value,
+            score=row.score,
+            submitted_at=row.submitted_at.isoformat() if row.submitted_at else None,
+            file_name=row.file_name,
+            storage_key=submission_storage_key(row.file_url, row.storage_path),
+        ))
+    
+    return StreamingResponse(
+        stream_zip(entries, get_storage()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="assignment-{assignment_id}-submissions.zip"'},
+    )
+
+@router.get("/{assignment_id}/submissions", response_model=Union[List[SubmissionResponse], Page[SubmissionResponse]])
 async def get_submissions(
     assignment_id: int,
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    """ดูรายการ submissions"""
-    assignment = db.query(Assignment).filter(Assignment.id == assignment_id).first()
+    """ดูรายการ submissions
+
+    ส่ง cursor (ค่าว่างสำหรับหน้าแรก) เพื่อรับผลแบบ {items, next_cursor}
+    """
+    assignment = await db.scalar(select(Assignment).where(Assignment.id == assignment_id))
     if not assignment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Assignment not found"
         )
     
-    query = db.query(Submission).filter(Submission.assignment_id == assignment_id)
+    query = (
+        select(Submission)
+        .options(*loader_profile(Submission, SubmissionResponse))
+        .where(Submission.assignment_id == assignment_id)
+    )
     
     # ตรวจสอบสิทธิ์
     if current_user.role == UserRole.STUDENT:
         # Student ดูได้เฉพาะ submission ของตัวเอง
-        query = query.filter(Submission.student_id == current_user.id)
+        query = query.where(Submission.student_id == current_user.id)
     elif current_user.role == UserRole.TRAINER:
         # Trainer ดูได้เฉพาะหลักสูตรของตัวเอง
-        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
         if course.instructor_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only view submissions for your own courses"
             )
     
-    submissions = query.offset(skip).limit(limit).all()
-    return submissions
+    submissions = (await db.scalars(paginate(query, Submission.id, skip, limit, cursor))).all()
+    return page_response(submissions, limit, cursor)
 
 @router.put("/submissions/{submission_id}", response_model=SubmissionResponse)
 async def update_submission(
     submission_id: int,
     submission_update: SubmissionUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """อัปเดต submission (ให้คะแนนและฟีดแบ็ก)"""
-    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    submission = await db.scalar(select(Submission).where(Submission.id == submission_id))
     if not submission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -344,8 +724,8 @@ async def update_submission(
     elif current_user.role in [UserRole.TRAINER, UserRole.ADMIN]:
         # Trainer/Admin ให้คะแนนและฟีดแบ็ก
         if current_user.role == UserRole.TRAINER:
-            assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-            course = db.query(Course).filter(Course.id == assignment.course_id).first()
+            assignment = await db.scalar(select(Assignment).where(Assignment.id == submission.assignment_id))
+            course = await db.scalar(select(Course).where(Course.id == assignment.course_id))
             if course.instructor_id != current_user.id:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
@@ -362,38 +742,53 @@ async def update_submission(
             if submission_update.status:
                 submission.status = SubmissionStatus(submission_update.status)
     
-    db.commit()
-    db.refresh(submission)
+    await db.commit()
     
-    return submission
+    return await _load_submission(db, submission_id)
 
 @router.get("/submissions/{submission_id}", response_model=SubmissionWithAssignment)
 async def get_submission(
     submission_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """ดูรายละเอียด submission"""
-    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    submission = await _load_submission(db, submission_id)
     if not submission:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Submission not found"
         )
     
+    assignment = await fetch_assignment(db, submission.assignment_id)
+    set_committed_value(submission, "assignment", assignment)
+    
     # ตรวจสอบสิทธิ์
-    if current_user.role == UserRole.STUDENT and submission.student_id != current_user.id:
+    await ensure_can_view_submission(db, submission, assignment.course_id, current_user)
+    
+    return submission
+
+@router.get("/submissions/{submission_id}/download-url", response_model=DownloadUrlResponse)
+async def get_submission_download_url(
+    submission_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ขอ URL สำหรับดาวน์โหลดไฟล์ของ submission ตรงจาก storage"""
+    submission = await db.scalar(select(Submission).where(Submission.id == submission_id))
+    if not submission:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can only view your own submissions"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
         )
-    elif current_user.role == UserRole.TRAINER:
-        assignment = db.query(Assignment).filter(Assignment.id == submission.assignment_id).first()
-        course = db.query(Course).filter(Course.id == assignment.course_id).first()
-        if course.instructor_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You can only view submissions for your own courses"
-            )
     
-    return submission
\ No newline at end of file
+    course_id = await db.scalar(select(Assignment.course_id).where(Assignment.id == submission.assignment_id))
+    await ensure_can_view_submission(db, submission, course_id, current_user)
+    
+    url = await submission_download_url(db, submission)
+    if not url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission has no file"
+        )
+    return {"url": url, "expires_in": PRESIGNED_URL_EXPIRE_SECONDS}
\ No newline at end of file
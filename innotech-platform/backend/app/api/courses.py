@@ -1,42 +1,62 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 
-from ..database import get_db
-from ..models.user import User, UserRole
+from ..database import get_async_db
+from ..models.user import UserRole
+from ..models.assignment import Assignment, Submission
 from ..models.course import Course, Module, Enrollment, CourseStatus, EnrollmentStatus
 from ..schemas.course import (
-    CourseCreate, CourseUpdate, CourseResponse,
+    CourseCreate, CourseUpdate, CourseResponse, CourseSummary,
     ModuleCreate, ModuleResponse,
     EnrollmentCreate, EnrollmentResponse
 )
-from ..utils.auth import get_current_active_user
+from ..utils.auth import Principal, get_current_active_user, get_current_principal
+from ..utils.file_handler import release_submission_statements, submission_usage_query
+from ..schemas.pagination import Page
+from ..utils.loaders import loader_profile
+from ..utils.pagination import paginate, page_response
 
 router = APIRouter(prefix="/courses", tags=["Courses"])
 
-@router.get("/", response_model=List[CourseResponse])
-def get_courses(
+async def fetch_course(db: AsyncSession, course_id: int) -> Optional[Course]:
+    """โหลดหลักสูตรพร้อม relationship ที่ CourseResponse ใช้ (AsyncSession lazy-load ตอน serialize ไม่ได้)"""
+    return await db.scalar(
+        select(Course)
+        .options(*loader_profile(Course, CourseResponse))
+        .where(Course.id == course_id)
+        .execution_options(populate_existing=True)
+    )
+
+@router.get("/", response_model=Union[List[CourseSummary], Page[CourseSummary]])
+async def get_courses(
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: CourseStatus = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """ดูรายการหลักสูตรทั้งหมด"""
-    query = db.query(Course)
+    """ดูรายการหลักสูตรทั้งหมด
+
+    ส่ง cursor (ค่าว่างสำหรับหน้าแรก) เพื่อรับผลแบบ {items, next_cursor}
+    """
+    query = select(Course).options(*loader_profile(Course, CourseSummary))
     
     # กรองเฉพาะหลักสูตรที่เผยแพร่แล้ว (สำหรับผู้ใช้ทั่วไป)
-    query = query.filter(Course.status == CourseStatus.PUBLISHED)
+    query = query.where(Course.status == CourseStatus.PUBLISHED)
     
     if status:
-        query = query.filter(Course.status == status)
+        query = query.where(Course.status == status)
     
-    courses = query.offset(skip).limit(limit).all()
-    return courses
+    courses = (await db.scalars(paginate(query, Course.id, skip, limit, cursor))).all()
+    return page_response(courses, limit, cursor)
 
 @router.get("/{course_id}", response_model=CourseResponse)
-def get_course(course_id: int, db: Session = Depends(get_db)):
+async def get_course(course_id: int, db: AsyncSession = Depends(get_async_db)):
     """ดูรายละเอียดหลักสูตร"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await fetch_course(db, course_id)
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -53,10 +73,10 @@ def get_course(course_id: int, db: Session = Depends(get_db)):
     return course
 
 @router.post("/", response_model=CourseResponse)
-def create_course(
+async def create_course(
     course_data: CourseCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """สร้างหลักสูตรใหม่ (สำหรับ trainer/admin)"""
     if current_user.role not in [UserRole.TRAINER, UserRole.ADMIN]:
@@ -71,20 +91,19 @@ def create_course(
     )
     
     db.add(new_course)
-    db.commit()
-    db.refresh(new_course)
+    await db.commit()
     
-    return new_course
+    return await fetch_course(db, new_course.id)
 
 @router.put("/{course_id}", response_model=CourseResponse)
-def update_course(
+async def update_course(
     course_id: int,
     course_update: CourseUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """แก้ไขหลักสูตร"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.id == course_id))
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -103,19 +122,18 @@ def update_course(
     for field, value in update_data.items():
         setattr(course, field, value)
     
-    db.commit()
-    db.refresh(course)
+    await db.commit()
     
-    return course
+    return await fetch_course(db, course_id)
 
 @router.delete("/{course_id}")
-def delete_course(
+async def delete_course(
     course_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ลบหลักสูตร"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.id == course_id))
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -129,21 +147,28 @@ def delete_course(
             detail="Not enough permissions"
         )
     
-    db.delete(course)
-    db.commit()
+    # งานและการส่งงานของหลักสูตรถูกลบด้วย: คืนโควตาและ ref_count ของ blob ใน transaction เดียวกัน
+    course_assignments = select(Assignment.id).where(Assignment.course_id == course_id)
+    usages = await db.execute(submission_usage_query(Assignment.course_id == course_id))
+    for statement in release_submission_statements(usages):
+        await db.execute(statement)
+    await db.execute(delete(Submission).where(Submission.assignment_id.in_(course_assignments)))
+    await db.execute(delete(Assignment).where(Assignment.course_id == course_id))
+    await db.delete(course)
+    await db.commit()
     
     return {"message": "Course deleted successfully"}
 
 # Enrollment endpoints
 @router.post("/{course_id}/enroll", response_model=EnrollmentResponse)
-def enroll_course(
+async def enroll_course(
     course_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ลงทะเบียนเรียนหลักสูตร"""
     # ตรวจสอบหลักสูตร
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.id == course_id))
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -157,10 +182,10 @@ def enroll_course(
         )
     
     # ตรวจสอบการลงทะเบียนซ้ำ
-    existing_enrollment = db.query(Enrollment).filter(
+    existing_enrollment = await db.scalar(select(Enrollment).where(
         Enrollment.user_id == current_user.id,
         Enrollment.course_id == course_id
-    ).first()
+    ))
     
     if existing_enrollment:
         raise HTTPException(
@@ -175,34 +200,48 @@ def enroll_course(
     )
     
     db.add(new_enrollment)
-    db.commit()
-    db.refresh(new_enrollment)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # ลงทะเบียนพร้อมกันสองครั้ง: unique constraint (user_id, course_id) กันไว้
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already enrolled in this course"
+        )
     
-    return new_enrollment
+    return await db.scalar(
+        select(Enrollment)
+        .options(*loader_profile(Enrollment, EnrollmentResponse))
+        .where(Enrollment.id == new_enrollment.id)
+        .execution_options(populate_existing=True)
+    )
 
 @router.get("/my/enrollments", response_model=List[EnrollmentResponse])
-def get_my_enrollments(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+async def get_my_enrollments(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ดูหลักสูตรที่ลงทะเบียนไว้"""
-    enrollments = db.query(Enrollment).filter(
-        Enrollment.user_id == current_user.id
-    ).all()
+    enrollments = (await db.scalars(
+        select(Enrollment).options(*loader_profile(Enrollment, EnrollmentResponse)).where(
+            Enrollment.user_id == current_user.id
+        )
+    )).all()
     
     return enrollments
 
 # Module endpoints
 @router.post("/{course_id}/modules", response_model=ModuleResponse)
-def create_module(
+async def create_module(
     course_id: int,
     module_data: ModuleCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """สร้างบทเรียนในหลักสูตร"""
     # ตรวจสอบหลักสูตร
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await db.scalar(select(Course).where(Course.id == course_id))
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -223,23 +262,23 @@ def create_module(
     )
     
     db.add(new_module)
-    db.commit()
-    db.refresh(new_module)
+    await db.commit()
+    await db.refresh(new_module)
     
     return new_module
 
 @router.get("/{course_id}/modules", response_model=List[ModuleResponse])
-def get_course_modules(
+async def get_course_modules(
     course_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ดูบทเรียนในหลักสูตร"""
     # ตรวจสอบการลงทะเบียน
-    enrollment = db.query(Enrollment).filter(
+    enrollment = await db.scalar(select(Enrollment).where(
         Enrollment.user_id == current_user.id,
         Enrollment.course_id == course_id
-    ).first()
+    ))
     
     if not enrollment:
         raise HTTPException(
@@ -247,9 +286,11 @@ def get_course_modules(
             detail="You are not enrolled in this course"
         )
     
-    modules = db.query(Module).filter(
-        Module.course_id == course_id,
-        Module.is_published == True
-    ).order_by(Module.order_index).all()
+    modules = (await db.scalars(
+        select(Module).options(*loader_profile(Module, ModuleResponse)).where(
+            Module.course_id == course_id,
+            Module.is_published == True
+        ).order_by(Module.order_index)
+    )).all()
     
     return modules
\ No newline at end of file
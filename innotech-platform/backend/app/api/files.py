@@ -0,0 +1,119 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_async_db
+from ..models.assignment import Assignment, Submission
+from ..models.file_blob import FileBlob
+from ..utils.auth import Principal, get_current_principal
+from ..utils.file_handler import get_storage, resolve_local_key, submission_storage_key
+from ..utils.storage import LocalStorage, PRESIGNED_URL_EXPIRE_SECONDS
+from .assignments import ensure_can_view_submission
+
+# ให้ reverse proxy ส่งไฟล์แทน: "" (Python ส่งเอง), "X-Accel-Redirect" (nginx) หรือ "X-Sendfile" (Apache/lighttpd)
+FILE_SENDFILE_HEADER = os.getenv("FILE_SENDFILE_HEADER", "")
+# internal location ของ nginx ที่ชี้ไปยังโฟลเดอร์ uploads
+FILE_ACCEL_REDIRECT_PREFIX = os.getenv("FILE_ACCEL_REDIRECT_PREFIX", "/protected-uploads").rstrip("/")
+FILE_CACHE_MAX_AGE = int(os.getenv("FILE_CACHE_MAX_AGE", "3600"))
+
+router = APIRouter(prefix="/files", tags=["files"])
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """ตรวจ If-None-Match (มาก่อน) และ If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def _content_disposition(file_name: Optional[str]) -> str:
+    if not file_name:
+        return "attachment"
+    return f"attachment; filename*=utf-8''{quote(file_name)}"
+
+@router.get("/{submission_id}")
+async def download_submission_file(
+    submission_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """ดาวน์โหลดไฟล์ของ submission (สิทธิ์เดียวกับ get_submission)
+
+    รองรับ Range, ETag/If-None-Match และ Last-Modified/If-Modified-Since
+    ถ้าตั้ง FILE_SENDFILE_HEADER จะส่งต่อให้ reverse proxy โดยไม่ใช้ worker ของ Python
+    storage แบบ S3 จะ redirect ไปที่ presigned URL
+    """
+    submission = await db.scalar(select(Submission).where(Submission.id == submission_id))
+    if not submission:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission not found"
+        )
+
+    course_id = await db.scalar(select(Assignment.course_id).where(Assignment.id == submission.assignment_id))
+    await ensure_can_view_submission(db, submission, course_id, current_user)
+
+    blob = await db.get(FileBlob, submission.blob_sha256) if submission.blob_sha256 else None
+    key = submission_storage_key(submission.file_url, blob.storage_path if blob else None)
+    if key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Submission has no file"
+        )
+
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        url = await run_in_threadpool(
+            storage.presigned_get, key, submission.file_name, PRESIGNED_URL_EXPIRE_SECONDS, submission.content_type
+        )
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+    key = await run_in_threadpool(resolve_local_key, storage, key)
+    path = storage.path(key)
+    try:
+        stat_result = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    # blob เนื้อหาไม่เปลี่ยนตาม SHA-256 จึงเป็น strong ETag ได้ ไฟล์แบบเดิมใช้ mtime-size
+    etag = f'"{blob.sha256}"' if blob is not None else f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": f"private, max-age={FILE_CACHE_MAX_AGE}",
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    headers["Content-Disposition"] = _content_disposition(submission.file_name)
+    # ชนิดที่ตรวจไว้ตอนอัปโหลด ไฟล์แบบเดิมที่ไม่มีข้อมูลนี้เดาจาก extension
+    media_type = submission.content_type or mimetypes.guess_type(submission.file_name or key)[0] or "application/octet-stream"
+    headers["X-Content-Type-Options"] = "nosniff"
+    if FILE_SENDFILE_HEADER == "X-Accel-Redirect":
+        # nginx จัดการ Range และส่งไฟล์เอง (ใช้ Content-Type จาก response นี้)
+        headers["X-Accel-Redirect"] = f"{FILE_ACCEL_REDIRECT_PREFIX}/{quote(key)}"
+        return Response(headers=headers, media_type=media_type)
+    if FILE_SENDFILE_HEADER == "X-Sendfile":
+        headers["X-Sendfile"] = str(path.resolve())
+        return Response(headers=headers, media_type=media_type)
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
@@ -0,0 +1,52 @@
+import os
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+from ..utils.file_handler import get_storage, stream_body_to_file
+from ..utils.storage import LocalStorage
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+@router.put("/{key:path}")
+async def put_object(
+    key: str,
+    size: int,
+    sha256: str,
+    expires: int,
+    signature: str,
+    request: Request
+):
+    """รับไฟล์จาก presigned PUT ของ LocalStorage (แทน S3 ตอนใช้ดิสก์ของเครื่อง)
+
+    เขียนทีละ chunk ใน threadpool และ rename เข้าที่เมื่อขนาดและ SHA-256 ตรงกับที่ลงนามไว้เท่านั้น
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not found"
+        )
+    try:
+        valid = storage.verify_put(key, size, sha256, expires, signature)
+        destination = storage.path(key)
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid or expired upload URL"
+        )
+
+    await run_in_threadpool(destination.parent.mkdir, parents=True, exist_ok=True)
+    partial = storage.partial_path(key)
+    received, received_sha256 = await stream_body_to_file(request.stream(), partial, size)
+    if received != size or received_sha256 != sha256:
+        partial.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload does not match the signed size and checksum"
+        )
+    await run_in_threadpool(os.replace, partial, destination)
+
+    return {"key": key, "size": received}
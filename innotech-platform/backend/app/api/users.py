@@ -1,36 +1,88 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 
-from ..database import get_db
+from ..database import get_async_db
+from ..models.assignment import Submission
+from ..models.course import Course
 from ..models.user import User, UserRole
-from ..schemas.user import UserResponse, UserUpdate
-from ..utils.auth import get_current_active_user
+from ..schemas.pagination import Page
+from ..schemas.user import StorageUsageReport, UserResponse, UserUpdate
+from ..utils.auth import Principal, get_current_active_user, invalidate_user_tokens
+from ..utils.file_handler import release_submission_statements, submission_usage_query
+from ..utils.pagination import paginate, page_response
+from ..utils.quota import STORAGE_QUOTA_COURSE_BYTES, STORAGE_QUOTA_USER_BYTES
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.get("/", response_model=List[UserResponse])
-def get_users(
+@router.get("/", response_model=Union[List[UserResponse], Page[UserResponse]])
+async def get_users(
     skip: int = 0, 
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """ดูรายการผู้ใช้ทั้งหมด (สำหรับ admin)"""
+    """ดูรายการผู้ใช้ทั้งหมด (สำหรับ admin)
+
+    ส่ง cursor (ค่าว่างสำหรับหน้าแรก) เพื่อรับผลแบบ {items, next_cursor}
+    """
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    users = (await db.scalars(paginate(select(User), User.id, skip, limit, cursor))).all()
+    return page_response(users, limit, cursor)
+
+@router.get("/storage-usage", response_model=StorageUsageReport)
+async def get_storage_usage(
+    limit: int = 10,
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """ผู้ใช้และหลักสูตรที่ใช้พื้นที่มากที่สุด (สำหรับ admin)
+
+    อ่านจาก counter storage_used_bytes ที่อัปเดตพร้อม submission ไม่ต้องสแกนไฟล์
+    """
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    users = (await db.execute(
+        select(User.id, User.first_name, User.last_name, User.storage_used_bytes)
+        .where(User.storage_used_bytes > 0)
+        .order_by(User.storage_used_bytes.desc(), User.id)
+        .limit(limit)
+    )).all()
+    courses = (await db.execute(
+        select(Course.id, Course.title, Course.storage_used_bytes)
+        .where(Course.storage_used_bytes > 0)
+        .order_by(Course.storage_used_bytes.desc(), Course.id)
+        .limit(limit)
+    )).all()
+    return {
+        "user_quota_bytes": STORAGE_QUOTA_USER_BYTES,
+        "course_quota_bytes": STORAGE_QUOTA_COURSE_BYTES,
+        "users": [
+            {"id": user.id, "name": f"{user.first_name} {user.last_name}", "storage_used_bytes": user.storage_used_bytes}
+            for user in users
+        ],
+        "courses": [
+            {"id": course.id, "name": course.title, "storage_used_bytes": course.storage_used_bytes}
+            for course in courses
+        ],
+    }
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(
+async def get_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ดูข้อมูลผู้ใช้ตาม ID"""
     # ตรวจสอบสิทธิ์: ดูได้เฉพาะตัวเองหรือ admin
@@ -40,7 +92,7 @@ def get_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,11 +102,11 @@ def get_user(
     return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """แก้ไขข้อมูลผู้ใช้"""
     # ตรวจสอบสิทธิ์: แก้ไขได้เฉพาะตัวเองหรือ admin
@@ -64,7 +116,7 @@ def update_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -73,19 +125,28 @@ def update_user(
     
     # อัปเดตข้อมูล
     update_data = user_update.dict(exclude_unset=True)
+    revoke_tokens = any(
+        field in ("role", "is_active") and getattr(user, field) != value
+        for field, value in update_data.items()
+    )
     for field, value in update_data.items():
         setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    # เปลี่ยนสิทธิ์หรือปิดบัญชี: token เดิมที่มี claims เก่าต้องใช้ไม่ได้
+    if revoke_tokens:
+        user.token_version = (user.token_version or 0) + 1
+    
+    await db.commit()
+    await db.refresh(user)
+    invalidate_user_tokens(user_id, user.token_version if revoke_tokens else None)
     
     return user
 
 @router.delete("/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """ลบผู้ใช้ (สำหรับ admin)"""
     if current_user.role != UserRole.ADMIN:
@@ -94,7 +155,7 @@ def delete_user(
             detail="Not enough permissions"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.scalar(select(User).where(User.id == user_id))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -108,7 +169,14 @@ def delete_user(
             detail="Cannot delete yourself"
         )
     
-    db.delete(user)
-    db.commit()
+    # การส่งงานของผู้ใช้ถูกลบด้วย: คืนโควตาของหลักสูตรและ ref_count ของ blob ใน transaction เดียวกัน
+    usages = await db.execute(submission_usage_query(Submission.student_id == user_id))
+    for statement in release_submission_statements(usages):
+        await db.execute(statement)
+    await db.execute(delete(Submission).where(Submission.student_id == user_id))
+    revoked_version = (user.token_version or 0) + 1
+    await db.delete(user)
+    await db.commit()
+    invalidate_user_tokens(user_id, revoked_version)
     
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 import os
 from dotenv import load_dotenv
 
@@ -8,18 +10,138 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./innotech_db.sqlite")
 
-# Create engine
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}  # SQLite specific
-    )
-else:
-    engine = create_engine(DATABASE_URL)
+# Async drivers for each sync URL scheme we support
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """แปลง DATABASE_URL แบบ sync ให้ใช้ async driver (aiosqlite / asyncpg)"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(DATABASE_URL))
+
+# Engine profile: "server" for long-running processes (uvicorn), "serverless" for Lambda,
+# where frozen containers keep stale sockets and every container opens its own pool
+DB_ENGINE_PROFILE = os.getenv(
+    "DB_ENGINE_PROFILE", "serverless" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "server"
+)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))  # วินาทีที่รอ connection ว่างก่อน error
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # ปิด connection ที่เก่ากว่านี้ (วินาที)
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+# serverless: จำนวน connection ที่เก็บไว้ข้ามคำขอใน container (0 = NullPool เหมาะกับ RDS Proxy/pgbouncer)
+DB_SERVERLESS_POOL_SIZE = int(os.getenv("DB_SERVERLESS_POOL_SIZE", "1"))
+DB_SERVERLESS_POOL_RECYCLE = int(os.getenv("DB_SERVERLESS_POOL_RECYCLE", "300"))
+
+def engine_options(url: str, profile: str = DB_ENGINE_PROFILE) -> dict:
+    """keyword arguments ของ create_engine/create_async_engine ตาม profile และ driver
+
+    server: QueuePool ขนาดคงที่ + overflow, pre-ping และ recycle กัน connection ที่ฐานข้อมูลตัดไปแล้ว
+    serverless: ไม่เกิน DB_SERVERLESS_POOL_SIZE connection ต่อ container (ไม่มี overflow)
+    ตรวจด้วย pre-ping ก่อนใช้ทุกครั้ง เพราะ container ที่ถูก freeze ไม่รู้ว่า socket ถูกปิดแล้ว
+    """
+    if url.startswith("sqlite"):
+        if "aiosqlite" in url:
+            return {}
+        return {"connect_args": {"check_same_thread": False}}  # SQLite specific
+
+    is_async = "+asyncpg" in url
+    connect_args = {"timeout": DB_CONNECT_TIMEOUT} if is_async else {"connect_timeout": DB_CONNECT_TIMEOUT}
+    if profile == "serverless":
+        if is_async:
+            # RDS Proxy/pgbouncer ส่งคำสั่งไปคนละ backend ได้ prepared statement ที่ cache ไว้จึงใช้ไม่ได้
+            connect_args["statement_cache_size"] = 0
+        if DB_SERVERLESS_POOL_SIZE == 0:
+            return {"poolclass": NullPool, "connect_args": connect_args}
+        return {
+            "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+            "pool_size": DB_SERVERLESS_POOL_SIZE,
+            "max_overflow": 0,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_SERVERLESS_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            "connect_args": connect_args,
+        }
+    if profile != "server":
+        raise ValueError(f"Unknown DB_ENGINE_PROFILE: {profile}")
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "pool_use_lifo": True,  # connection ที่ไม่ได้ใช้ค้างท้ายคิวจนถูก recycle แทนที่จะถูกเวียนใช้ตลอด
+        "connect_args": connect_args,
+    }
+
+# Pool counters for /metrics, keyed by engine name
+_pool_counters = {}
+
+def track_pool(name: str, engine) -> None:
+    """นับ connection ที่เปิดใหม่, การยืมจาก pool และ connection ที่ถูกทิ้ง (เช่น pre-ping ไม่ผ่าน)"""
+    counters = {"connects": 0, "checkouts": 0, "invalidations": 0}
+    _pool_counters[name] = (engine, counters)
+
+    def count(key):
+        def listener(*args):
+            counters[key] += 1
+        return listener
+
+    event.listen(engine, "connect", count("connects"))
+    event.listen(engine, "checkout", count("checkouts"))
+    event.listen(engine, "invalidate", count("invalidations"))
+
+def pool_stats() -> dict:
+    """สถิติของ pool สำหรับ monitoring (async engine แสดงเมื่อถูกสร้างแล้วเท่านั้น)"""
+    stats = {"profile": DB_ENGINE_PROFILE}
+    for name, (engine, counters) in _pool_counters.items():
+        pool = engine.pool
+        entry = {"pool": type(pool).__name__, **counters}
+        if isinstance(pool, QueuePool):
+            entry.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                overflow=pool.overflow(),
+            )
+        stats[name] = entry
+    return stats
+
+# Create engine (scripts, migrations and the schema bootstrap; API requests only use the async
+# engine, so a serverless container holds a single pool)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+track_pool("sync", engine)
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine is created on first use so the async drivers are only
+# imported by processes that actually serve API routes
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+        track_pool("async", _async_engine.sync_engine)
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        # expire_on_commit=False: expired attributes would need awaited IO to reload
+        _AsyncSessionLocal = async_sessionmaker(
+            get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
 # Create base class for models
 Base = declarative_base()
 
@@ -29,4 +151,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get async database session
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
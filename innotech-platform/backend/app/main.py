@@ -1,38 +1,89 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
+import importlib
 import os
+import threading
 
-# Import API routers
-from .api import auth, users, courses, assignments
+from .database import pool_stats
+from .utils.cors import CORSMiddleware
+from .utils.file_handler import UPLOAD_DIR, ensure_upload_dirs
+from .utils.auth import require_admin
+from .utils.hashing import password_hasher
 
 # Load environment variables
 load_dotenv()
 
+# API routers ตาม prefix ของ path: import ตอนมีคำขอแรกของ prefix นั้น (หรือ include_routers() ตอน startup)
+# container ของ Lambda ที่ยังไม่ preload ตอบ /health ได้โดยไม่ต้อง import schema และ endpoint ทั้งหมด
+API_ROUTERS = {
+    "/auth": "auth",
+    "/users": "users",
+    "/courses": "courses",
+    "/assignments": "assignments",
+    "/storage": "storage",
+    "/files": "files",
+}
+# เอกสาร API ต้องเห็นทุก router
+DOCS_PATHS = {"/openapi.json", "/docs", "/docs/oauth2-redirect", "/redoc"}
+
+_included_routers = set()
+_include_lock = threading.Lock()
+
+def include_routers(*prefixes: str) -> None:
+    """include router ของ prefix ที่ระบุ (ไม่ระบุ = ทุก router) ครั้งเดียวต่อ process"""
+    for prefix in prefixes or API_ROUTERS:
+        if prefix in _included_routers:
+            continue
+        with _include_lock:
+            if prefix in _included_routers:
+                continue
+            module = importlib.import_module(f".api.{API_ROUTERS[prefix]}", __package__)
+            app.include_router(module.router)
+            _included_routers.add(prefix)
+
+class LazyRouterMiddleware:
+    """include router ก่อนส่งคำขอต่อให้ app (router ของ Starlette อ่านรายการ route ใหม่ทุกคำขอ)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path in DOCS_PATHS:
+                include_routers()
+            else:
+                prefix = "/" + path.split("/", 2)[1]
+                if prefix in API_ROUTERS:
+                    include_routers(prefix)
+        await self.app(scope, receive, send)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # งานที่แตะ filesystem ทำตอน startup ของ server (Mangum ใช้ lifespan="off" จึงไม่ทำบน Lambda)
+    ensure_upload_dirs()
+    include_routers()
+    yield
+
 app = FastAPI(
     title="Innotech Platform API",
     description="API for Innotech Learning Platform MVP",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],  # Next.js frontend
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include API routers
-app.include_router(auth.router)
-app.include_router(users.router)
-app.include_router(courses.router)
-app.include_router(assignments.router)
+app.add_middleware(LazyRouterMiddleware)
+# CORS middleware (ALLOWED_ORIGINS, default: Next.js frontend on localhost:3000/3001)
+# เพิ่มทีหลังจึงเป็นชั้นนอก: ตอบ preflight ก่อนถึง router (และก่อน import router) ทั้ง uvicorn และ Lambda (Mangum)
+app.add_middleware(CORSMiddleware)
 
 # Serve static files (uploaded files)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# ปิดไว้โดยปริยาย: ไฟล์ submission ดาวน์โหลดผ่าน /files/{submission_id} ที่ตรวจสิทธิ์
+# เปิดด้วย PUBLIC_UPLOADS=true เฉพาะช่วงที่ client เก่ายังใช้ลิงก์ /uploads/... อยู่
+if os.getenv("PUBLIC_UPLOADS", "false").lower() == "true":
+    app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
 
 @app.get("/")
 async def root():
@@ -42,6 +93,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+# สถิติภายใน (executor, pool) เปิดให้เฉพาะ admin
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+async def metrics():
+    return {"password_hashing": password_hasher.stats(), "database": pool_stats()}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -2,6 +2,8 @@
 from .user import User
 from .course import Course, Module, Enrollment
 from .assignment import Assignment, Submission
+from .file_blob import FileBlob
+from .upload_session import UploadSession
 
 __all__ = [
     "User",
@@ -9,5 +11,7 @@ __all__ = [
     "Module",
     "Enrollment",
     "Assignment",
-    "Submission"
+    "Submission",
+    "FileBlob",
+    "UploadSession"
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Enum, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import enum
 from ..database import Base
@@ -15,10 +15,10 @@ class Assignment(Base):
     __tablename__ = "assignments"
 
     id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.id"))
+    course_id = Column(Integer, ForeignKey("courses.id"), index=True)
     title = Column(String(255), nullable=False)
     description = Column(Text)
-    instructions = Column(Text)
+    instructions = deferred(Column(Text))  # โหลดเฉพาะหน้ารายละเอียด
     max_score = Column(Integer, default=100)
     due_date = Column(DateTime(timezone=True))
     is_required = Column(Boolean, default=True)
@@ -31,12 +31,19 @@ class Assignment(Base):
 
 class Submission(Base):
     __tablename__ = "submissions"
+    __table_args__ = (
+        # นักเรียนส่งงานได้ครั้งเดียวต่อ assignment (และเป็น index สำหรับ lookup คู่นี้)
+        UniqueConstraint("assignment_id", "student_id", name="uq_submissions_assignment_student"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     assignment_id = Column(Integer, ForeignKey("assignments.id"))
     student_id = Column(Integer, ForeignKey("users.id"))
     file_url = Column(String(500))
+    blob_sha256 = Column(String(64), ForeignKey("file_blobs.sha256"), index=True)
     file_name = Column(String(255))
+    file_size = Column(BigInteger)  # ขนาดที่คิดโควตา (นับเต็มแม้ blob จะใช้ร่วมกัน)
+    content_type = Column(String(100))  # MIME type ที่ตรวจจาก magic bytes ตอนอัปโหลด
     content = Column(Text)  # สำหรับงานที่เป็น text
     status = Column(Enum(SubmissionStatus), default=SubmissionStatus.PENDING)
     score = Column(Integer)
@@ -46,4 +53,5 @@ class Submission(Base):
 
     # Relationships
     assignment = relationship("Assignment", back_populates="submissions")
-    student = relationship("User", back_populates="submissions")
\ No newline at end of file
+    student = relationship("User", back_populates="submissions")
+    blob = relationship("FileBlob")
\ No newline at end of file
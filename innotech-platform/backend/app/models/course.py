@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, Enum, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 import enum
 from ..database import Base
@@ -19,14 +19,15 @@ class Course(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
-    description = Column(Text)
+    description = deferred(Column(Text))  # โหลดเฉพาะหน้ารายละเอียด
     short_description = Column(String(500))
     thumbnail_url = Column(String(500))
     instructor_id = Column(Integer, ForeignKey("users.id"))
-    status = Column(Enum(CourseStatus), default=CourseStatus.DRAFT)
+    status = Column(Enum(CourseStatus), default=CourseStatus.DRAFT, index=True)
     duration_hours = Column(Integer)
     price = Column(Integer, default=0)  # ราคาเป็นสตางค์
     is_free = Column(Boolean, default=True)
+    storage_used_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")  # ขนาดไฟล์ submission ทั้งหมด
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -38,12 +39,16 @@ class Course(Base):
 
 class Module(Base):
     __tablename__ = "modules"
+    __table_args__ = (
+        # บทเรียนที่เผยแพร่แล้วของหลักสูตร เรียงตามลำดับ
+        Index("ix_modules_course_published_order", "course_id", "is_published", "order_index"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     course_id = Column(Integer, ForeignKey("courses.id"))
     title = Column(String(255), nullable=False)
     description = Column(Text)
-    content = Column(Text)  # เนื้อหาบทเรียน (markdown/html)
+    content = deferred(Column(Text))  # เนื้อหาบทเรียน (markdown/html) โหลดเฉพาะเมื่อต้องใช้
     video_url = Column(String(500))
     order_index = Column(Integer, default=0)
     duration_minutes = Column(Integer)
@@ -56,6 +61,10 @@ class Module(Base):
 
 class Enrollment(Base):
     __tablename__ = "enrollments"
+    __table_args__ = (
+        # ลงทะเบียนได้ครั้งเดียวต่อหลักสูตร (และเป็น index สำหรับ lookup คู่นี้)
+        UniqueConstraint("user_id", "course_id", name="uq_enrollments_user_course"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
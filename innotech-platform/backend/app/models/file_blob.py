@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class FileBlob(Base):
+    """ไฟล์อัปโหลดแบบ content-addressed: เนื้อหาเดียวกันเก็บครั้งเดียว"""
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    storage_path = Column(String(500), nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0, server_default="0")  # จำนวน submission ที่อ้างถึง
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # เวลาที่มีการอ้างถึงครั้งล่าสุด (ทุก upsert ของ ref_count) ระยะผ่อนผันของ GC นับจากค่านี้
+    last_referenced_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,5 @@
 # Schemas package
 from .user import *
 from .course import *
-from .assignment import *
\ No newline at end of file
+from .assignment import *
+from .pagination import *
\ No newline at end of file
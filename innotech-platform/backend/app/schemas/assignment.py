@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, Optional, List
 from datetime import datetime
 from .user import UserResponse
 
@@ -32,6 +32,22 @@ class AssignmentResponse(AssignmentBase):
     class Config:
         from_attributes = True
 
+class AssignmentSummary(BaseModel):
+    """งานสำหรับหน้ารายการ (ไม่มี instructions)"""
+    id: int
+    course_id: int
+    title: str
+    description: Optional[str] = None
+    max_score: int = 100
+    due_date: Optional[datetime] = None
+    is_required: bool = True
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    submissions_count: Optional[int] = 0
+
+    class Config:
+        from_attributes = True
+
 class SubmissionBase(BaseModel):
     content: Optional[str] = None
     file_name: Optional[str] = None
@@ -39,6 +55,46 @@ class SubmissionBase(BaseModel):
 class SubmissionCreate(SubmissionBase):
     assignment_id: int
 
+class UploadUrlRequest(BaseModel):
+    """ขอ URL สำหรับอัปโหลดไฟล์ตรงไปที่ storage (client คำนวณ SHA-256 เอง)"""
+    file_name: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0)
+    sha256: str = Field(..., pattern="^[0-9a-f]{64}$")
+
+class UploadUrlResponse(BaseModel):
+    sha256: str
+    upload_required: bool  # False = มีไฟล์เนื้อหาเดียวกันอยู่แล้ว ส่งงานได้เลย
+    upload_url: Optional[str] = None
+    method: Optional[str] = None
+    headers: Dict[str, str] = {}
+    expires_in: Optional[int] = None
+
+class UploadSessionCreate(BaseModel):
+    """เริ่มอัปโหลดแบบ resumable"""
+    file_name: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0)
+
+class ByteRange(BaseModel):
+    start: int
+    end: int  # ไม่รวม end
+
+class UploadSessionResponse(BaseModel):
+    id: str
+    assignment_id: int
+    file_name: str
+    size: int
+    chunk_size: int
+    expires_at: datetime
+    received: List[ByteRange] = []
+    missing_chunks: List[int] = []
+
+class UploadSessionComplete(BaseModel):
+    content: Optional[str] = None
+
+class DownloadUrlResponse(BaseModel):
+    url: str
+    expires_in: int
+
 class SubmissionUpdate(BaseModel):
     content: Optional[str] = None
     status: Optional[str] = None
@@ -50,6 +106,8 @@ class SubmissionResponse(SubmissionBase):
     assignment_id: int
     student_id: int
     file_url: Optional[str] = None
+    file_size: Optional[int] = None
+    content_type: Optional[str] = None
     status: str
     score: Optional[int] = None
     feedback: Optional[str] = None
@@ -60,6 +118,13 @@ class SubmissionResponse(SubmissionBase):
     class Config:
         from_attributes = True
 
+    @model_validator(mode="after")
+    def use_download_endpoint(self):
+        """ไฟล์บนดิสก์ของเครื่อง (/uploads/...) ให้ดาวน์โหลดผ่าน /files/{id} ที่ตรวจสิทธิ์แทน URL สาธารณะ"""
+        if self.file_url and self.file_url.startswith("/uploads/"):
+            self.file_url = f"/files/{self.id}"
+        return self
+
 class SubmissionWithAssignment(SubmissionResponse):
     assignment: Optional[AssignmentResponse] = None
 
@@ -45,6 +45,21 @@ class ModuleResponse(ModuleBase):
     class Config:
         from_attributes = True
 
+class ModuleSummary(BaseModel):
+    """บทเรียนสำหรับหน้ารายการ (ไม่มี content)"""
+    id: int
+    course_id: int
+    title: str
+    description: Optional[str] = None
+    video_url: Optional[str] = None
+    order_index: int = 0
+    duration_minutes: Optional[int] = None
+    is_published: bool
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class CourseResponse(CourseBase):
     id: int
     instructor_id: int
@@ -55,6 +70,23 @@ class CourseResponse(CourseBase):
     class Config:
         from_attributes = True
 
+class CourseSummary(BaseModel):
+    """หลักสูตรสำหรับหน้ารายการ (ไม่มี description)"""
+    id: int
+    title: str
+    short_description: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    duration_hours: Optional[int] = None
+    price: int = 0
+    is_free: bool = True
+    instructor_id: int
+    status: CourseStatus
+    created_at: datetime
+    modules: List[ModuleSummary] = []
+
+    class Config:
+        from_attributes = True
+
 class EnrollmentCreate(BaseModel):
     course_id: int
 
@@ -65,7 +97,7 @@ class EnrollmentResponse(BaseModel):
     status: EnrollmentStatus
     progress_percentage: int
     enrolled_at: datetime
-    course: CourseResponse
+    course: CourseSummary
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from ..models.user import UserRole
 
@@ -28,6 +28,17 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+class StorageConsumer(BaseModel):
+    id: int
+    name: str
+    storage_used_bytes: int
+
+class StorageUsageReport(BaseModel):
+    user_quota_bytes: int
+    course_quota_bytes: int
+    users: List[StorageConsumer]
+    courses: List[StorageConsumer]
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -0,0 +1,113 @@
+"""
+Streaming ZIP archives built on the fly (no temp files)
+"""
+import csv
+import io
+import re
+import time
+import zipfile
+from dataclasses import dataclass
+from pathlib import PurePath
+from typing import Iterable, Iterator, List, Optional
+
+from .file_handler import UPLOAD_CHUNK_SIZE
+from .storage import StorageBackend
+
+# ไฟล์เหล่านี้บีบอัดมาแล้ว deflate ซ้ำเปลือง CPU เปล่า ๆ
+_STORED_EXTENSIONS = {".zip", ".docx", ".pdf", ".jpg", ".jpeg", ".png", ".gif"}
+
+MANIFEST_COLUMNS = [
+    "submission_id", "student_id", "student_email", "student_name",
+    "status", "score", "submitted_at", "file_name", "archive_path",
+]
+
+@dataclass(frozen=True)
+class ArchiveEntry:
+    """หนึ่งแถวใน manifest และไฟล์ (ถ้ามี) ที่จะใส่ใน ZIP"""
+    submission_id: int
+    student_id: int
+    student_email: str
+    student_name: str
+    status: str
+    score: Optional[int]
+    submitted_at: Optional[str]
+    file_name: Optional[str]
+    storage_key: Optional[str]
+
+class _ZipSink(io.RawIOBase):
+    """ปลายทางแบบ write-only ของ ZipFile เก็บ byte ไว้จนกว่าจะถูกดึงไปส่ง
+
+    ไม่รองรับ seek จึงทำให้ ZipFile เขียน data descriptor แทนการย้อนกลับไปแก้ header
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^\w.\-]+", "_", value).strip("._") or "file"
+
+def archive_path(entry: ArchiveEntry) -> Optional[str]:
+    """path ใน ZIP: submissions/<submission_id>_<email>/<file_name>"""
+    if not entry.storage_key:
+        return None
+    folder = f"{entry.submission_id}_{_safe_name(entry.student_email.split('@')[0])}"
+    return f"submissions/{folder}/{_safe_name(PurePath(entry.file_name or entry.storage_key).name)}"
+
+def _manifest(entries: List[ArchiveEntry]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(MANIFEST_COLUMNS)
+    for entry in entries:
+        writer.writerow([
+            entry.submission_id, entry.student_id, entry.student_email, entry.student_name,
+            entry.status, "" if entry.score is None else entry.score, entry.submitted_at or "",
+            entry.file_name or "", archive_path(entry) or "",
+        ])
+    return buffer.getvalue().encode("utf-8-sig")  # BOM ให้ Excel อ่านภาษาไทยถูก
+
+def stream_zip(entries: Iterable[ArchiveEntry], storage: StorageBackend) -> Iterator[bytes]:
+    """สร้าง ZIP ทีละ chunk: manifest.csv ตามด้วยไฟล์ของแต่ละ submission
+
+    อ่านไฟล์ทีละ UPLOAD_CHUNK_SIZE และส่งออกทันที หน่วยความจำจึงไม่โตตามขนาดไฟล์
+    เป็น generator แบบ blocking (StreamingResponse จะรันใน threadpool)
+    """
+    entries = list(entries)
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(
+            zipfile.ZipInfo("manifest.csv", time.localtime()[:6]), _manifest(entries), zipfile.ZIP_DEFLATED
+        )
+        yield sink.drain()
+
+        for entry in entries:
+            path = archive_path(entry)
+            if path is None:
+                continue
+            try:
+                source = storage.open(entry.storage_key)
+            except FileNotFoundError:
+                continue  # ไฟล์หายจาก storage: ยังมีแถวใน manifest ให้ตรวจสอบ
+            info = zipfile.ZipInfo(path, time.localtime()[:6])
+            if PurePath(path).suffix.lower() in _STORED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            with source, archive.open(info, mode="w", force_zip64=True) as target:
+                while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+    yield sink.drain()
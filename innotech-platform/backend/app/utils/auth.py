@@ -1,32 +1,122 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 import os
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import time
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models.user import User
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..models.user import User, UserRole
+from .cache import TTLCache
+from .hashing import BCRYPT_ROUNDS, password_hasher
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib และ jose import ตอนใช้ครั้งแรก (ลด cold start ของ Lambda ที่ยังไม่ต้องตรวจรหัสผ่าน/token)
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Password hashing (hash ที่ cost ไม่ตรงกับ BCRYPT_ROUNDS จะ needs_update และถูก hash ใหม่ตอน login)"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+def __getattr__(name: str):
+    # รองรับ from app.utils.auth import pwd_context แบบเดิม
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # JWT settings
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# ใส่ uid/role/ver ลงใน token เพื่อให้ get_current_principal ตรวจสิทธิ์ได้โดยไม่ค้นฐานข้อมูล
+JWT_STATELESS_CLAIMS = os.getenv("JWT_STATELESS_CLAIMS", "true").lower() == "true"
 
 # HTTP Bearer for JWT
 security = HTTPBearer()
 
+# Cache token -> (payload, principal, db_verified) เพื่อข้าม jwt.decode และ SELECT users ในคำขอถัดไป
+# db_verified=False คือ principal ที่สร้างจาก claims อย่างเดียว ใช้ได้กับ get_current_principal เท่านั้น
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+@dataclass(frozen=True)
+class Principal:
+    """ข้อมูลผู้ใช้ที่ยืนยันตัวตนแล้ว เท่าที่ใช้ตรวจสิทธิ์"""
+    id: int
+    email: str
+    role: UserRole
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, email=user.email, role=user.role, is_active=user.is_active)
+
+# user_id -> token_version ต่ำสุดที่ยังใช้ได้ (บันทึกเมื่อ process นี้เป็นผู้ยกเลิก token)
+_min_token_versions: dict = {}
+
+def invalidate_user_tokens(user_id: int, min_token_version: Optional[int] = None) -> int:
+    """ลบ cache ของทุก token ที่เป็นของผู้ใช้คนนี้ (เรียกหลังแก้ไข/ลบผู้ใช้)
+
+    ถ้าระบุ min_token_version, token แบบ claims ที่มี ver ต่ำกว่านี้จะถูกปฏิเสธด้วย
+    """
+    if min_token_version is not None:
+        _min_token_versions[user_id] = max(min_token_version, _min_token_versions.get(user_id, 0))
+    return token_cache.invalidate(lambda entry: entry[1].id == user_id)
+
+def access_token_claims(user: User) -> dict:
+    """claims สำหรับ access token ของผู้ใช้"""
+    claims = {"sub": user.email}
+    if JWT_STATELESS_CLAIMS:
+        claims.update({"uid": user.id, "role": UserRole(user.role).value, "ver": user.token_version or 0})
+    return claims
+
+def principal_from_claims(payload: dict) -> Optional[Principal]:
+    """สร้าง Principal จาก claims (token แบบเดิมที่มีแค่ sub จะได้ None)"""
+    try:
+        principal = Principal(
+            id=int(payload["uid"]),
+            email=payload["sub"],
+            role=UserRole(payload["role"]),
+            is_active=True,  # ออก token ให้เฉพาะผู้ใช้ที่ active และการปิดบัญชีจะเพิ่ม token_version
+        )
+        version = int(payload["ver"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if version < _min_token_versions.get(principal.id, 0):
+        return None
+    return principal
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """ตรวจสอบรหัสผ่าน"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """เข้ารหัสรหัสผ่าน"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """ตรวจสอบรหัสผ่านใน executor ของ bcrypt (ไม่บล็อก event loop / threadpool หลัก)"""
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """ตรวจสอบรหัสผ่าน และคืน hash ใหม่ถ้า hash เดิมใช้ cost/scheme ที่ล้าสมัย"""
+    return await password_hasher.run(get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """เข้ารหัสรหัสผ่านใน executor ของ bcrypt"""
+    return await password_hasher.run(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """สร้าง JWT token"""
@@ -37,36 +127,48 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> Optional[dict]:
     """ตรวจสอบ JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
     except JWTError:
         return None
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    """ตรวจสอบผู้ใช้และรหัสผ่าน"""
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """ตรวจสอบผู้ใช้และรหัสผ่าน (อัปเกรด hash เป็น cost ปัจจุบันไปพร้อมกัน)"""
+    user = await db.scalar(select(User).where(User.email == email))
+    if not user:
+        return None
+    valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """ดึงข้อมูลผู้ใช้ปัจจุบันจาก JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """ดึงข้อมูลผู้ใช้ปัจจุบันจาก JWT token (ตรวจกับฐานข้อมูล)
+
+    ใช้ AsyncSession เดียวกับ endpoint (FastAPI cache dependency ต่อคำขอ) คำขอหนึ่งจึงใช้ connection เดียว
+    """
+    credentials_exception = _credentials_exception()
     
     token = credentials.credentials
+    cached = token_cache.get(token)
+    # entry จาก claims ยังไม่เคยเทียบ is_active/token_version กับฐานข้อมูล ต้องตรวจใหม่
+    if cached is not None and cached[2]:
+        return cached[1]
+    
     payload = verify_token(token)
     
     if payload is None:
@@ -76,14 +178,59 @@ def get_current_user(
     if email is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email))
     if user is None:
         raise credentials_exception
     
-    return user
+    # token ที่ออกก่อนการเพิ่ม token_version ถือว่าถูกยกเลิก
+    if payload.get("ver", 0) < (user.token_version or 0):
+        raise credentials_exception
+    
+    principal = Principal.from_user(user)
+    # อายุ cache ไม่เกินเวลาหมดอายุของ token
+    token_cache.set(token, (payload, principal, True), max_age=payload.get("exp", 0) - time.time())
+    return principal
+
+async def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """ดึงผู้ใช้ปัจจุบันจาก claims ใน token โดยไม่ค้นฐานข้อมูล (สำหรับ endpoint ที่อ่านอย่างเดียว)
+
+    token แบบเดิมที่ไม่มี claims จะถูกตรวจผ่าน get_current_user แทน
+    การยกเลิก token ที่ทำใน process อื่นมีผลกับ endpoint กลุ่มนี้เมื่อ token หมดอายุ
+    endpoint ที่เขียนข้อมูลใช้ get_current_user ซึ่งตรวจกับฐานข้อมูลเสมอ (cache ไม่เกิน AUTH_CACHE_TTL_SECONDS)
+    """
+    token = credentials.credentials
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached[1]
+    
+    payload = verify_token(token)
+    if payload is None:
+        raise _credentials_exception()
+    
+    if "uid" not in payload:
+        return await get_current_user(credentials, db)
+    
+    principal = principal_from_claims(payload)
+    if principal is None:
+        raise _credentials_exception()
+    
+    token_cache.set(token, (payload, principal, False), max_age=payload.get("exp", 0) - time.time())
+    return principal
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """ตรวจสอบว่าผู้ใช้ยังใช้งานได้"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+def require_admin(current_user: Principal = Depends(get_current_active_user)) -> Principal:
+    """อนุญาตเฉพาะ admin (ข้อมูลภายในระบบ เช่น /metrics)"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
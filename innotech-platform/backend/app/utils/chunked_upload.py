@@ -0,0 +1,112 @@
+"""
+Resumable (chunked) uploads: staging area for numbered chunks
+"""
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, List
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+
+from ..models.upload_session import UploadSession
+from .file_handler import UPLOAD_CHUNK_SIZE, stream_body_to_file
+
+# chunk ที่ยังไม่ complete (ไม่อยู่ใต้ uploads/ จึงไม่ถูกเปิดผ่าน StaticFiles)
+# ต้องเขียนได้และทุก process เห็นร่วมกัน: chunk ของ session เดียวอาจไปลงคนละ worker/container
+UPLOAD_STAGING_DIR = Path(os.getenv("UPLOAD_STAGING_DIR", "upload_staging"))
+# Lambda: filesystem อ่านได้อย่างเดียวและ /tmp แยกต่อ container จึงเปิดเฉพาะเมื่อตั้ง UPLOAD_STAGING_DIR เอง (เช่น EFS)
+RESUMABLE_UPLOADS_ENABLED = bool(os.getenv("UPLOAD_STAGING_DIR")) or not os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+UPLOAD_SESSION_CHUNK_SIZE = int(os.getenv("UPLOAD_SESSION_CHUNK_SIZE_KB", "1024")) * 1024
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+def ensure_resumable_uploads() -> None:
+    """ไม่มี staging ที่ใช้ร่วมกัน: ปฏิเสธตั้งแต่สร้าง session แทนที่จะไปล้มตอนเขียน chunk หรือ complete"""
+    if not RESUMABLE_UPLOADS_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Resumable uploads need a shared UPLOAD_STAGING_DIR; use the upload-url endpoint instead"
+        )
+
+def staging_dir(upload_id: str) -> Path:
+    return UPLOAD_STAGING_DIR / upload_id
+
+def chunk_count(session: UploadSession) -> int:
+    return -(-session.size // session.chunk_size)
+
+def expected_chunk_length(session: UploadSession, index: int) -> int:
+    """ขนาดของ chunk ที่ index (chunk สุดท้ายอาจสั้นกว่า chunk_size)"""
+    return min(session.chunk_size, session.size - index * session.chunk_size)
+
+def received_chunks(session: UploadSession) -> List[int]:
+    """index ของ chunk ที่ได้รับครบแล้ว (เรียงจากน้อยไปมาก)"""
+    try:
+        names = os.listdir(staging_dir(session.id))
+    except FileNotFoundError:
+        return []
+    return sorted(int(name[:-len(".chunk")]) for name in names if name.endswith(".chunk"))
+
+def received_ranges(session: UploadSession, chunks: List[int]) -> List[dict]:
+    """รวม chunk ที่ติดกันเป็นช่วง byte [start, end)"""
+    ranges = []
+    for index in chunks:
+        start = index * session.chunk_size
+        end = start + expected_chunk_length(session, index)
+        if ranges and ranges[-1]["end"] == start:
+            ranges[-1]["end"] = end
+        else:
+            ranges.append({"start": start, "end": end})
+    return ranges
+
+def session_status(session: UploadSession) -> dict:
+    chunks = received_chunks(session)
+    received = set(chunks)
+    return {
+        "id": session.id,
+        "assignment_id": session.assignment_id,
+        "file_name": session.file_name,
+        "size": session.size,
+        "chunk_size": session.chunk_size,
+        "expires_at": session.expires_at,
+        "received": received_ranges(session, chunks),
+        "missing_chunks": [index for index in range(chunk_count(session)) if index not in received],
+    }
+
+async def write_chunk(session: UploadSession, index: int, stream: AsyncIterator[bytes]) -> None:
+    """เก็บ chunk ลง staging (ส่งซ้ำได้ chunk เดิมจะถูกแทนที่แบบ atomic)
+
+    แต่ละคำขอเขียนไฟล์ .part ชื่อไม่ซ้ำกัน: client ที่ timeout แล้วส่ง chunk เดิมซ้ำขณะคำขอแรกยังเขียนอยู่
+    จะไม่เขียนทับหรือลบไฟล์ของกันและกัน คำขอที่ rename เสร็จทีหลังเป็นตัวที่อยู่
+    """
+    if not 0 <= index < chunk_count(session):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Chunk index out of range"
+        )
+    expected = expected_chunk_length(session, index)
+    directory = staging_dir(session.id)
+    await run_in_threadpool(directory.mkdir, parents=True, exist_ok=True)
+    partial = directory / f"{index}.{uuid.uuid4().hex}.part"
+    size, _ = await stream_body_to_file(stream, partial, expected)
+    if size != expected:
+        partial.unlink(missing_ok=True)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chunk {index} must be {expected} bytes"
+        )
+    await run_in_threadpool(os.replace, partial, directory / f"{index}.chunk")
+
+def assemble_chunks(session: UploadSession) -> Path:
+    """ต่อ chunk ทั้งหมดตามลำดับเป็นไฟล์เดียวใน staging (blocking, เรียกผ่าน threadpool)"""
+    directory = staging_dir(session.id)
+    assembled = directory / f"assembled.{uuid.uuid4().hex}"
+    with open(assembled, "wb") as buffer:
+        for index in range(chunk_count(session)):
+            with open(directory / f"{index}.chunk", "rb") as chunk:
+                shutil.copyfileobj(chunk, buffer, UPLOAD_CHUNK_SIZE)
+    return assembled
+
+def discard_staging(upload_id: str) -> None:
+    """ลบ chunk ทั้งหมดของ session (blocking)"""
+    shutil.rmtree(staging_dir(upload_id), ignore_errors=True)
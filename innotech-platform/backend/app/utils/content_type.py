@@ -0,0 +1,72 @@
+"""
+Content type detection from the first bytes of an upload (magic numbers)
+"""
+import codecs
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+
+SNIFF_BYTES = 8192  # อ่านแค่ต้นไฟล์ signature ทุกแบบอยู่ในช่วงนี้
+
+PDF = "application/pdf"
+DOC = "application/msword"
+DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP = "application/zip"
+PNG = "image/png"
+JPEG = "image/jpeg"
+GIF = "image/gif"
+TEXT = "text/plain; charset=utf-8"
+
+_SIGNATURES = [
+    (b"%PDF-", PDF),
+    (b"\x89PNG\r\n\x1a\n", PNG),
+    (b"\xff\xd8\xff", JPEG),
+    (b"GIF87a", GIF),
+    (b"GIF89a", GIF),
+    (b"PK\x03\x04", ZIP),
+    (b"PK\x05\x06", ZIP),  # zip ว่าง
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", DOC),  # OLE2 (Word 97-2003)
+]
+
+# ชนิดที่ยอมรับต่อ extension (docx เป็น zip ที่มีโครงสร้างของ Office)
+_EXPECTED_TYPES = {
+    ".pdf": {PDF},
+    ".doc": {DOC},
+    ".docx": {ZIP},
+    ".zip": {ZIP},
+    ".jpg": {JPEG},
+    ".jpeg": {JPEG},
+    ".png": {PNG},
+    ".gif": {GIF},
+    ".txt": {TEXT},
+}
+
+def _is_utf8_text(head: bytes) -> bool:
+    """UTF-8 ถูกต้องและไม่มี NUL (ตัวอักษรหลายไบต์ที่ถูกตัดท้าย head ไม่นับว่าผิด)"""
+    if b"\x00" in head:
+        return False
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def detect_content_type(head: bytes) -> Optional[str]:
+    """MIME type จาก signature ต้นไฟล์ ถ้าไม่รู้จักคืน None"""
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if _is_utf8_text(head):
+        return TEXT
+    return None
+
+def sniff_content_type(head: bytes, file_name: str) -> str:
+    """ตรวจว่าเนื้อหาตรงกับ extension (กันไฟล์ที่แค่เปลี่ยนชื่อ) คืน MIME type ที่จะบันทึก"""
+    extension = Path(file_name).suffix.lower()
+    detected = detect_content_type(head)
+    if detected is None or detected not in _EXPECTED_TYPES.get(extension, ()):
+        raise HTTPException(status_code=400, detail="File content does not match its extension")
+    if extension == ".docx":
+        return DOCX
+    return detected
@@ -0,0 +1,128 @@
+"""
+CORS at the ASGI layer: preflights are answered from precomputed headers before routing
+"""
+import os
+from typing import Optional
+
+ALLOWED_ORIGINS = [
+    origin.strip()
+    for origin in os.getenv("ALLOWED_ORIGINS", "http://localhost:3000,http://localhost:3001").split(",")
+    if origin.strip()
+]
+CORS_ALLOW_METHODS = os.getenv("CORS_ALLOW_METHODS", "GET, POST, PUT, PATCH, DELETE, OPTIONS")
+# "*" ตอบกลับ header ที่ browser ขอมา (เช่น Range, If-Range ของ /files) แทน wildcard ที่ใช้กับ credentials ไม่ได้
+CORS_ALLOW_HEADERS = os.getenv("CORS_ALLOW_HEADERS", "*")
+CORS_ALLOW_CREDENTIALS = os.getenv("CORS_ALLOW_CREDENTIALS", "true").lower() == "true"
+# browser เก็บผล preflight ไว้นานเท่านี้ (Chrome ตัดที่ 7200 วินาที, Firefox 86400)
+CORS_MAX_AGE = int(os.getenv("CORS_MAX_AGE", "86400"))
+
+class CORSConfig:
+    """header ที่คำนวณไว้ครั้งเดียว ต่อคำขอเหลือแค่ตรวจ origin แล้วต่อ Access-Control-Allow-Origin"""
+
+    def __init__(
+        self,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_methods: str = CORS_ALLOW_METHODS,
+        allow_headers: str = CORS_ALLOW_HEADERS,
+        allow_credentials: bool = CORS_ALLOW_CREDENTIALS,
+        max_age: int = CORS_MAX_AGE,
+    ):
+        self.allow_all_origins = "*" in allow_origins
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_methods = frozenset(method.strip().upper() for method in allow_methods.split(","))
+        self.echo_request_headers = allow_headers.strip() == "*"
+        self.simple_headers = [(b"access-control-allow-credentials", b"true")] if allow_credentials else []
+        self.preflight_headers = self.simple_headers + [
+            (b"access-control-allow-methods", allow_methods.encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"content-length", b"0"),
+        ]
+        if self.echo_request_headers:
+            self.preflight_headers.append((b"vary", b"Origin, Access-Control-Request-Headers"))
+        else:
+            self.preflight_headers += [
+                (b"vary", b"Origin"),
+                (b"access-control-allow-headers", allow_headers.encode("latin-1")),
+            ]
+
+    def preflight_response_headers(self, origin: bytes, request_headers: Optional[bytes]) -> list:
+        headers = self.preflight_headers + [(b"access-control-allow-origin", origin)]
+        if self.echo_request_headers and request_headers:
+            headers.append((b"access-control-allow-headers", request_headers))
+        return headers
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        return self.allow_all_origins or origin in self.allow_origins
+
+    def response_headers(self, origin: str) -> dict:
+        """header สำหรับ response ที่ไม่ได้ผ่าน ASGI (เช่น error ของ Lambda handler) ว่างถ้า origin ไม่ได้รับอนุญาต"""
+        if not origin or not self.is_allowed_origin(origin):
+            return {}
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in self.simple_headers}
+        headers["access-control-allow-origin"] = origin
+        headers["vary"] = "Origin"
+        return headers
+
+cors_config = CORSConfig()
+
+class CORSMiddleware:
+    """ASGI middleware ชั้นเดียวที่ใช้ทั้ง uvicorn และ Mangum
+
+    preflight (OPTIONS + Access-Control-Request-Method) ตอบ 204 ทันที ไม่ผ่าน router, dependency
+    หรือฐานข้อมูล response อื่นที่มี Origin ได้ Access-Control-Allow-Origin เพิ่มตอนส่ง header
+    """
+
+    def __init__(self, app, config: CORSConfig = cors_config):
+        self.app = app
+        self.config = config
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed = self.config.is_allowed_origin(origin.decode("latin-1"))
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            if allowed and request_method.decode("latin-1").upper() in self.config.allow_methods:
+                await self._respond(send, 204, self.config.preflight_response_headers(origin, request_headers))
+            else:
+                await self._respond(send, 400, [(b"content-length", b"0")])
+            return
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+
+        extra_headers = self.config.simple_headers + [(b"access-control-allow-origin", origin)]
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = []
+                vary = b"Origin"
+                for name, value in message.get("headers", []):
+                    lowered = name.lower()
+                    if lowered == b"vary":
+                        vary = value + b", Origin"
+                    elif not lowered.startswith(b"access-control-allow-"):
+                        headers.append((name, value))
+                message["headers"] = headers + extra_headers + [(b"vary", vary)]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    @staticmethod
+    async def _respond(send, status: int, headers: list) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
@@ -1,19 +1,97 @@
+import hashlib
 import os
-import shutil
-from fastapi import UploadFile, HTTPException
-from typing import Optional
 import uuid
+from collections import Counter
+from dataclasses import dataclass
+from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from functools import lru_cache
+from typing import AsyncIterator, BinaryIO, Iterable, Optional, Tuple
 from pathlib import Path
 
+from ..models.assignment import Assignment, Submission
+from ..models.file_blob import FileBlob
+from .auth import SECRET_KEY
+from .content_type import SNIFF_BYTES, sniff_content_type
+from .quota import charge_storage, release_storage_statements
+from .storage import (
+    STORAGE_BACKEND, S3_BUCKET_NAME, AWS_REGION, S3_ENDPOINT_URL, S3_PUBLIC_BASE_URL,
+    PRESIGNED_URL_EXPIRE_SECONDS, StorageBackend, LocalStorage, S3Storage,
+)
+
 # Configuration
 UPLOAD_DIR = Path("uploads")
-SUBMISSIONS_DIR = UPLOAD_DIR / "submissions"
-MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+SUBMISSIONS_DIR = UPLOAD_DIR / "submissions"  # ไฟล์แบบเดิม (ชื่อไม่ซ้ำต่อการอัปโหลด)
+BLOBS_PREFIX = "blobs"  # key ของไฟล์แบบ content-addressed ตาม SHA-256
+BLOBS_DIR = UPLOAD_DIR / BLOBS_PREFIX
+# จำนวนชั้นของโฟลเดอร์ย่อยตาม prefix ของ hash (2 ชั้น = 65,536 โฟลเดอร์)
+UPLOAD_SHARD_DEPTH = int(os.getenv("UPLOAD_SHARD_DEPTH", "2"))
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE_MB", "10")) * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # อ่าน/เขียนทีละ 1MB
 ALLOWED_EXTENSIONS = {".pdf", ".doc", ".docx", ".txt", ".zip", ".jpg", ".jpeg", ".png", ".gif"}
 
-# Ensure directories exist
-UPLOAD_DIR.mkdir(exist_ok=True)
-SUBMISSIONS_DIR.mkdir(exist_ok=True)
+
+# INSERT ... ON CONFLICT ตาม dialect (ใช้ใน blob_reference_upsert)
+_UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+@dataclass(frozen=True)
+class SavedFile:
+    """ผลการบันทึกไฟล์อัปโหลด"""
+    file_url: str
+    storage_key: str
+    size: int
+    sha256: str
+    deduplicated: bool = False  # มี blob เดิมอยู่แล้ว ไม่ได้เขียนไฟล์ใหม่
+    content_type: Optional[str] = None  # MIME type จาก magic bytes
+
+def ensure_upload_dirs() -> None:
+    """สร้างโฟลเดอร์ uploads (เรียกตอน startup ของ server ไม่ทำตอน import: filesystem ของ Lambda อ่านได้อย่างเดียว)"""
+    for directory in (UPLOAD_DIR, SUBMISSIONS_DIR, BLOBS_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+
+@lru_cache(maxsize=None)
+def get_storage() -> StorageBackend:
+    """ที่เก็บไฟล์ตาม STORAGE_BACKEND (สร้างครั้งเดียวต่อ process)"""
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET_NAME, AWS_REGION, S3_ENDPOINT_URL, S3_PUBLIC_BASE_URL)
+    return LocalStorage(UPLOAD_DIR, "/uploads", SECRET_KEY)
+
+def blob_key(sha256: str, file_name: str) -> str:
+    """key ของ blob: blobs/ab/cd/<sha256><ext> (ใช้ extension ของไฟล์แรกที่อัปโหลด)
+
+    แบ่งโฟลเดอร์ตาม prefix ของ hash ไม่ให้มีไฟล์นับแสนในโฟลเดอร์เดียว
+    """
+    shards = [sha256[level * 2:level * 2 + 2] for level in range(UPLOAD_SHARD_DEPTH)]
+    return "/".join([BLOBS_PREFIX, *shards, f"{sha256}{Path(file_name).suffix.lower()}"])
+
+def submission_storage_key(file_url: Optional[str], blob_storage_path: Optional[str]) -> Optional[str]:
+    """key ของไฟล์ submission: จาก blob ถ้ามี ไม่งั้นแปลงจาก file_url แบบเดิม (/uploads/...)"""
+    if blob_storage_path:
+        return blob_storage_path
+    if file_url and file_url.startswith("/uploads/"):
+        return file_url[len("/uploads/"):]
+    return None
+
+def resolve_local_key(storage: LocalStorage, key: str) -> str:
+    """รองรับทั้ง layout เดิม (แบน) และแบบ shard ระหว่างย้ายไฟล์ (blocking)
+
+    ถ้าไม่มีไฟล์ที่ key เดิมแต่มีที่ตำแหน่ง shard แล้ว (ย้ายไปแล้วแต่ผู้เรียกอ่าน key เก่ามา) ใช้ตำแหน่งใหม่
+    """
+    if storage.path(key).exists():
+        return key
+    name = Path(key).name
+    sha256 = name.split(".", 1)[0]
+    if len(sha256) == 64:
+        sharded = blob_key(sha256, name)
+        if storage.path(sharded).exists():
+            return sharded
+    return key
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(status_code=400, detail=f"File size too large (max {MAX_FILE_SIZE // (1024*1024)}MB)")
 
 def validate_file(file: UploadFile) -> bool:
     """ตรวจสอบไฟล์ที่อัปโหลด"""
@@ -21,59 +99,282 @@ def validate_file(file: UploadFile) -> bool:
         return False
     
     # ตรวจสอบขนาดไฟล์
+    # (multipart แบบ chunked มักไม่มี size จึงตรวจซ้ำระหว่างเขียนไฟล์ด้วย HashingReader)
     if file.size and file.size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"File size too large (max {MAX_FILE_SIZE // (1024*1024)}MB)")
+        raise _file_too_large()
     
-    # ตรวจสอบ extension
-    file_ext = Path(file.filename).suffix.lower()
+    validate_file_name(file.filename)
+    return True
+
+def validate_file_name(file_name: str) -> None:
+    """ตรวจสอบ extension"""
+    file_ext = Path(file_name).suffix.lower()
     if file_ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
             detail=f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"
         )
-    
-    return True
 
-def save_submission_file(file: UploadFile, assignment_id: int, student_id: int) -> tuple[str, str]:
-    """บันทึกไฟล์ submission และส่งคืน file_url และ file_path"""
+class HashingReader:
+    """ห่อ source ให้นับขนาด คำนวณ SHA-256 และเก็บต้นไฟล์ไว้ตรวจชนิด ระหว่างที่ storage อ่านไปเขียน
+
+    upload ถูกอ่านรอบเดียว และหยุดทันทีเมื่อรวมแล้วเกิน MAX_FILE_SIZE (storage ลบไฟล์ที่เขียนไม่ครบเอง)
+    """
+
+    def __init__(self, source: BinaryIO):
+        self.source = source
+        self.size = 0
+        self.head = b""
+        self._digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        self.size += len(chunk)
+        if self.size > MAX_FILE_SIZE:
+            raise _file_too_large()
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self._digest.update(chunk)
+        return chunk
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+def staging_key() -> str:
+    """key ชั่วคราวของไฟล์ที่ยังไม่รู้ hash (ไม่มี SHA-256 ในชื่อ GC จึงลบที่ค้างจาก process ที่ล้มไปได้)"""
+    return f"{BLOBS_PREFIX}/.incoming-{uuid.uuid4().hex}.part"
+
+def blob_reference_upsert(dialect: str, sha256: str, size: int, key: str):
+    """INSERT ... ON CONFLICT ที่สร้าง blob หรือเพิ่ม ref_count แบบ atomic พร้อมตั้ง last_referenced_at
+
+    ถ้า GC กำลังลบแถวนี้อยู่ statement จะรอ lock แล้วสร้างแถวใหม่ ผู้เรียกต้องตรวจว่าไฟล์ยังอยู่หลังจากนี้
+    """
+    return (
+        _UPSERT_INSERTS[dialect](FileBlob)
+        .values(sha256=sha256, size=size, storage_path=key, ref_count=1, last_referenced_at=func.now())
+        .on_conflict_do_update(
+            index_elements=[FileBlob.sha256],
+            set_={"ref_count": FileBlob.ref_count + 1, "last_referenced_at": func.now()},
+        )
+    )
+
+async def _add_blob_reference(db: AsyncSession, sha256: str, size: int, key: str) -> None:
+    """สร้าง blob หรือเพิ่ม ref_count (ยังไม่ commit)"""
+    await db.execute(blob_reference_upsert(db.get_bind().dialect.name, sha256, size, key))
+
+async def _attach_staged(
+    db: AsyncSession, storage: StorageBackend, blob: Optional[FileBlob], key: str, staged: str, sha256: str, size: int
+) -> bool:
+    """ผูกไฟล์ที่ stage ไว้เข้ากับ blob คืน True ถ้าใช้ไฟล์ของ blob เดิม (ผู้เรียกลบ staged เอง)
+
+    GC อาจลบ blob ไประหว่าง db.get กับ upsert จึงตรวจไฟล์ซ้ำหลัง upsert (ตอนนั้นแถวถูก lock แล้ว)
+    และย้ายไฟล์ที่ stage ไว้เข้าที่แทนถ้าไฟล์ของ blob หายไป
+    """
+    deduplicated = blob is not None and await run_in_threadpool(storage.size, key) is not None
+    if not deduplicated:
+        await run_in_threadpool(storage.move, staged, key)
+    await _add_blob_reference(db, sha256, size, key)
+    if deduplicated and await run_in_threadpool(storage.size, key) is None:
+        await run_in_threadpool(storage.move, staged, key)
+        deduplicated = False
+    return deduplicated
+
+async def save_submission_file(
+    db: AsyncSession, file: UploadFile, charge_to: Optional[Tuple[int, Optional[int]]] = None
+) -> SavedFile:
+    """บันทึกไฟล์ submission ที่แนบมากับคำขอ (ผู้เรียกต้อง commit เอง)"""
     if not validate_file(file):
         raise HTTPException(status_code=400, detail="Invalid file")
-    
-    # สร้างชื่อไฟล์ที่ unique
-    file_ext = Path(file.filename).suffix.lower()
-    unique_filename = f"{assignment_id}_{student_id}_{uuid.uuid4().hex[:8]}{file_ext}"
-    
-    # สร้างเส้นทางไฟล์
-    file_path = SUBMISSIONS_DIR / unique_filename
-    
+    return await store_file(db, file.file, file.filename, charge_to)
+
+async def store_file(
+    db: AsyncSession, source: BinaryIO, file_name: str, charge_to: Optional[Tuple[int, Optional[int]]] = None
+) -> SavedFile:
+    """บันทึกไฟล์แบบ content-addressed
+
+    เขียนลง key ชั่วคราวพร้อม hash ในรอบเดียว แล้วย้ายไปที่ key ของ blob
+    ถ้ามี blob เนื้อหาเดียวกันอยู่แล้วจะทิ้งไฟล์ชั่วคราว แค่เพิ่ม ref_count
+    ชนิดไฟล์ตรวจจากต้นไฟล์ เนื้อหาที่ไม่ตรงกับ extension ไม่ถูกเก็บไว้
+    charge_to = (user_id, course_id) นับขนาดที่วัดได้จริงเข้าโควตาก่อนย้ายไฟล์เข้า blob
+    (UploadFile.size ของ multipart แบบ chunked เชื่อไม่ได้ จึงไม่ใช้ตรวจโควตา)
+    (อยู่ใน transaction เดียวกับ Submission ผู้เรียกต้อง commit เอง)
+    การอ่าน/เขียนไฟล์ทำใน threadpool ไม่บล็อก event loop
+    """
+    storage = get_storage()
+    reader = HashingReader(source)
+    staged = staging_key()
     try:
-        # บันทึกไฟล์
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # สร้าง URL สำหรับเข้าถึงไฟล์
-        file_url = f"/uploads/submissions/{unique_filename}"
-        
-        return file_url, str(file_path)
+        await run_in_threadpool(storage.save, staged, reader)
+        size, sha256 = reader.size, reader.sha256
+        content_type = sniff_content_type(reader.head, file_name)
+        if charge_to is not None:
+            await charge_storage(db, *charge_to, size)
         
+        blob = await db.get(FileBlob, sha256)
+        key = blob.storage_path if blob else blob_key(sha256, file_name)
+        deduplicated = await _attach_staged(db, storage, blob, key, staged, sha256, size)
+    except HTTPException:
+        raise
     except Exception as e:
-        # ลบไฟล์ถ้าเกิดข้อผิดพลาด
-        if file_path.exists():
-            file_path.unlink()
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
+    finally:
+        await run_in_threadpool(storage.delete, staged)
+    
+    # สร้าง URL สำหรับเข้าถึงไฟล์
+    return SavedFile(
+        file_url=storage.file_url(key),
+        storage_key=key,
+        size=size,
+        sha256=sha256,
+        deduplicated=deduplicated,
+        content_type=content_type,
+    )
 
-def delete_submission_file(file_url: str) -> bool:
-    """ลบไฟล์ submission"""
+async def stream_body_to_file(stream: AsyncIterator[bytes], destination: Path, max_size: int) -> tuple[int, str]:
+    """เขียน body ที่ทยอยเข้ามา (เช่น request.stream()) ลงไฟล์ พร้อมนับขนาดและ SHA-256
+
+    เขียนใน threadpool ทีละ chunk และหยุดทันทีเมื่อเกิน max_size (ลบไฟล์ทิ้ง)
+    """
+    buffer = await run_in_threadpool(open, destination, "wb")
+    digest = hashlib.sha256()
+    size = 0
     try:
-        if file_url.startswith("/uploads/submissions/"):
-            filename = file_url.split("/")[-1]
-            file_path = SUBMISSIONS_DIR / filename
-            if file_path.exists():
-                file_path.unlink()
-                return True
-        return False
-    except Exception:
-        return False
+        async for chunk in stream:
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=400, detail="Upload is larger than expected")
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+        await run_in_threadpool(buffer.close)
+    except BaseException:
+        buffer.close()
+        destination.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+def pending_upload_key(user_id: int, sha256: str) -> str:
+    """key ที่ presigned PUT ของผู้ใช้คนนี้เขียนลง (ย้ายเข้า blob ตอนส่งงาน)
+
+    แยกตามผู้ใช้: การมีไฟล์ที่ key นี้คือหลักฐานว่าผู้ใช้อัปโหลดเนื้อหานี้เอง
+    อยู่ชั้นบนสุดของ blobs/ GC จึงลบที่ค้างเกินระยะผ่อนผันเหมือนสำเนาอื่นที่ไม่ใช่ storage_path
+    """
+    return f"{BLOBS_PREFIX}/.pending-{user_id}-{sha256}"
+
+async def _owns_blob(db: AsyncSession, user_id: int, sha256: str) -> bool:
+    """ผู้ใช้มี submission ที่อ้างถึง blob นี้อยู่แล้ว"""
+    return await db.scalar(
+        select(Submission.id).where(Submission.student_id == user_id, Submission.blob_sha256 == sha256).limit(1)
+    ) is not None
+
+async def presign_submission_upload(db: AsyncSession, user_id: int, file_name: str, size: int, sha256: str) -> dict:
+    """ออก presigned PUT ให้ client อัปโหลดตรงไปที่ storage
+
+    ไม่ต้องอัปโหลด (upload_required=False) เฉพาะเมื่อผู้ใช้มี blob เนื้อหาเดียวกันอยู่แล้ว
+    ผู้ใช้อื่นต้องอัปโหลดเองแม้จะมี blob อยู่: รู้แค่ hash ไม่พอให้ได้ไฟล์ของคนอื่นไป
+    """
+    validate_file_name(file_name)
+    if size > MAX_FILE_SIZE:
+        raise _file_too_large()
+    
+    if await db.get(FileBlob, sha256) is not None and await _owns_blob(db, user_id, sha256):
+        return {"sha256": sha256, "upload_required": False}
+    
+    upload = await run_in_threadpool(
+        get_storage().presigned_put, pending_upload_key(user_id, sha256), size, sha256, PRESIGNED_URL_EXPIRE_SECONDS
+    )
+    return {
+        "sha256": sha256,
+        "upload_required": True,
+        "upload_url": upload["url"],
+        "method": upload["method"],
+        "headers": upload["headers"],
+        "expires_in": PRESIGNED_URL_EXPIRE_SECONDS,
+    }
+
+async def register_uploaded_file(
+    db: AsyncSession, user_id: int, sha256: str, file_name: str, course_id: Optional[int] = None
+) -> SavedFile:
+    """บันทึก metadata ของไฟล์ที่ client อัปโหลดตรงไปแล้ว (ผู้เรียกต้อง commit เอง)
+
+    ใช้ไฟล์ที่ผู้ใช้อัปโหลดไว้ที่ pending_upload_key (เนื้อหาถูกตรวจกับ SHA-256 ตอนอัปโหลดแล้ว)
+    หรือ blob ที่ผู้ใช้อ้างถึงอยู่แล้วเท่านั้น
+    ชนิดไฟล์ตรวจจากต้นไฟล์ (ดึงแค่ SNIFF_BYTES ไบต์ ไม่ดึงทั้งไฟล์)
+    ขนาดจาก storage ถูกนับเข้าโควตาของผู้ใช้และ course_id ก่อนย้ายไฟล์เข้า blob
+    """
+    validate_file_name(file_name)
+    storage = get_storage()
+    
+    blob = await db.get(FileBlob, sha256)
+    key = blob.storage_path if blob else blob_key(sha256, file_name)
+    pending = pending_upload_key(user_id, sha256)
+    source = pending
+    size = await run_in_threadpool(storage.size, pending)
+    if size is None and blob is not None and await _owns_blob(db, user_id, sha256):
+        source = key
+        size = await run_in_threadpool(storage.size, key)
+    if size is None:
+        raise HTTPException(status_code=400, detail="Uploaded file not found")
+    if size > MAX_FILE_SIZE:
+        raise _file_too_large()
+    head = await run_in_threadpool(storage.read_head, source, SNIFF_BYTES)
+    content_type = sniff_content_type(head, file_name)
+    await charge_storage(db, user_id, course_id, size)
+    
+    if source == key:
+        await _add_blob_reference(db, sha256, size, key)
+        deduplicated = True
+    else:
+        deduplicated = await _attach_staged(db, storage, blob, key, pending, sha256, size)
+        await run_in_threadpool(storage.delete, pending)
+    
+    return SavedFile(
+        file_url=storage.file_url(key),
+        storage_key=key,
+        size=size,
+        sha256=sha256,
+        deduplicated=deduplicated,
+        content_type=content_type,
+    )
+
+async def submission_download_url(db: AsyncSession, submission: Submission) -> Optional[str]:
+    """URL สำหรับดาวน์โหลดไฟล์ของ submission
+
+    S3 ออก presigned GET ตรงจาก storage ส่วนดิสก์ของเครื่องใช้ /files/{id} ที่ตรวจสิทธิ์ทุกคำขอ
+    (/uploads ไม่ตรวจสิทธิ์และไม่ได้ mount เว้นแต่ตั้ง PUBLIC_UPLOADS=true)
+    """
+    blob = await db.get(FileBlob, submission.blob_sha256) if submission.blob_sha256 else None
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        key = submission_storage_key(submission.file_url, blob.storage_path if blob else None)
+        return f"/files/{submission.id}" if key else None
+    if blob is None:
+        return submission.file_url
+    return await run_in_threadpool(
+        storage.presigned_get, blob.storage_path, submission.file_name, PRESIGNED_URL_EXPIRE_SECONDS,
+        submission.content_type
+    )
+
+def submission_usage_query(*criteria):
+    """(student_id, course_id, file_size, blob_sha256) ของ submission ที่ตรงเงื่อนไข สำหรับ release_submission_statements"""
+    return (
+        select(Submission.student_id, Assignment.course_id, Submission.file_size, Submission.blob_sha256)
+        .join(Assignment, Assignment.id == Submission.assignment_id)
+        .where(*criteria)
+    )
+
+def release_submission_statements(rows: Iterable) -> list:
+    """UPDATE ที่คืนโควตาและลด ref_count ของ blob ให้ submission ที่กำลังจะถูกลบ (rows จาก submission_usage_query)
+
+    ทุกทางที่ลบ submission (assignment, หลักสูตร, ผู้ใช้) ต้อง execute ใน transaction เดียวกับการลบ
+    blob ที่ไม่มีผู้อ้างถึงแล้วและไฟล์แบบเดิมใน uploads/submissions ถูกลบโดย GC
+    """
+    rows = list(rows)
+    per_blob = Counter(row.blob_sha256 for row in rows if row.blob_sha256)
+    return release_storage_statements((row.student_id, row.course_id, row.file_size) for row in rows) + [
+        update(FileBlob).where(FileBlob.sha256 == sha256).values(ref_count=FileBlob.ref_count - count)
+        for sha256, count in per_blob.items()
+    ]
 
 def get_file_info(file_path: str) -> Optional[dict]:
     """ดูข้อมูลไฟล์"""
@@ -0,0 +1,129 @@
+"""
+Bounded executor for password hashing (bcrypt)
+"""
+import asyncio
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+T = TypeVar("T")
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "2"))
+# cost ของ bcrypt (log2 ของจำนวนรอบ) หาค่าที่เหมาะกับเครื่องได้ด้วย calibrate_bcrypt.py
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+class PasswordHashExecutor:
+    """รัน bcrypt ใน thread pool แยกที่จำกัดขนาดคิว
+
+    งาน hash ไม่ไปแย่ง threadpool หลักของ FastAPI และเมื่อคิวเต็มจะตอบ 503
+    พร้อม Retry-After ทันทีแทนที่จะปล่อยให้คำขออื่นรอ
+    """
+
+    def __init__(self, workers: int, queue_limit: int, retry_after: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._in_flight += 1
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self._record(started_at - submitted_at, time.perf_counter() - started_at)
+
+        try:
+            future = self._executor.submit(task)
+        except BaseException:
+            self._release()
+            raise
+        # นับจนงานใน executor จบจริง: คำขอที่ถูกยกเลิกระหว่างรอไม่ได้หยุด bcrypt ที่รันอยู่
+        # (งานที่ยังไม่เริ่มถูก cancel ไปด้วย และ callback ก็ถูกเรียกเช่นกัน)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future=None) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _record(self, wait: float, run: float) -> None:
+        with self._lock:
+            self._completed += 1
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._run_total += run
+
+    def stats(self) -> dict:
+        """สถิติสำหรับ monitoring (เวลาเป็นมิลลิวินาที)"""
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_ms_avg": round(self._wait_total / completed * 1000, 3),
+                "queue_wait_ms_max": round(self._wait_max * 1000, 3),
+                "hash_ms_avg": round(self._run_total / completed * 1000, 3),
+            }
+
+password_hasher = PasswordHashExecutor(
+    workers=PASSWORD_HASH_WORKERS,
+    queue_limit=PASSWORD_HASH_QUEUE_LIMIT,
+    retry_after=PASSWORD_HASH_RETRY_AFTER,
+)
+
+def measure_bcrypt_ms(rounds: int, samples: int = 3) -> float:
+    """เวลา (มิลลิวินาที, ค่ามัธยฐาน) ที่ใช้ hash หนึ่งครั้งด้วย cost ที่กำหนด"""
+    from passlib.hash import bcrypt
+    handler = bcrypt.using(rounds=rounds)
+    timings = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        handler.hash("calibration-password")
+        timings.append((time.perf_counter() - started_at) * 1000)
+    return statistics.median(timings)
+
+def calibrate_bcrypt_rounds(target_ms: float, samples: int = 3, max_rounds: int = 16) -> dict:
+    """หา cost สูงสุดที่ hash ได้ภายใน target_ms บนเครื่องนี้
+
+    เพิ่ม cost ทีละ 1 (เวลาเพิ่มประมาณเท่าตัว) และหยุดเมื่อเกินเป้า
+    ถ้าแม้แต่ค่าต่ำสุดก็เกินเป้า จะคืนค่าต่ำสุดของ bcrypt
+    """
+    timings = {}
+    from passlib.hash import bcrypt
+    rounds = bcrypt.min_rounds
+    for candidate in range(bcrypt.min_rounds, max_rounds + 1):
+        timings[candidate] = round(measure_bcrypt_ms(candidate, samples), 3)
+        if timings[candidate] > target_ms:
+            break
+        rounds = candidate
+    return {"rounds": rounds, "target_ms": target_ms, "timings_ms": timings}
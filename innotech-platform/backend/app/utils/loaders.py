@@ -0,0 +1,46 @@
+"""
+Loader profiles: eager-load options derived from response schemas
+"""
+from functools import lru_cache
+from typing import Optional, Tuple, Type, get_args
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload, undefer
+
+def _nested_schema(annotation) -> Optional[Type[BaseModel]]:
+    """หา response schema ที่ซ้อนอยู่ใน annotation เช่น List[X], Optional[X]"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+@lru_cache(maxsize=None)
+def loader_profile(model, schema: Type[BaseModel]) -> Tuple:
+    """สร้าง loader options ให้ทุก relationship และ deferred column ที่ schema ใช้
+
+    collection ใช้ selectinload (1 คิวรีต่อระดับ), many-to-one ใช้ joinedload
+    จำนวนคิวรีจึงคงที่ไม่ว่าจะมีกี่แถว และไม่เกิด lazy-load ระหว่าง serialize
+    """
+    mapper = inspect(model)
+    relationships = mapper.relationships
+    options = [
+        undefer(getattr(model, column.key))
+        for column in mapper.column_attrs
+        if column.deferred and column.key in schema.model_fields
+    ]
+    for name, field in schema.model_fields.items():
+        if name not in relationships:
+            continue
+        nested = _nested_schema(field.annotation)
+        if nested is None:
+            continue
+        relationship = relationships[name]
+        attribute = getattr(model, name)
+        loader = selectinload(attribute) if relationship.uselist else joinedload(attribute)
+        children = loader_profile(relationship.mapper.class_, nested)
+        options.append(loader.options(*children) if children else loader)
+    return tuple(options)
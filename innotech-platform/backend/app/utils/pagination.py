@@ -0,0 +1,56 @@
+"""
+Keyset (cursor) pagination shared by the list endpoints
+"""
+import base64
+import json
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+def encode_cursor(last_id: int) -> str:
+    """สร้าง cursor แบบ opaque จาก id ของแถวสุดท้ายในหน้า"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """อ่าน id จาก cursor (ค่าว่าง = หน้าแรก)"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        last_id = json.loads(raw)["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def paginate(query, column, skip: int, limit: int, cursor: Optional[str]):
+    """ใส่ pagination ให้ Query/Select
+
+    cursor=None คือโหมด offset เดิม (skip/limit) ส่วนเมื่อส่ง cursor มา
+    (ค่าว่างสำหรับหน้าแรก) จะเรียงตาม column และดึงแถวถัดจาก cursor
+    เผื่อไว้ 1 แถวเพื่อรู้ว่ายังมีหน้าถัดไปหรือไม่
+    """
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    if limit < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="limit must be at least 1"
+        )
+    last_id = decode_cursor(cursor)
+    if last_id is not None:
+        query = query.filter(column > last_id)
+    return query.order_by(column).limit(limit + 1)
+
+def page_response(items, limit: int, cursor: Optional[str]):
+    """ผลลัพธ์ของ paginate(): list เดิมในโหมด offset หรือ envelope {items, next_cursor}"""
+    if cursor is None:
+        return items
+    items = list(items)
+    next_cursor = encode_cursor(items[limit - 1].id) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
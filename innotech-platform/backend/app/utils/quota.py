@@ -0,0 +1,86 @@
+"""
+Storage quota accounting (usage counters on users and courses)
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.course import Course
+from ..models.user import User
+
+# 0 = ไม่จำกัด
+STORAGE_QUOTA_USER_BYTES = int(os.getenv("STORAGE_QUOTA_USER_MB", "500")) * 1024 * 1024
+STORAGE_QUOTA_COURSE_BYTES = int(os.getenv("STORAGE_QUOTA_COURSE_MB", "20480")) * 1024 * 1024
+
+def _quota_exceeded(scope: str, quota: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"{scope} storage quota exceeded (max {quota // (1024*1024)}MB)"
+    )
+
+def _within(column, size: int, quota: int):
+    """เงื่อนไขใน WHERE: ใช้เพิ่มแล้วไม่เกินโควตา (ตรวจและเพิ่มใน statement เดียว ไม่มี race)"""
+    return column + size <= quota if quota else true()
+
+async def check_storage_quota(db: AsyncSession, user_id: int, course_id: Optional[int], size: int) -> None:
+    """ตรวจล่วงหน้าก่อนรับไฟล์ (อ่าน counter ตาม primary key สองแถว ไม่ต้องรวมขนาดไฟล์ใหม่)
+
+    ไม่ได้จองพื้นที่ ค่าที่ผูกมัดคือ charge_storage ตอนสร้าง submission
+    """
+    if STORAGE_QUOTA_USER_BYTES:
+        used = await db.scalar(select(User.storage_used_bytes).where(User.id == user_id))
+        if (used or 0) + size > STORAGE_QUOTA_USER_BYTES:
+            raise _quota_exceeded("User", STORAGE_QUOTA_USER_BYTES)
+    if STORAGE_QUOTA_COURSE_BYTES and course_id is not None:
+        used = await db.scalar(select(Course.storage_used_bytes).where(Course.id == course_id))
+        if (used or 0) + size > STORAGE_QUOTA_COURSE_BYTES:
+            raise _quota_exceeded("Course", STORAGE_QUOTA_COURSE_BYTES)
+
+async def charge_storage(db: AsyncSession, user_id: int, course_id: Optional[int], size: int) -> None:
+    """เพิ่ม counter ของผู้ใช้และหลักสูตร (ยังไม่ commit: อยู่ใน transaction เดียวกับ Submission)
+
+    UPDATE ... WHERE used + size <= quota ถ้าไม่มีแถวถูกแก้แปลว่าเกินโควตา
+    """
+    if not size:
+        return
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, _within(User.storage_used_bytes, size, STORAGE_QUOTA_USER_BYTES))
+        .values(storage_used_bytes=User.storage_used_bytes + size)
+    )
+    if result.rowcount == 0:
+        raise _quota_exceeded("User", STORAGE_QUOTA_USER_BYTES)
+    if course_id is None:
+        return
+    result = await db.execute(
+        update(Course)
+        .where(Course.id == course_id, _within(Course.storage_used_bytes, size, STORAGE_QUOTA_COURSE_BYTES))
+        .values(storage_used_bytes=Course.storage_used_bytes + size)
+    )
+    if result.rowcount == 0:
+        raise _quota_exceeded("Course", STORAGE_QUOTA_COURSE_BYTES)
+
+def release_storage_statements(usages: Iterable[Tuple[int, Optional[int], Optional[int]]]) -> List:
+    """UPDATE ที่คืนพื้นที่ของ submission ที่ถูกลบ usages เป็น (user_id, course_id, file_size)
+
+    รวมยอดต่อผู้ใช้/หลักสูตรก่อน ลบหลาย submission พร้อมกันก็ UPDATE แถวละครั้ง
+    ใช้ผ่าน release_submission_statements ซึ่งลด ref_count ของ blob ไปพร้อมกัน
+    """
+    per_user: Dict[int, int] = {}
+    per_course: Dict[int, int] = {}
+    for user_id, course_id, size in usages:
+        if not size:
+            continue
+        per_user[user_id] = per_user.get(user_id, 0) + size
+        if course_id is not None:
+            per_course[course_id] = per_course.get(course_id, 0) + size
+    return [
+        update(model)
+        .where(model.id == owner_id)
+        .values(storage_used_bytes=model.storage_used_bytes - size)
+        for model, totals in ((User, per_user), (Course, per_course))
+        for owner_id, size in totals.items()
+    ]
@@ -0,0 +1,138 @@
+"""
+One-time schema bootstrap (Alembic upgrade guarded by a cached version check and an advisory lock)
+"""
+import os
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+# key ของ pg_advisory_lock ที่ทุก container ใช้ร่วมกัน (ค่าคงที่ใดก็ได้ที่ไม่ชนกับงานอื่น)
+SCHEMA_LOCK_KEY = 0x696E6E6F
+
+# ผู้ดูแลระบบคนแรก สร้างเฉพาะตอน bootstrap ฐานข้อมูลจริง (ว่าง = ไม่สร้าง)
+BOOTSTRAP_ADMIN_EMAIL = os.getenv("BOOTSTRAP_ADMIN_EMAIL", "")
+BOOTSTRAP_ADMIN_PASSWORD_HASH = os.getenv("BOOTSTRAP_ADMIN_PASSWORD_HASH", "")
+
+# ผลที่ได้จาก bootstrap_schema
+CURRENT = "current"
+UPGRADED = "upgraded"
+UNMANAGED = "unmanaged"
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def _alembic_config():
+    from alembic.config import Config
+    config = Config(str(ALEMBIC_INI))
+    # ไม่ให้ env.py เรียก fileConfig ทับ logging ของโปรเซสที่รันอยู่
+    config.attributes["configure_logger"] = False
+    return config
+
+@lru_cache(maxsize=None)
+def head_revision() -> str:
+    """revision ล่าสุดของโค้ดชุดนี้ (อ่านไฟล์ migration ครั้งเดียวต่อโปรเซส)"""
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory.from_config(_alembic_config()).get_current_head()
+
+def current_revision(connection: Connection) -> Optional[str]:
+    """revision ที่บันทึกใน alembic_version (ไม่มีตาราง = None) query เดียว ไม่มี DDL"""
+    from alembic.runtime.migration import MigrationContext
+    return MigrationContext.configure(connection).get_current_revision()
+
+@contextmanager
+def _advisory_lock(connection: Connection):
+    """ล็อกระดับ session ของ PostgreSQL: cold start พร้อมกันหลาย container ให้ migrate ได้ทีละตัว
+
+    SQLite ล็อกทั้งไฟล์ตอนเขียนอยู่แล้วจึงไม่ต้องทำอะไร
+    """
+    if connection.dialect.name != "postgresql":
+        yield
+        return
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    connection.commit()
+    try:
+        yield
+    finally:
+        connection.rollback()  # ถ้า upgrade ล้มกลางทาง transaction ต้องถูกยกเลิกก่อนปลดล็อก
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        connection.commit()
+
+def _upgrade(connection: Connection) -> None:
+    from alembic import command
+    config = _alembic_config()
+    config.attributes["connection"] = connection
+    command.upgrade(config, "head")
+
+def _seed_admin(connection: Connection, email: str, password_hash: str) -> None:
+    """สร้างผู้ดูแลระบบถ้ายังไม่มีอีเมลนี้"""
+    from ..models.user import User, UserRole
+    users = User.__table__
+    if connection.scalar(select(users.c.id).where(users.c.email == email)) is not None:
+        return
+    connection.execute(users.insert().values(
+        email=email,
+        hashed_password=password_hash,
+        first_name="Admin",
+        last_name="User",
+        role=UserRole.ADMIN,
+        is_active=True,
+        is_verified=True,
+    ))
+
+def bootstrap_schema(
+    engine: Engine,
+    admin_email: str = BOOTSTRAP_ADMIN_EMAIL,
+    admin_password_hash: str = BOOTSTRAP_ADMIN_PASSWORD_HASH,
+) -> str:
+    """อัปเกรด schema ถึง head ถ้ายังไม่ถึง คืน CURRENT, UPGRADED หรือ UNMANAGED
+
+    ฐานข้อมูลที่ถึง head แล้วเสีย SELECT จาก alembic_version ครั้งเดียว
+    ฐานข้อมูลที่มีตารางแต่ไม่มี alembic_version (สร้างด้วย create_all/SQL มือ) ไม่ถูกแตะ
+    ต้องตรวจ schema แล้ว alembic stamp เอง เพราะ upgrade จาก base จะชนกับตารางที่มีอยู่
+    """
+    head = head_revision()
+    with engine.connect() as connection:
+        if current_revision(connection) == head:
+            return CURRENT
+        with _advisory_lock(connection):
+            # ตรวจซ้ำหลังได้ล็อก: container อื่นอาจ migrate เสร็จระหว่างที่รออยู่
+            revision = current_revision(connection)
+            if revision == head:
+                return CURRENT
+            if revision is None and inspect(connection).has_table("users"):
+                return UNMANAGED
+            _upgrade(connection)
+            if admin_email and admin_password_hash:
+                _seed_admin(connection, admin_email, admin_password_hash)
+            connection.commit()
+    return UPGRADED
+
+def ensure_schema(engine: Optional[Engine] = None) -> None:
+    """bootstrap_schema ครั้งเดียวต่อโปรเซส (container) คำขอถัดไปไม่แตะฐานข้อมูลเลย
+
+    ถ้าล้มเหลว (เช่นต่อฐานข้อมูลไม่ได้) จะลองใหม่ในคำขอถัดไป
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        if engine is None:
+            from ..database import engine
+            result = bootstrap_schema(engine)
+            # คำขอใช้ async engine: ไม่เก็บ connection ของ sync engine ค้างไว้ใน container
+            engine.dispose()
+        else:
+            result = bootstrap_schema(engine)
+        if result == UNMANAGED:
+            print("⚠️ Database has tables but no alembic_version: verify the schema and run `alembic stamp head`")
+        elif result == UPGRADED:
+            print(f"✅ Database schema upgraded to {head_revision()}")
+        _schema_ready = True
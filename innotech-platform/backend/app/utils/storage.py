@@ -0,0 +1,264 @@
+"""
+Storage backends for uploaded files (local filesystem / S3-compatible)
+"""
+import base64
+import hashlib
+import hmac
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Optional
+from urllib.parse import urlencode
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local | s3
+S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "")
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+# เช่น http://localhost:9000 สำหรับ MinIO ตอนพัฒนา/ทดสอบ
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# URL สาธารณะของ bucket (เช่น CloudFront) ถ้าไม่มีจะใช้ s3://bucket/key เป็น file_url
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL", "")
+PRESIGNED_URL_EXPIRE_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRE_SECONDS", "900"))
+
+def sha256_to_base64(sha256: str) -> str:
+    """แปลง SHA-256 แบบ hex เป็น base64 (รูปแบบของ header x-amz-checksum-sha256)"""
+    return base64.b64encode(bytes.fromhex(sha256)).decode()
+
+def validate_key(key: str) -> str:
+    """key ต้องเป็น path แบบ relative ที่ไม่มี .. (กันการเขียนออกนอก root)"""
+    path = PurePosixPath(key)
+    if not key or path.is_absolute() or ".." in path.parts:
+        raise ValueError(f"Invalid storage key: {key}")
+    return path.as_posix()
+
+class StorageBackend:
+    """อินเทอร์เฟซของที่เก็บไฟล์ key เป็น path แบบ posix เช่น blobs/<sha256>.zip
+
+    ทุกเมธอดเป็น blocking (I/O ดิสก์หรือเครือข่าย) ต้องเรียกผ่าน threadpool
+    """
+
+    def size(self, key: str) -> Optional[int]:
+        """ขนาดไฟล์ หรือ None ถ้าไม่มี"""
+        raise NotImplementedError
+
+    def save(self, key: str, source: BinaryIO) -> None:
+        raise NotImplementedError
+
+    def move(self, source_key: str, key: str) -> None:
+        """ย้ายไฟล์ไปที่ key ใหม่ (ทับไฟล์เดิมถ้ามี) โดยไม่ส่งเนื้อหาผ่าน API"""
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        """เปิดอ่านแบบ stream (ต้อง close เอง)"""
+        raise NotImplementedError
+
+    def read_head(self, key: str, length: int) -> bytes:
+        """อ่านเฉพาะ length ไบต์แรก (ใช้ตรวจชนิดไฟล์โดยไม่ดึงทั้งไฟล์)"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def file_url(self, key: str) -> str:
+        """URL ที่บันทึกใน Submission.file_url"""
+        raise NotImplementedError
+
+    def presigned_put(self, key: str, size: int, sha256: str, expires_in: int) -> dict:
+        """URL สำหรับให้ client อัปโหลดตรง คืน {url, method, headers}
+
+        ผูกกับขนาดและ SHA-256 ที่ประกาศไว้ ที่เก็บจะปฏิเสธเนื้อหาที่ไม่ตรง
+        """
+        raise NotImplementedError
+
+    def presigned_get(
+        self, key: str, file_name: Optional[str], expires_in: int, content_type: Optional[str] = None
+    ) -> str:
+        """URL สำหรับให้ client ดาวน์โหลดตรง"""
+        raise NotImplementedError
+
+class LocalStorage(StorageBackend):
+    """เก็บไฟล์ในดิสก์ของเครื่อง API (สำหรับพัฒนาและ deploy แบบเครื่องเดียว)
+
+    presigned PUT ชี้กลับมาที่ PUT /storage/{key} ซึ่งตรวจลายเซ็น HMAC
+    ไม่มี presigned GET: ดาวน์โหลดผ่าน /files/{submission_id} ที่ตรวจสิทธิ์
+    """
+
+    def __init__(self, root: Path, base_url: str, secret: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+        self.secret = secret.encode()
+
+    def path(self, key: str) -> Path:
+        return self.root / validate_key(key)
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def save(self, key: str, source: BinaryIO) -> None:
+        """เขียนลงไฟล์ชั่วคราวแล้ว rename (ผู้อ่านจะไม่เห็นไฟล์ที่เขียนไม่ครบ)"""
+        destination = self.path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.partial_path(key)
+        try:
+            with open(partial, "wb") as buffer:
+                shutil.copyfileobj(source, buffer)
+            os.replace(partial, destination)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+
+    def move(self, source_key: str, key: str) -> None:
+        destination = self.path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(self.path(source_key), destination)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def read_head(self, key: str, length: int) -> bytes:
+        with open(self.path(key), "rb") as source:
+            return source.read(length)
+
+    def partial_path(self, key: str) -> Path:
+        """ไฟล์ชั่วคราวข้าง ๆ ปลายทาง (rename ภายใน filesystem เดียวกัน)"""
+        destination = self.path(key)
+        return destination.with_name(f".{destination.name}.{uuid.uuid4().hex[:8]}.part")
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def file_url(self, key: str) -> str:
+        return f"{self.base_url}/{validate_key(key)}"
+
+    def _signature(self, key: str, size: int, sha256: str, expires: int) -> str:
+        message = f"PUT\n{key}\n{size}\n{sha256}\n{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def presigned_put(self, key: str, size: int, sha256: str, expires_in: int) -> dict:
+        key = validate_key(key)
+        expires = int(time.time()) + expires_in
+        query = urlencode({
+            "size": size,
+            "sha256": sha256,
+            "expires": expires,
+            "signature": self._signature(key, size, sha256, expires),
+        })
+        return {
+            "url": f"/storage/{key}?{query}",
+            "method": "PUT",
+            "headers": {"Content-Type": "application/octet-stream"},
+        }
+
+    def verify_put(self, key: str, size: int, sha256: str, expires: int, signature: str) -> bool:
+        """ตรวจลายเซ็นและเวลาหมดอายุของ URL จาก presigned_put"""
+        if expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, size, sha256, expires), signature)
+
+class S3Storage(StorageBackend):
+    """เก็บไฟล์ใน S3 หรือบริการที่เข้ากันได้ (MinIO ฯลฯ ผ่าน endpoint_url)"""
+
+    def __init__(
+        self,
+        bucket: str,
+        region: str,
+        endpoint_url: Optional[str] = None,
+        public_base_url: str = "",
+        client=None,
+    ):
+        if client is None:
+            import boto3
+            from botocore.config import Config
+            client = boto3.client(
+                "s3",
+                region_name=region,
+                endpoint_url=endpoint_url,
+                config=Config(signature_version="s3v4"),
+            )
+        self.client = client
+        self.bucket = bucket
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=validate_key(key))["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def save(self, key: str, source: BinaryIO) -> None:
+        self.client.upload_fileobj(source, self.bucket, validate_key(key))
+
+    def move(self, source_key: str, key: str) -> None:
+        # copy ฝั่ง S3 (ไม่เกิน 5GB ต่อ object มากกว่า MAX_FILE_SIZE อยู่แล้ว)
+        self.client.copy_object(
+            Bucket=self.bucket, Key=validate_key(key), CopySource={"Bucket": self.bucket, "Key": validate_key(source_key)}
+        )
+        self.client.delete_object(Bucket=self.bucket, Key=validate_key(source_key))
+
+    def open(self, key: str) -> BinaryIO:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=validate_key(key))["Body"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def read_head(self, key: str, length: int) -> bytes:
+        from botocore.exceptions import ClientError
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=validate_key(key), Range=f"bytes=0-{length - 1}")
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code == "InvalidRange":
+                return b""  # object ว่าง
+            if code in ("404", "NoSuchKey", "NotFound"):
+                raise FileNotFoundError(key) from e
+            raise
+        with response["Body"] as body:
+            return body.read()
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=validate_key(key))
+
+    def file_url(self, key: str) -> str:
+        key = validate_key(key)
+        if self.public_base_url:
+            return f"{self.public_base_url}/{key}"
+        return f"s3://{self.bucket}/{key}"
+
+    def presigned_put(self, key: str, size: int, sha256: str, expires_in: int) -> dict:
+        checksum = sha256_to_base64(sha256)
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": validate_key(key),
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=expires_in,
+        )
+        # content-length และ x-amz-checksum-sha256 อยู่ใน SignedHeaders: S3 ตรวจทั้งขนาดและเนื้อหา
+        return {
+            "url": url,
+            "method": "PUT",
+            "headers": {"Content-Length": str(size), "x-amz-checksum-sha256": checksum},
+        }
+
+    def presigned_get(
+        self, key: str, file_name: Optional[str], expires_in: int, content_type: Optional[str] = None
+    ) -> str:
+        params = {"Bucket": self.bucket, "Key": validate_key(key)}
+        if file_name:
+            params["ResponseContentDisposition"] = 'attachment; filename="{}"'.format(file_name.replace('"', ""))
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_in)
@@ -0,0 +1,372 @@
+"""
+Garbage collection of orphaned upload files (merge-diff of disk listing against the database)
+"""
+import heapq
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+from sqlalchemy import and_, delete, exists, func, select
+from sqlalchemy.orm import Session
+
+from ..models.assignment import Submission
+from ..models.file_blob import FileBlob
+from ..models.upload_session import UploadSession
+from .chunked_upload import UPLOAD_STAGING_DIR, discard_staging
+from .file_handler import BLOBS_PREFIX, SUBMISSIONS_DIR
+from .storage import LocalStorage
+
+# ไฟล์ที่อายุน้อยกว่านี้ไม่ถูกลบ (อาจเป็นการอัปโหลดที่ยังไม่ commit)
+UPLOAD_GC_GRACE_HOURS = int(os.getenv("UPLOAD_GC_GRACE_HOURS", "24"))
+# ชื่อไฟล์ที่เรียงในหน่วยความจำต่อครั้ง โฟลเดอร์ที่ใหญ่กว่านี้ถูกเรียงเป็นชุดแล้วพักลงไฟล์ชั่วคราว
+# (ไฟล์ชั่วคราวเปิดพร้อมกัน = จำนวนไฟล์ / ค่านี้)
+UPLOAD_GC_SORT_RUN_SIZE = int(os.getenv("UPLOAD_GC_SORT_RUN_SIZE", "100000"))
+
+_SHA256_PATTERN = re.compile(r"[0-9a-f]{64}")
+# เรียง string แบบ byte เหมือน sorted() ของ Python ไม่ขึ้นกับ locale ของฐานข้อมูล
+_BINARY_COLLATIONS = {"postgresql": "C", "sqlite": "BINARY"}
+
+@dataclass(frozen=True)
+class DiskFile:
+    key: str  # path แบบ posix เทียบกับ root ของ storage
+    sort_key: str
+    size: int
+    changed_at: float  # max(mtime, ctime): hard link ใหม่จาก migration ยังนับว่าเพิ่งเปลี่ยน
+
+def _new_stats() -> dict:
+    return {"scanned": 0, "orphans": 0, "deleted": 0, "reclaimed_bytes": 0, "missing": 0}
+
+def _disk_file(root: Path, path: Path, sort_key: str) -> Optional[DiskFile]:
+    """stat ไฟล์ที่ได้จาก listing (None ถ้าถูกลบไปแล้วระหว่างนั้น)"""
+    try:
+        stat_result = path.lstat()
+    except FileNotFoundError:
+        return None
+    return DiskFile(
+        key=path.relative_to(root).as_posix(),
+        sort_key=sort_key,
+        size=stat_result.st_size,
+        changed_at=max(stat_result.st_mtime, stat_result.st_ctime),
+    )
+
+def _blob_sort_key(name: str) -> str:
+    match = _SHA256_PATTERN.search(name)
+    return match.group(0) if match else ""
+
+def _spill(run: list, stack: ExitStack) -> BinaryIO:
+    spill_file = stack.enter_context(tempfile.TemporaryFile())
+    for record in run:
+        pickle.dump(record, spill_file)
+    spill_file.seek(0)
+    return spill_file
+
+def _read_spill(spill_file: BinaryIO) -> Iterator[Tuple[str, str]]:
+    while True:
+        try:
+            yield pickle.load(spill_file)
+        except EOFError:
+            return
+
+def iter_sorted_files(directory: Path, sort_key: Callable[[str], str], run_size: int) -> Iterator[Tuple[str, str]]:
+    """(sort_key, name) ของไฟล์ในโฟลเดอร์เดียว เรียงตาม sort_key แล้วตามชื่อ
+
+    external sort: อ่าน scandir ทีละ run_size ชื่อ เรียงแล้วพักลงไฟล์ชั่วคราว แล้ว merge ทุกชุด
+    หน่วยความจำจึงขึ้นกับ run_size ไม่ใช่จำนวนไฟล์ในโฟลเดอร์ (โฟลเดอร์เล็กเรียงในหน่วยความจำเลย)
+    """
+    with ExitStack() as stack:
+        runs = []
+        run = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    run.append((sort_key(entry.name), entry.name))
+                    if len(run) >= run_size:
+                        run.sort()
+                        runs.append(_read_spill(_spill(run, stack)))
+                        run = []
+        except FileNotFoundError:
+            return
+        run.sort()
+        yield from heapq.merge(*runs, run) if runs else run
+
+def _subdirectories(directory: Path) -> list:
+    """โฟลเดอร์ย่อยเรียงตามชื่อ (shard ตาม prefix ของ hash มีไม่เกิน 256 ต่อชั้น)"""
+    try:
+        with os.scandir(directory) as entries:
+            return sorted(Path(entry.path) for entry in entries if entry.is_dir(follow_symlinks=False))
+    except FileNotFoundError:
+        return []
+
+def iter_blob_files(root: Path, directory: Path, run_size: int = UPLOAD_GC_SORT_RUN_SIZE) -> Iterator[DiskFile]:
+    """ไฟล์ใต้ blobs/ เรียงตาม SHA-256 ในชื่อไฟล์ (ทั้งแบบแบนและแบบ shard ปนกันได้)
+
+    ไฟล์ในชั้นนี้เรียงด้วย iter_sorted_files โฟลเดอร์ย่อยเรียงตาม prefix จึงต่อกันได้เลยแล้ว merge กับไฟล์ในชั้นนี้
+    ไฟล์ที่ไม่มี SHA-256 ในชื่อได้ sort_key ว่าง
+    """
+    files = (
+        disk_file
+        for key, name in iter_sorted_files(directory, _blob_sort_key, run_size)
+        if (disk_file := _disk_file(root, directory / name, key)) is not None
+    )
+    yield from heapq.merge(
+        files,
+        chain.from_iterable(iter_blob_files(root, path, run_size) for path in _subdirectories(directory)),
+        key=lambda item: item.sort_key,
+    )
+
+def iter_blob_rows(db: Session, batch_size: int) -> Iterator[tuple]:
+    """(sha256, storage_path, referenced, ref_count, referenced_at) ของทุก blob เรียงตาม sha256 ทีละ batch
+
+    referenced นับจาก submission ที่อ้างถึงจริง (cascade ลบ submission โดยไม่ลด ref_count ได้)
+    referenced_at คือ last_referenced_at (แถวเก่าก่อนมีคอลัมน์นี้ใช้ created_at)
+    """
+    referenced = exists().where(Submission.blob_sha256 == FileBlob.sha256)
+    last_sha256 = ""
+    while True:
+        rows = db.execute(
+            select(
+                FileBlob.sha256,
+                FileBlob.storage_path,
+                referenced.label("referenced"),
+                FileBlob.ref_count,
+                func.coalesce(FileBlob.last_referenced_at, FileBlob.created_at).label("referenced_at"),
+            )
+            .where(FileBlob.sha256 > last_sha256)
+            .order_by(FileBlob.sha256)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield from rows
+        last_sha256 = rows[-1].sha256
+
+def _unchanged_blob(row):
+    """เงื่อนไขใน DELETE: แถวยังเป็นค่าที่อ่านไว้และไม่มี submission อ้างถึง
+
+    upsert ของ store_file แก้ ref_count และ last_referenced_at บนแถวเดียวกัน PostgreSQL จึงประเมินเงื่อนไขนี้ใหม่
+    หลังรอ lock ของ upsert ที่ยังไม่ commit (SQLite เขียนได้ทีละ transaction อยู่แล้ว)
+    เวลาเทียบด้วย <= ไม่ใช่ == เพราะ SQLite เก็บ CURRENT_TIMESTAMP เป็นข้อความที่ไม่มีเศษวินาที
+    """
+    referenced_at = func.coalesce(FileBlob.last_referenced_at, FileBlob.created_at)
+    return and_(
+        FileBlob.sha256 == row.sha256,
+        FileBlob.ref_count == row.ref_count,
+        referenced_at.is_(None) if row.referenced_at is None else referenced_at <= row.referenced_at,
+        ~exists().where(Submission.blob_sha256 == row.sha256),
+    )
+
+def _older_than(timestamp: Optional[datetime], cutoff: datetime) -> bool:
+    if timestamp is None:
+        return False
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp < cutoff
+
+def collect_orphan_blobs(
+    db: Session,
+    storage: LocalStorage,
+    grace_seconds: float,
+    dry_run: bool = False,
+    batch_size: int = 1000,
+    run_size: int = UPLOAD_GC_SORT_RUN_SIZE,
+) -> dict:
+    """merge รายการไฟล์ใต้ blobs/ กับตาราง file_blobs (เรียงตาม sha256 ทั้งคู่)
+
+    orphan คือไฟล์ที่ไม่มีแถว blob, ไม่ใช่ storage_path ของ blob (สำเนาค้าง/.part)
+    หรือ blob ที่ไม่มี submission อ้างถึงแล้วและไม่ถูกอ้างถึงใหม่ภายในระยะผ่อนผัน (ลบทั้งแถวและไฟล์)
+    ไฟล์ของ blob ถูกลบก่อน commit ขณะที่แถวยังถูก lock: store_file ที่ upsert พร้อมกันจะรอ
+    แล้วพบว่าไฟล์หายจึงเขียนไฟล์ของตัวเองกลับเข้าที่
+    หน่วยความจำขึ้นกับ batch_size และ run_size ไม่ใช่จำนวนไฟล์ทั้งหมด
+    """
+    stats = _new_stats()
+    file_cutoff = time.time() - grace_seconds
+    row_cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    rows = iter_blob_rows(db, batch_size)
+    row = next(rows, None)
+    row_has_file = False
+    unreferenced = []  # (row, [DiskFile]) รอลบแถวและไฟล์เป็น batch
+
+    def advance_row():
+        nonlocal row, row_has_file
+        if row is not None and not row_has_file:
+            if row.referenced:
+                stats["missing"] += 1
+            elif _older_than(row.referenced_at, row_cutoff):
+                unreferenced.append((row, []))
+        row = next(rows, None)
+        row_has_file = False
+
+    def flush():
+        if not unreferenced:
+            return
+        for blob_row, files in unreferenced:
+            # ตรวจซ้ำตอนลบ: ระหว่างนี้อาจมี submission ใหม่อ้างถึง blob นี้แล้ว
+            if dry_run or db.execute(delete(FileBlob).where(_unchanged_blob(blob_row))).rowcount:
+                for disk_file in files:
+                    _remove(storage, disk_file, stats, dry_run)
+        if not dry_run:
+            db.commit()
+        unreferenced.clear()
+
+    for disk_file in iter_blob_files(storage.root, storage.path(BLOBS_PREFIX), run_size):
+        stats["scanned"] += 1
+        if not disk_file.sort_key:
+            if _still_stale(storage, disk_file, file_cutoff):
+                _remove(storage, disk_file, stats, dry_run)
+            continue
+        while row is not None and row.sha256 < disk_file.sort_key:
+            advance_row()
+        if len(unreferenced) >= batch_size:
+            flush()
+
+        if row is not None and row.sha256 == disk_file.sort_key and disk_file.key == row.storage_path:
+            row_has_file = True
+            if not row.referenced and disk_file.changed_at < file_cutoff and _older_than(row.referenced_at, row_cutoff):
+                unreferenced.append((row, [disk_file]))
+        elif _still_stale(storage, disk_file, file_cutoff):
+            _remove(storage, disk_file, stats, dry_run)
+    while row is not None:
+        advance_row()
+    flush()
+    return stats
+
+def collect_orphan_legacy_files(
+    db: Session,
+    storage: LocalStorage,
+    grace_seconds: float,
+    dry_run: bool = False,
+    batch_size: int = 1000,
+    run_size: int = UPLOAD_GC_SORT_RUN_SIZE,
+) -> dict:
+    """merge ไฟล์ใน uploads/submissions/ (โฟลเดอร์แบน เรียงด้วย iter_sorted_files) กับ submissions.file_url
+
+    เรียงแบบ byte ทั้งคู่
+    """
+    stats = _new_stats()
+    cutoff = time.time() - grace_seconds
+    prefix = f"{storage.base_url}/{SUBMISSIONS_DIR.name}/"
+    file_url = Submission.file_url.collate(_BINARY_COLLATIONS[db.get_bind().dialect.name])
+
+    def referenced_names() -> Iterator[str]:
+        last_url = prefix
+        while True:
+            urls = db.scalars(
+                select(Submission.file_url)
+                .where(Submission.file_url.like(f"{prefix}%"), file_url > last_url)
+                .order_by(file_url)
+                .limit(batch_size)
+            ).all()
+            if not urls:
+                return
+            for url in urls:
+                yield url[len(prefix):]
+            last_url = urls[-1]
+
+    names = referenced_names()
+    name = next(names, None)
+    directory = storage.path(SUBMISSIONS_DIR.name)
+    for file_name, _ in iter_sorted_files(directory, str, run_size):
+        stats["scanned"] += 1
+        while name is not None and name < file_name:
+            name = next(names, None)
+        if name == file_name:
+            continue
+        disk_file = _disk_file(storage.root, directory / file_name, file_name)
+        if disk_file is not None and disk_file.changed_at < cutoff:
+            _remove(storage, disk_file, stats, dry_run)
+    return stats
+
+def collect_upload_staging(db: Session, grace_seconds: float, dry_run: bool = False, batch_size: int = 1000) -> dict:
+    """ลบ session ที่หมดอายุพร้อม chunk และโฟลเดอร์ staging ที่ไม่มี session แล้ว"""
+    stats = _new_stats()
+    now = datetime.utcnow()
+    while True:
+        expired = db.scalars(
+            select(UploadSession.id).where(UploadSession.expires_at < now).limit(batch_size)
+        ).all()
+        if not expired:
+            break
+        stats["orphans"] += len(expired)
+        for upload_id in expired:
+            stats["reclaimed_bytes"] += _directory_size(UPLOAD_STAGING_DIR / upload_id)
+        if dry_run:
+            break
+        db.execute(delete(UploadSession).where(UploadSession.id.in_(expired)))
+        db.commit()
+        for upload_id in expired:
+            discard_staging(upload_id)
+        stats["deleted"] += len(expired)
+
+    cutoff = time.time() - grace_seconds
+    try:
+        scanner = os.scandir(UPLOAD_STAGING_DIR)
+    except FileNotFoundError:
+        return stats
+    # ไม่ต้องเรียง: ถือรายชื่อแค่ทีละ batch เพื่อถามฐานข้อมูลว่า session ไหนยังอยู่
+    with scanner as entries:
+        while True:
+            listed = list(islice(entries, batch_size))
+            if not listed:
+                break
+            batch = [entry for entry in listed if entry.is_dir(follow_symlinks=False)]
+            known = set(db.scalars(select(UploadSession.id).where(UploadSession.id.in_([entry.name for entry in batch]))))
+            for entry in batch:
+                stats["scanned"] += 1
+                if entry.name in known or entry.stat().st_mtime >= cutoff:
+                    continue
+                stats["orphans"] += 1
+                stats["reclaimed_bytes"] += _directory_size(Path(entry.path))
+                if not dry_run:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    stats["deleted"] += 1
+    return stats
+
+def _directory_size(directory: Path) -> int:
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+def _still_stale(storage: LocalStorage, disk_file: DiskFile, cutoff: float) -> bool:
+    """ตรวจเวลาไฟล์ซ้ำก่อนลบไฟล์ที่ไม่มีแถว blob: store_file อาจเพิ่งย้ายไฟล์ใหม่เข้าที่ key นี้หลังจากที่ list ไว้"""
+    if disk_file.changed_at >= cutoff:
+        return False
+    try:
+        stat_result = storage.path(disk_file.key).stat()
+    except FileNotFoundError:
+        return False
+    return max(stat_result.st_mtime, stat_result.st_ctime) < cutoff
+
+def _remove(storage: LocalStorage, disk_file: DiskFile, stats: dict, dry_run: bool) -> None:
+    stats["orphans"] += 1
+    stats["reclaimed_bytes"] += disk_file.size
+    if not dry_run:
+        storage.delete(disk_file.key)
+        stats["deleted"] += 1
+
+def collect_garbage(
+    db: Session,
+    storage: LocalStorage,
+    grace_hours: float = UPLOAD_GC_GRACE_HOURS,
+    dry_run: bool = False,
+    batch_size: int = 1000,
+    run_size: int = UPLOAD_GC_SORT_RUN_SIZE,
+) -> dict:
+    """เก็บกวาดไฟล์อัปโหลดที่ไม่มีใครอ้างถึง คืนสถิติแยกตามประเภท (dry_run ไม่ลบอะไร)"""
+    grace_seconds = grace_hours * 3600
+    return {
+        "blobs": collect_orphan_blobs(db, storage, grace_seconds, dry_run, batch_size, run_size),
+        "legacy": collect_orphan_legacy_files(db, storage, grace_seconds, dry_run, batch_size, run_size),
+        "staging": collect_upload_staging(db, grace_seconds, dry_run, batch_size),
+    }
@@ -0,0 +1,192 @@
+"""
+Online migration of uploaded files to the hash-sharded layout
+"""
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..models.assignment import Assignment, Submission
+from ..models.course import Course
+from ..models.file_blob import FileBlob
+from ..models.user import User
+from .content_type import SNIFF_BYTES, detect_content_type
+from .file_handler import UPLOAD_CHUNK_SIZE, blob_key, blob_reference_upsert
+from .storage import LocalStorage
+
+LEGACY_URL_PREFIX = "/uploads/submissions/"
+
+def _new_stats() -> dict:
+    return {"migrated": 0, "deduplicated": 0, "missing": 0, "bytes": 0}
+
+def _hash_file(path: Path) -> tuple[int, str, bytes]:
+    """ขนาด, SHA-256 และต้นไฟล์ (ไม่จำกัดขนาด ไฟล์เดิมอาจอัปโหลดก่อนมี MAX_FILE_SIZE)"""
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(path, "rb") as source:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            if not size:
+                head = chunk[:SNIFF_BYTES]
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest(), head
+
+def _link(source: Path, destination: Path) -> None:
+    """hard link ไปยังตำแหน่งใหม่ (ถ้าข้าม filesystem ใช้ copy) ไฟล์เดิมยังอยู่จนกว่าจะ commit"""
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if destination.exists():
+        return
+    try:
+        os.link(source, destination)
+    except OSError:
+        partial = destination.with_name(f".{destination.name}.part")
+        shutil.copy2(source, partial)
+        os.replace(partial, destination)
+
+def _unlink_all(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+def _add_storage_usage(db: Session, submission: Submission, size: int) -> None:
+    db.execute(
+        update(User)
+        .where(User.id == submission.student_id)
+        .values(storage_used_bytes=User.storage_used_bytes + size)
+    )
+    course_id = select(Assignment.course_id).where(Assignment.id == submission.assignment_id).scalar_subquery()
+    db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(storage_used_bytes=Course.storage_used_bytes + size)
+    )
+
+def migrate_legacy_submissions(
+    db: Session,
+    storage: LocalStorage,
+    batch_size: int = 500,
+    dry_run: bool = False,
+) -> dict:
+    """ย้ายไฟล์แบบเดิมใน uploads/submissions/ เข้า blob แบบ shard ทีละ batch
+
+    ลำดับต่อ batch: link ไฟล์ไปตำแหน่งใหม่ -> แก้ file_url/blob_sha256 แล้ว commit -> ลบไฟล์เดิม
+    ระหว่างนั้นผู้อ่านเห็นไฟล์ที่ตำแหน่งใดตำแหน่งหนึ่งเสมอ จึงรันขณะระบบเปิดใช้งานได้
+    """
+    stats = _new_stats()
+    dialect = db.get_bind().dialect.name
+    last_id = 0
+    while True:
+        submissions = db.scalars(
+            select(Submission)
+            .where(
+                Submission.id > last_id,
+                Submission.blob_sha256.is_(None),
+                Submission.file_url.like(f"{LEGACY_URL_PREFIX}%"),
+            )
+            .order_by(Submission.id)
+            .limit(batch_size)
+        ).all()
+        if not submissions:
+            return stats
+        last_id = submissions[-1].id
+
+        moved = []
+        for submission in submissions:
+            source = storage.path(submission.file_url[len("/uploads/"):])
+            if not source.exists():
+                stats["missing"] += 1
+                continue
+            size, sha256, head = _hash_file(source)
+            stats["migrated"] += 1
+            stats["bytes"] += size
+            if dry_run:
+                continue
+
+            blob = db.get(FileBlob, sha256)
+            key = blob.storage_path if blob else blob_key(sha256, submission.file_name or source.name)
+            if blob is not None and storage.size(key) is not None:
+                stats["deduplicated"] += 1
+            else:
+                _link(source, storage.path(key))
+            db.execute(blob_reference_upsert(dialect, sha256, size, key))
+            submission.blob_sha256 = sha256
+            submission.file_url = storage.file_url(key)
+            if submission.content_type is None:
+                # ไฟล์เดิมไม่ถูกปฏิเสธย้อนหลัง แค่บันทึกชนิดที่ตรวจได้ (ถ้ารู้จัก)
+                submission.content_type = detect_content_type(head)
+            if submission.file_size is None:
+                # ไฟล์เดิมไม่เคยถูกนับโควตา: นับตอนรู้ขนาด (ไม่บังคับเพดาน ข้อมูลเดิมต้องย้ายได้ครบ)
+                submission.file_size = size
+                _add_storage_usage(db, submission, size)
+            moved.append(source)
+
+        if dry_run:
+            db.rollback()
+            continue
+        db.commit()
+        _unlink_all(moved)
+
+def shard_flat_blobs(
+    db: Session,
+    storage: LocalStorage,
+    batch_size: int = 500,
+    dry_run: bool = False,
+) -> dict:
+    """ย้าย blob ที่ยังอยู่ในรูป blobs/<sha256><ext> ไปยัง blobs/ab/cd/<sha256><ext>
+
+    แก้ FileBlob.storage_path และ Submission.file_url ของทุก submission ที่อ้างถึงใน transaction เดียวกัน
+    """
+    stats = _new_stats()
+    last_sha256 = ""
+    while True:
+        blobs = db.scalars(
+            select(FileBlob)
+            .where(FileBlob.sha256 > last_sha256)
+            .order_by(FileBlob.sha256)
+            .limit(batch_size)
+        ).all()
+        if not blobs:
+            return stats
+        last_sha256 = blobs[-1].sha256
+
+        moved = []
+        for blob in blobs:
+            key = blob_key(blob.sha256, blob.storage_path)
+            if key == blob.storage_path:
+                continue
+            source = storage.path(blob.storage_path)
+            if not source.exists():
+                if storage.path(key).exists():
+                    blob.storage_path = key  # ย้ายไฟล์ไปแล้วแต่ยังไม่ได้แก้ฐานข้อมูล
+                else:
+                    stats["missing"] += 1
+                    continue
+            else:
+                stats["migrated"] += 1
+                stats["bytes"] += blob.size
+                if dry_run:
+                    continue
+                _link(source, storage.path(key))
+                blob.storage_path = key
+                moved.append(source)
+            db.execute(
+                update(Submission)
+                .where(Submission.blob_sha256 == blob.sha256)
+                .values(file_url=storage.file_url(key))
+            )
+
+        if dry_run:
+            db.rollback()
+            continue
+        db.commit()
+        _unlink_all(moved)
+
+def migrate_upload_layout(db: Session, storage: LocalStorage, batch_size: int = 500, dry_run: bool = False) -> dict:
+    """ย้ายไฟล์ทั้งหมดเข้า layout แบบ shard: blob แบบแบนก่อน แล้วจึงไฟล์แบบเดิม"""
+    return {
+        "blobs": shard_flat_blobs(db, storage, batch_size, dry_run),
+        "legacy": migrate_legacy_submissions(db, storage, batch_size, dry_run),
+    }
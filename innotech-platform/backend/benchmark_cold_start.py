@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Measure Lambda cold start locally: import time per module and init/first-request latency
+Each run uses a fresh interpreter (python -X importtime), like a new Lambda container
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+# Runs inside the child interpreter: time each phase of a cold start
+PROBE = """
+import json, time
+t0 = time.perf_counter()
+import lambda_handler
+t1 = time.perf_counter()
+lambda_handler.get_handler()
+t2 = time.perf_counter()
+event = {
+    "version": "2.0", "routeKey": "$default", "rawPath": "/health", "rawQueryString": "",
+    "headers": {"host": "localhost"}, "isBase64Encoded": False,
+    "requestContext": {"http": {"method": "GET", "path": "/health", "sourceIp": "127.0.0.1", "protocol": "HTTP/1.1"},
+                       "stage": "$default", "requestId": "bench"},
+}
+lambda_handler.lambda_handler(event, None)
+t3 = time.perf_counter()
+lambda_handler.lambda_handler(event, None)
+t4 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1000, "build_ms": (t2 - t1) * 1000,
+                  "first_request_ms": (t3 - t2) * 1000, "warm_request_ms": (t4 - t3) * 1000}))
+"""
+
+def parse_importtime(stderr: str) -> list:
+    """(depth, name, self_us, cumulative_us) จากผลของ -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def run_once(env: dict) -> tuple:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"❌ Probe failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Lambda cold start (import time per module)")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start (median is reported)")
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--budget-ms", type=float, default=0, help="fail if median init (import + build) exceeds this")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:////tmp/innotech_cold_start.sqlite")
+    env.setdefault("PUBLIC_UPLOADS", "false")
+
+    print(f"🔄 Starting {args.runs} cold interpreters...")
+    phases = defaultdict(list)
+    package_self = defaultdict(list)
+    module_cumulative = defaultdict(list)
+    for _ in range(args.runs):
+        timings, rows = run_once(env)
+        for phase, value in timings.items():
+            phases[phase].append(value)
+        per_package = defaultdict(int)
+        for depth, name, self_us, cumulative_us in rows:
+            per_package[name.split(".")[0]] += self_us
+            if depth == 0:
+                module_cumulative[name].append(cumulative_us)
+        for package, total in per_package.items():
+            package_self[package].append(total)
+
+    print()
+    print("⏱️  Phases (median ms)")
+    for phase, values in phases.items():
+        print(f"   {phase:<18} {statistics.median(values):9.1f}")
+    init_ms = statistics.median([a + b for a, b in zip(phases["import_ms"], phases["build_ms"])])
+    print(f"   {'init (import+build)':<18} {init_ms:9.1f}")
+
+    print()
+    print(f"📦 Import time by package (self time, median ms, top {args.top})")
+    ranked = sorted(package_self.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for package, values in ranked[:args.top]:
+        print(f"   {package:<28} {statistics.median(values) / 1000:9.1f}")
+
+    print()
+    print(f"🧩 Top-level imports (cumulative, median ms, top {args.top})")
+    ranked = sorted(module_cumulative.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for module, values in ranked[:args.top]:
+        print(f"   {module:<28} {statistics.median(values) / 1000:9.1f}")
+
+    if args.budget_ms:
+        print()
+        if init_ms > args.budget_ms:
+            print(f"❌ Init {init_ms:.1f} ms exceeds budget {args.budget_ms:g} ms")
+            sys.exit(1)
+        print(f"✅ Init {init_ms:.1f} ms within budget {args.budget_ms:g} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Benchmark bcrypt on this machine and suggest BCRYPT_ROUNDS for a target login latency
+Run on the deployment hardware (Lambda memory size / EC2 instance type)
+"""
+import argparse
+
+from app.utils.hashing import calibrate_bcrypt_rounds
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate bcrypt cost for a target hash latency")
+    parser.add_argument("--target-ms", type=float, default=250, help="target time per hash in milliseconds")
+    parser.add_argument("--samples", type=int, default=3, help="hashes timed per cost (median is used)")
+    parser.add_argument("--max-rounds", type=int, default=16, help="highest cost to try")
+    args = parser.parse_args()
+    
+    print(f"🔄 Benchmarking bcrypt (target {args.target_ms:g} ms per hash)...")
+    result = calibrate_bcrypt_rounds(args.target_ms, samples=args.samples, max_rounds=args.max_rounds)
+    for rounds, elapsed in result["timings_ms"].items():
+        marker = "✅" if rounds <= result["rounds"] else "❌"
+        print(f"{marker} rounds={rounds:<3} {elapsed:10.1f} ms")
+    
+    print()
+    print(f"🎯 Recommended: BCRYPT_ROUNDS={result['rounds']}")
+    print("ℹ️  Existing hashes are re-hashed with the new cost on each user's next login")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Delete uploaded files that no submission references any more
+Orphans come from failed submissions, cascaded deletes and abandoned resumable uploads
+Files younger than the grace period are kept (they may belong to an upload that has not committed yet)
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.utils.file_handler import get_storage
+from app.utils.storage import LocalStorage
+from app.utils.upload_gc import UPLOAD_GC_GRACE_HOURS, UPLOAD_GC_SORT_RUN_SIZE, collect_garbage
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage-collect orphaned upload files")
+    parser.add_argument("--grace-hours", type=float, default=UPLOAD_GC_GRACE_HOURS, help="keep files changed more recently than this")
+    parser.add_argument("--batch-size", type=int, default=1000, help="database rows fetched per query")
+    parser.add_argument("--run-size", type=int, default=UPLOAD_GC_SORT_RUN_SIZE, help="file names sorted in memory before spilling to a temp file")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans and reclaimable bytes without deleting")
+    args = parser.parse_args()
+    
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        print("ℹ️  STORAGE_BACKEND is not local: use a bucket lifecycle rule for incomplete uploads")
+        return
+    
+    print(f"🔄 Collecting orphaned uploads in {storage.root} (grace {args.grace_hours:g} h{', dry run' if args.dry_run else ''})...")
+    db = SessionLocal()
+    try:
+        result = collect_garbage(
+            db, storage, grace_hours=args.grace_hours, dry_run=args.dry_run,
+            batch_size=args.batch_size, run_size=args.run_size
+        )
+    finally:
+        db.close()
+    
+    for name, stats in result.items():
+        print(
+            f"✅ {name:<7} scanned={stats['scanned']} orphans={stats['orphans']} "
+            f"deleted={stats['deleted']} reclaimed={stats['reclaimed_bytes'] / (1024 * 1024):.1f} MB"
+        )
+        if stats["missing"]:
+            print(f"⚠️  {name}: {stats['missing']} referenced files are missing on disk")
+    total = sum(stats["reclaimed_bytes"] for stats in result.values())
+    print(f"🎯 {'Reclaimable' if args.dry_run else 'Reclaimed'}: {total} bytes")
+
+if __name__ == "__main__":
+    main()
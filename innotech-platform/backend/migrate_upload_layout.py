@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Move uploaded files into the hash-sharded layout (uploads/blobs/ab/cd/<sha256><ext>)
+Safe to run while the API is serving: files are linked, the batch is committed, then the old paths are removed
+"""
+import argparse
+
+from app.database import SessionLocal
+from app.utils.file_handler import get_storage
+from app.utils.storage import LocalStorage
+from app.utils.upload_migration import migrate_upload_layout
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate uploads to the sharded directory layout")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows committed per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report what would move without changing anything")
+    args = parser.parse_args()
+    
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        print("ℹ️  STORAGE_BACKEND is not local: object stores have no directory limits, nothing to migrate")
+        return
+    
+    print(f"🔄 Migrating uploads in {storage.root} (batch size {args.batch_size}{', dry run' if args.dry_run else ''})...")
+    db = SessionLocal()
+    try:
+        result = migrate_upload_layout(db, storage, batch_size=args.batch_size, dry_run=args.dry_run)
+    finally:
+        db.close()
+    
+    for name, stats in result.items():
+        print(
+            f"✅ {name:<7} moved={stats['migrated']} deduplicated={stats['deduplicated']} "
+            f"missing={stats['missing']} bytes={stats['bytes']}"
+        )
+    if any(stats["missing"] for stats in result.values()):
+        print("⚠️  Some files referenced in the database were not found on disk")
+
+if __name__ == "__main__":
+    main()
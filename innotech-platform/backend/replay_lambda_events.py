@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Replay API Gateway events through a Lambda handler in-process (no deployment needed)
+Seeds a database (SQLite by default, or --database-url for a local Postgres), generates
+REST (v1) or HTTP API (v2) events for every route in app/api, and reports per route:
+cold latency (fresh interpreter per sample), warm latency percentiles, SQL query counts
+and memory allocated by the invocation (tracemalloc)
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from urllib.parse import parse_qsl, urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+PASSWORD = "replay-password"
+PDF_BODY = b"%PDF-1.4\n" + b"replay " * 512
+BOUNDARY = "replay-boundary"
+
+# (name, method, path template, role, body kind) for every route in app/api
+# {placeholders} are filled per iteration from the seeded context (lists are indexed by iteration)
+ROUTES = [
+    ("health", "GET", "/health", None, None),
+    ("auth.register", "POST", "/auth/register", None, "register"),
+    ("auth.login", "POST", "/auth/login", None, "login"),
+    ("auth.me", "GET", "/auth/me", "student", None),
+    ("auth.logout", "POST", "/auth/logout", "student", None),
+    ("users.list", "GET", "/users/", "admin", None),
+    ("users.storage_usage", "GET", "/users/storage-usage", "admin", None),
+    ("users.get", "GET", "/users/{student_id}", "admin", None),
+    ("users.update", "PUT", "/users/{student_id}", "student", "user_update"),
+    ("users.delete", "DELETE", "/users/{victim_user_ids}", "admin", None),
+    ("courses.list", "GET", "/courses/", "student", None),
+    ("courses.get", "GET", "/courses/{course_id}", "student", None),
+    ("courses.create", "POST", "/courses/", "trainer", "course"),
+    ("courses.update", "PUT", "/courses/{course_id}", "trainer", "course_update"),
+    ("courses.delete", "DELETE", "/courses/{delete_course_ids}", "trainer", None),
+    ("courses.enroll", "POST", "/courses/{enroll_course_ids}/enroll", "student", None),
+    ("courses.my_enrollments", "GET", "/courses/my/enrollments", "student", None),
+    ("courses.create_module", "POST", "/courses/{course_id}/modules", "trainer", "module"),
+    ("courses.modules", "GET", "/courses/{course_id}/modules", "student", None),
+    ("assignments.create", "POST", "/assignments/", "trainer", "assignment"),
+    ("assignments.list", "GET", "/assignments/", "student", None),
+    ("assignments.get", "GET", "/assignments/{assignment_id}", "trainer", None),
+    ("assignments.update", "PUT", "/assignments/{assignment_id}", "trainer", "assignment_update"),
+    ("assignments.delete", "DELETE", "/assignments/{delete_assignment_ids}", "trainer", None),
+    ("assignments.submit", "POST", "/assignments/{submit_assignment_ids}/submissions", "student", "multipart"),
+    ("assignments.upload_url", "POST", "/assignments/{open_assignment_id}/submissions/upload-url", "student", "upload_url"),
+    ("assignments.create_upload", "POST", "/assignments/{open_assignment_id}/submissions/uploads", "student", "upload_session"),
+    ("assignments.get_upload", "GET", "/assignments/submissions/uploads/{status_upload_id}", "student", None),
+    ("assignments.put_chunk", "PUT", "/assignments/submissions/uploads/{chunk_upload_ids}/chunks/0", "student", "chunk"),
+    ("assignments.complete_upload", "POST", "/assignments/submissions/uploads/{chunk_upload_ids}/complete", "student", "complete"),
+    ("assignments.cancel_upload", "DELETE", "/assignments/submissions/uploads/{cancel_upload_ids}", "student", None),
+    ("assignments.archive", "GET", "/assignments/{assignment_id}/submissions/archive", "trainer", None),
+    ("assignments.submissions", "GET", "/assignments/{assignment_id}/submissions", "trainer", None),
+    ("assignments.grade", "PUT", "/assignments/submissions/{submission_id}", "trainer", "grade"),
+    ("assignments.get_submission", "GET", "/assignments/submissions/{submission_id}", "student", None),
+    ("assignments.download_url", "GET", "/assignments/submissions/{submission_id}/download-url", "student", None),
+    ("files.download", "GET", "/files/{submission_id}", "student", None),
+    ("storage.put", "PUT", "{storage_put_path}", None, "storage_put"),
+]
+
+class LambdaContext:
+    """ค่าขั้นต่ำของ context ที่ Lambda ส่งให้ handler"""
+    function_name = "replay"
+    memory_limit_in_mb = 512
+    invoked_function_arn = "arn:aws:lambda:local:000000000000:function:replay"
+
+    def __init__(self):
+        self.aws_request_id = uuid.uuid4().hex
+
+    def get_remaining_time_in_millis(self):
+        return 30000
+
+# ---------------------------------------------------------------------------
+# Events
+
+def _body(kind: str, context: dict, i: int):
+    """(content-type, bytes) ของ body แต่ละแบบ"""
+    marker = context["marker"]
+    if kind is None:
+        return None, b""
+    if kind == "multipart":
+        body = (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"replay.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n"
+        ).encode() + PDF_BODY + f"\r\n--{BOUNDARY}--\r\n".encode()
+        return f"multipart/form-data; boundary={BOUNDARY}", body
+    if kind in ("chunk", "storage_put"):
+        return "application/octet-stream", context["storage_put_body"] if kind == "storage_put" else PDF_BODY
+    payloads = {
+        "register": {"email": f"{marker}-register-{i}@example.com", "password": PASSWORD,
+                     "first_name": "Replay", "last_name": "User", "role": "student"},
+        "login": {"email": context["student_email"], "password": PASSWORD},
+        "user_update": {"first_name": f"Replay {i}"},
+        "course": {"title": f"Replay course {i}", "description": "Replay"},
+        "course_update": {"description": f"Updated {i}"},
+        "module": {"title": f"Module {i}", "course_id": context["course_id"], "order_index": i},
+        "assignment": {"title": f"Replay assignment {i}", "course_id": context["course_id"]},
+        "assignment_update": {"description": f"Updated {i}"},
+        "upload_url": {"file_name": "replay.pdf", "size": len(context["storage_put_body"]),
+                       "sha256": hashlib.sha256(context["storage_put_body"]).hexdigest()},
+        "upload_session": {"file_name": "replay.pdf", "size": len(PDF_BODY)},
+        "complete": {"content": "replay"},
+        "grade": {"score": i % 100, "feedback": "replay"},
+    }
+    return "application/json", json.dumps(payloads[kind]).encode()
+
+def _fill(template: str, context: dict, i: int) -> str:
+    values = {key: value[i % len(value)] if isinstance(value, list) else value for key, value in context.items()}
+    return template.format(**values)
+
+def make_event(version: int, method: str, url: str, headers: dict, body: bytes) -> dict:
+    """API Gateway event แบบ REST API (v1) หรือ HTTP API (v2)"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    headers = {"host": "replay.local", "user-agent": "replay", **{k.lower(): v for k, v in headers.items()}}
+    encoded = base64.b64encode(body).decode() if body else None
+    if version == 1:
+        return {
+            "resource": "/{proxy+}", "path": parts.path, "httpMethod": method,
+            "headers": headers, "multiValueHeaders": {k: [v] for k, v in headers.items()},
+            "queryStringParameters": query or None,
+            "multiValueQueryStringParameters": {k: [v] for k, v in query.items()} or None,
+            "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": method, "path": parts.path,
+                               "stage": "prod", "requestId": "replay", "identity": {"sourceIp": "127.0.0.1"}},
+            "pathParameters": {"proxy": parts.path.lstrip("/")}, "stageVariables": None,
+            "body": encoded, "isBase64Encoded": bool(body),
+        }
+    return {
+        "version": "2.0", "routeKey": "$default", "rawPath": parts.path, "rawQueryString": parts.query,
+        "headers": headers, "queryStringParameters": query or None,
+        "requestContext": {"http": {"method": method, "path": parts.path, "protocol": "HTTP/1.1",
+                                    "sourceIp": "127.0.0.1", "userAgent": "replay"},
+                           "routeKey": "$default", "stage": "$default", "requestId": "replay"},
+        "body": encoded, "isBase64Encoded": bool(body),
+    }
+
+def build_fixtures(context: dict, version: int, iterations: int, selected) -> list:
+    fixtures = []
+    for name, method, template, role, kind in selected:
+        events = []
+        for i in range(iterations):
+            content_type, body = _body(kind, context, i)
+            headers = {"origin": "http://localhost:3000"}
+            if content_type:
+                headers["content-type"] = content_type
+            if role:
+                headers["authorization"] = f"Bearer {context['tokens'][role]}"
+            events.append(make_event(version, method, _fill(template, context, i), headers, body))
+        fixtures.append({"name": name, "method": method, "path": template, "events": events})
+    return fixtures
+
+# ---------------------------------------------------------------------------
+# Seeding
+
+def invoke(handler, event: dict) -> dict:
+    return handler(event, LambdaContext())
+
+def _api(handler, version, method, url, token=None, json_body=None, raw=None, content_type=None):
+    headers = {}
+    body = b""
+    if token:
+        headers["authorization"] = f"Bearer {token}"
+    if json_body is not None:
+        headers["content-type"] = "application/json"
+        body = json.dumps(json_body).encode()
+    elif raw is not None:
+        headers["content-type"] = content_type
+        body = raw
+    response = invoke(handler, make_event(version, method, url, headers, body))
+    if response["statusCode"] >= 400:
+        raise SystemExit(f"❌ Seeding {method} {url} failed: {response['statusCode']} {response.get('body')}")
+    payload = response.get("body") or ""
+    if response.get("isBase64Encoded"):
+        payload = base64.b64decode(payload).decode()
+    return json.loads(payload) if payload else None
+
+def seed(handler, version: int, iterations: int) -> dict:
+    """สร้างผู้ใช้ หลักสูตร และงานที่ fixture ต้องใช้ (ข้อมูลที่ถูกลบ/ใช้ครั้งเดียวมีแยกต่อรอบ)"""
+    from app.database import SessionLocal, get_async_engine
+    from app.models.assignment import Assignment
+    from app.models.course import Course, CourseStatus, Enrollment, Module
+    from app.models.user import User, UserRole
+    from app.utils.auth import access_token_claims, create_access_token, get_password_hash
+
+    marker = f"replay-{uuid.uuid4().hex[:8]}"
+    password_hash = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        def user(name, role):
+            row = User(email=f"{marker}-{name}@example.com", hashed_password=password_hash,
+                       first_name="Replay", last_name=name, role=role, is_active=True, is_verified=True)
+            db.add(row)
+            return row
+
+        admin, trainer, student = user("admin", UserRole.ADMIN), user("trainer", UserRole.TRAINER), user("student", UserRole.STUDENT)
+        victims = [user(f"victim-{i}", UserRole.STUDENT) for i in range(iterations)]
+        db.flush()
+
+        def course(title):
+            row = Course(title=f"{marker} {title}", instructor_id=trainer.id, status=CourseStatus.PUBLISHED)
+            db.add(row)
+            return row
+
+        main_course = course("main")
+        enroll_courses = [course(f"enroll {i}") for i in range(iterations)]
+        delete_courses = [course(f"delete {i}") for i in range(iterations)]
+        db.flush()
+        db.add(Module(course_id=main_course.id, title="Module 1", order_index=1, is_published=True))
+        db.add(Enrollment(user_id=student.id, course_id=main_course.id))
+
+        def assignment(title):
+            row = Assignment(course_id=main_course.id, title=f"{marker} {title}")
+            db.add(row)
+            return row
+
+        graded = assignment("graded")
+        open_assignment = assignment("open")
+        submit_assignments = [assignment(f"submit {i}") for i in range(iterations)]
+        upload_assignments = [assignment(f"upload {i}") for i in range(iterations)]
+        delete_assignments = [assignment(f"delete {i}") for i in range(iterations)]
+        db.commit()
+
+        tokens = {row_role: create_access_token(access_token_claims(row))
+                  for row_role, row in (("admin", admin), ("trainer", trainer), ("student", student))}
+        context = {
+            "marker": marker,
+            "tokens": tokens,
+            "student_email": student.email,
+            "student_id": student.id,
+            "victim_user_ids": [row.id for row in victims],
+            "course_id": main_course.id,
+            "enroll_course_ids": [row.id for row in enroll_courses],
+            "delete_course_ids": [row.id for row in delete_courses],
+            "assignment_id": graded.id,
+            "open_assignment_id": open_assignment.id,
+            "submit_assignment_ids": [row.id for row in submit_assignments],
+            "delete_assignment_ids": [row.id for row in delete_assignments],
+        }
+        upload_assignment_ids = [row.id for row in upload_assignments]
+    finally:
+        db.close()
+
+    # ไฟล์และ upload session สร้างผ่าน handler เอง (ทางเดียวกับ client จริง)
+    student_token = tokens["student"]
+    _, body = _body("multipart", context, 0)
+    context["submission_id"] = _api(
+        handler, version, "POST", f"/assignments/{graded.id}/submissions", student_token,
+        raw=body, content_type=f"multipart/form-data; boundary={BOUNDARY}",
+    )["id"]
+    session = {"file_name": "replay.pdf", "size": len(PDF_BODY)}
+    context["status_upload_id"] = _api(
+        handler, version, "POST", f"/assignments/{open_assignment.id}/submissions/uploads", student_token, session
+    )["id"]
+    context["chunk_upload_ids"] = [
+        _api(handler, version, "POST", f"/assignments/{assignment_id}/submissions/uploads", student_token, session)["id"]
+        for assignment_id in upload_assignment_ids
+    ]
+    context["cancel_upload_ids"] = [
+        _api(handler, version, "POST", f"/assignments/{open_assignment.id}/submissions/uploads", student_token, session)["id"]
+        for _ in range(iterations)
+    ]
+    # presigned PUT ของ LocalStorage ใช้ซ้ำได้: เขียนลง key pending ของผู้ใช้ที่ไม่เคยถูกส่งงาน
+    context["storage_put_body"] = b"%PDF-1.4\n" + marker.encode()
+    upload = _api(handler, version, "POST", f"/assignments/{open_assignment.id}/submissions/upload-url", student_token,
+                  json.loads(_body("upload_url", context, 0)[1]))
+    url = urlsplit(upload.get("upload_url") or "")
+    context["storage_put_path"] = f"{url.path}?{url.query}" if url.path.startswith("/storage/") else "/storage/unavailable"
+    get_async_engine()  # สร้างล่วงหน้าให้ pool ถูกนับตั้งแต่รอบแรก
+    return context
+
+# ---------------------------------------------------------------------------
+# Measurement
+
+class QueryCounter:
+    """นับ SQL ทุก statement ของทุก engine (sync และ async) ใน process นี้"""
+
+    def __init__(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        self.count = 0
+        event.listen(Engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+def percentile(values: list, pct: float) -> float:
+    """nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+def import_handler(name: str):
+    module = __import__(name)
+    return module.lambda_handler
+
+def dispose_engines() -> None:
+    """ปิด connection ของ async engine (thread ของ aiosqlite ค้างทำให้ interpreter ไม่จบ)"""
+    import asyncio
+    from app.database import get_async_engine
+    asyncio.get_event_loop().run_until_complete(get_async_engine().dispose())
+
+def child_main(fixtures_path: str, route_index: int, event_index: int, handler_name: str) -> None:
+    """เรียกใน interpreter ใหม่: import handler แล้วส่ง event เดียว (เหมือนคำขอแรกของ container ใหม่)"""
+    with open(fixtures_path) as source:
+        event = json.load(source)["routes"][route_index]["events"][event_index]
+    t0 = time.perf_counter()
+    handler = import_handler(handler_name)
+    t1 = time.perf_counter()
+    counter = QueryCounter()
+    response = handler(event, LambdaContext())
+    t2 = time.perf_counter()
+    print(json.dumps({"import_ms": (t1 - t0) * 1000, "cold_ms": (t2 - t0) * 1000,
+                      "status": response["statusCode"], "queries": counter.count}))
+    dispose_engines()
+
+def run_cold(args, fixtures_path: str, route_index: int, event_index: int, env: dict) -> dict:
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", fixtures_path, str(route_index), str(event_index),
+         "--handler", args.handler],
+        capture_output=True, text=True, env=env, cwd=args.workdir,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"❌ Cold run failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure(handler, counter: QueryCounter, event: dict, trace: bool = False) -> dict:
+    if trace:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+    queries = counter.count
+    t0 = time.perf_counter()
+    response = handler(event, LambdaContext())
+    elapsed = (time.perf_counter() - t0) * 1000
+    result = {"ms": elapsed, "status": response["statusCode"], "queries": counter.count - queries}
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        result["alloc_peak_kb"] = (peak - before) / 1024
+        result["alloc_retained_kb"] = (current - before) / 1024
+    return result
+
+def uncovered_routes(selected) -> list:
+    """route ใน app/api ที่ยังไม่มี fixture (เพิ่มใน ROUTES เมื่อมี endpoint ใหม่)"""
+    from app.main import app
+    covered = {(method, path) for _, method, path, _, _ in ROUTES}
+    missing = []
+    for route in app.routes:
+        if not getattr(route, "endpoint", None) or not route.endpoint.__module__.startswith("app.api"):
+            continue
+        for method in route.methods - {"HEAD"}:
+            path = route.path
+            if not any(method == covered_method and _same_shape(path, covered_path) for covered_method, covered_path in covered):
+                missing.append(f"{method} {path}")
+    return sorted(missing)
+
+def _same_shape(route_path: str, template: str) -> bool:
+    if template.startswith("{"):
+        return route_path.startswith("/storage/")
+    route_parts = route_path.strip("/").split("/")
+    template_parts = template.strip("/").split("/")
+    return len(route_parts) == len(template_parts) and all(
+        a == b or (a.startswith("{") and (b.startswith("{") or b.isdigit()))
+        for a, b in zip(route_parts, template_parts)
+    )
+
+# ---------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay API Gateway events through a Lambda handler and report latency per route")
+    parser.add_argument("--handler", default="lambda_handler", help="module with lambda_handler (lambda_handler, full_handler, auto_setup_handler)")
+    parser.add_argument("--event-version", type=int, choices=(1, 2), default=2, help="API Gateway payload: 1 = REST API, 2 = HTTP API")
+    parser.add_argument("--database-url", help="database to seed and replay against (default: SQLite in --workdir)")
+    parser.add_argument("--workdir", help="directory for the SQLite file and uploads (default: new temp dir)")
+    parser.add_argument("--warm-runs", type=int, default=20, help="timed invocations per route in one process")
+    parser.add_argument("--cold-runs", type=int, default=1, help="fresh interpreters per route (0 = skip)")
+    parser.add_argument("--routes", default="", help="comma-separated route name prefixes to replay (e.g. courses,auth.me)")
+    parser.add_argument("--save-fixtures", help="write the generated events to this JSON file")
+    parser.add_argument("--fixtures", help="replay events from a JSON file written by --save-fixtures instead of seeding")
+    parser.add_argument("--json", help="write the per-route results to this JSON file")
+    parser.add_argument("--child", nargs=3, metavar=("FIXTURES", "ROUTE", "EVENT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, BACKEND_DIR)
+        child_main(args.child[0], int(args.child[1]), int(args.child[2]), args.handler)
+        return
+
+    loaded = None
+    if args.fixtures:
+        with open(args.fixtures) as source:
+            loaded = json.load(source)
+        args.workdir = args.workdir or loaded["workdir"]
+        args.database_url = args.database_url or loaded["database_url"]
+        args.event_version = loaded["event_version"]
+    args.workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="innotech-replay-"))
+    os.makedirs(args.workdir, exist_ok=True)
+    args.database_url = args.database_url or f"sqlite:///{os.path.join(args.workdir, 'replay.sqlite')}"
+
+    # ตั้ง environment ก่อน import handler (ค่าเหล่านี้ถูกอ่านตอน import)
+    env = dict(os.environ)
+    env.update({"DATABASE_URL": args.database_url, "ALLOWED_ORIGINS": "http://localhost:3000",
+                "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))})
+    env.setdefault("STORAGE_BACKEND", "local")
+    # auto_setup_handler ต้องมีผู้ดูแลระบบคนแรก: hash "!" ไม่ตรงกับรหัสผ่านใด ล็อกอินไม่ได้
+    env.setdefault("BOOTSTRAP_ADMIN_EMAIL", "replay-admin@example.com")
+    env.setdefault("BOOTSTRAP_ADMIN_PASSWORD_HASH", "!")
+    env.setdefault("UPLOAD_STAGING_DIR", os.path.join(args.workdir, "upload_staging"))
+    os.environ.update(env)
+    os.chdir(args.workdir)  # uploads/ อยู่ใต้ working directory
+    sys.path.insert(0, BACKEND_DIR)
+
+    from app.database import engine
+    from app.utils.file_handler import ensure_upload_dirs
+    from app.utils.schema_bootstrap import bootstrap_schema
+    bootstrap_schema(engine)
+    ensure_upload_dirs()
+
+    handler = import_handler(args.handler)
+    prefixes = [prefix.strip() for prefix in args.routes.split(",") if prefix.strip()]
+    selected = [route for route in ROUTES if not prefixes or route[0].startswith(tuple(prefixes))]
+    iterations = args.cold_runs + args.warm_runs + 1  # +1 รอบที่วัดหน่วยความจำ
+
+    if loaded:
+        fixtures = loaded["routes"]
+        print(f"📂 Loaded {len(fixtures)} routes from {args.fixtures}")
+    else:
+        print(f"🌱 Seeding {args.database_url} ({iterations} iterations per route)...")
+        context = seed(handler, args.event_version, iterations)
+        fixtures = build_fixtures(context, args.event_version, iterations, selected)
+    for route in uncovered_routes(selected):
+        print(f"⚠️  No fixture for {route}")
+
+    fixtures_path = args.save_fixtures or os.path.join(args.workdir, "fixtures.json")
+    with open(fixtures_path, "w") as target:
+        json.dump({"workdir": args.workdir, "database_url": args.database_url,
+                   "event_version": args.event_version, "routes": fixtures}, target)
+    if args.save_fixtures:
+        print(f"💾 Fixtures written to {fixtures_path}")
+
+    counter = QueryCounter()
+    invoke(handler, make_event(args.event_version, "GET", "/health", {}, b""))  # สร้าง app ก่อนจับเวลา
+
+    results = []
+    print(f"🔄 Replaying {len(fixtures)} routes through {args.handler} (API Gateway v{args.event_version})...")
+    for route_index, fixture in enumerate(fixtures):
+        events = fixture["events"]
+        cold = [run_cold(args, fixtures_path, route_index, i, env) for i in range(min(args.cold_runs, len(events)))]
+        warm_events = events[len(cold):len(cold) + args.warm_runs]
+        warm = [measure(handler, counter, event) for event in warm_events]
+        traced = None
+        if len(events) > len(cold) + len(warm):
+            tracemalloc.start()
+            traced = measure(handler, counter, events[len(cold) + len(warm)], trace=True)
+            tracemalloc.stop()
+        statuses = sorted({str(sample["status"]) for sample in cold + warm + ([traced] if traced else [])})
+        results.append({
+            "route": fixture["name"],
+            "method": fixture["method"],
+            "path": fixture["path"],
+            "status": statuses,
+            "cold_ms": [sample["cold_ms"] for sample in cold],
+            "cold_import_ms": [sample["import_ms"] for sample in cold],
+            "warm_ms": [sample["ms"] for sample in warm],
+            "queries": statistics.median([sample["queries"] for sample in warm]) if warm else None,
+            "alloc_peak_kb": traced["alloc_peak_kb"] if traced else None,
+            "alloc_retained_kb": traced["alloc_retained_kb"] if traced else None,
+        })
+
+    print()
+    print(f"{'route':<30} {'status':<8} {'cold p50':>9} {'warm p50':>9} {'p90':>8} {'p99':>8} {'queries':>8} {'peak KB':>9} {'kept KB':>8}")
+    for row in results:
+        warm = row["warm_ms"]
+        cells = [
+            f"{statistics.median(row['cold_ms']):9.1f}" if row["cold_ms"] else f"{'-':>9}",
+            f"{percentile(warm, 50):9.2f}" if warm else f"{'-':>9}",
+            f"{percentile(warm, 90):8.2f}" if warm else f"{'-':>8}",
+            f"{percentile(warm, 99):8.2f}" if warm else f"{'-':>8}",
+            f"{row['queries']:8g}" if row["queries"] is not None else f"{'-':>8}",
+            f"{row['alloc_peak_kb']:9.1f}" if row["alloc_peak_kb"] is not None else f"{'-':>9}",
+            f"{row['alloc_retained_kb']:8.1f}" if row["alloc_retained_kb"] is not None else f"{'-':>8}",
+        ]
+        print(f"{row['route']:<30} {','.join(row['status']):<8} " + " ".join(cells))
+
+    dispose_engines()
+    failed = [row["route"] for row in results if any(code.startswith("5") for code in row["status"])]
+    if args.json:
+        with open(args.json, "w") as target:
+            json.dump({"handler": args.handler, "event_version": args.event_version,
+                       "database_url": args.database_url.split("@")[-1], "routes": results}, target, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+    print(f"\n📁 Work directory: {args.workdir}")
+    if failed:
+        print(f"❌ Server errors in: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ Replay complete")
+
+if __name__ == "__main__":
+    main()
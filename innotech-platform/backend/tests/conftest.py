@@ -1,24 +1,31 @@
 """
 Test configuration and fixtures
 """
+import os
+import tempfile
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db, to_async_url
 from app.main import app
 
-# Create test database (in-memory SQLite)
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Create test database (temporary SQLite file shared by the sync and async engines)
+TEST_DB_PATH = os.path.join(tempfile.mkdtemp(), "test.sqlite")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs each client on its own event loop, so async connections are not pooled
+async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 def override_get_db():
     try:
         db = TestingSessionLocal()
@@ -26,7 +33,12 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
@@ -42,6 +54,20 @@ def db_session():
     session.rollback()
     session.close()
 
+@pytest.fixture
+def sql_queries():
+    """Collect SQL statements executed through the sync and async test engines"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    for target in (engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for target in (engine, async_engine.sync_engine):
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
+
 @pytest.fixture
 def client():
     with TestClient(app) as test_client:
@@ -87,4 +113,22 @@ def trainer_headers(client):
     })
     
     token = response.json()["access_token"]
-    return {"Authorization": f"Bearer {token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
+@pytest.fixture
+def admin_headers(client):
+    """Get admin authentication headers"""
+    client.post("/auth/register", json={
+        "email": "admin@example.com",
+        "password": "adminpass123",
+        "first_name": "Admin",
+        "last_name": "User",
+        "role": "admin"
+    })
+    
+    response = client.post("/auth/login", json={
+        "email": "admin@example.com",
+        "password": "adminpass123"
+    })
+    
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
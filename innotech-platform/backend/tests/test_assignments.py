@@ -213,4 +213,1193 @@ def test_duplicate_submission_fails(client: TestClient, auth_headers, trainer_he
         headers=auth_headers,
         data={"content": "Second submission"}
     )
-    assert response2.status_code == 400
\ No newline at end of file
+    assert response2.status_code == 400
+
+def test_get_assignment_with_submissions(client: TestClient, auth_headers, trainer_headers):
+    """Test trainer viewing assignment details with nested submissions"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={
+            "title": "Test Course",
+            "description": "Test course description",
+            "status": "published"
+        }
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={
+            "course_id": course_id,
+            "title": "Test Assignment",
+            "description": "Test assignment description",
+            "max_score": 100
+        }
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    submission_response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        data={"content": "My submission"}
+    )
+    submission_id = submission_response.json()["id"]
+    
+    response = client.get(f"/assignments/{assignment_id}", headers=trainer_headers)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["submissions_count"] == 1
+    assert data["submissions"][0]["student"]["email"] == "testuser@example.com"
+    
+    # Submission detail includes the parent assignment
+    response = client.get(f"/assignments/submissions/{submission_id}", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.json()["assignment"]["id"] == assignment_id
+
+def test_delete_assignment_with_submissions(client: TestClient, auth_headers, trainer_headers):
+    """Test deleting an assignment removes its submissions"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={
+            "title": "Test Course",
+            "description": "Test course description",
+            "status": "published"
+        }
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={
+            "course_id": course_id,
+            "title": "Test Assignment",
+            "description": "Test assignment description",
+            "max_score": 100
+        }
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    submission_response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        data={"content": "My submission"}
+    )
+    submission_id = submission_response.json()["id"]
+    
+    response = client.delete(f"/assignments/{assignment_id}", headers=trainer_headers)
+    assert response.status_code == 200
+    
+    response = client.get(f"/assignments/submissions/{submission_id}", headers=auth_headers)
+    assert response.status_code == 404
+
+def test_submission_unique_per_student(db_session):
+    """Test that the database rejects a second submission for the same student"""
+    from sqlalchemy.exc import IntegrityError
+    from app.models.assignment import Submission
+    
+    db_session.add(Submission(assignment_id=999, student_id=999, content="First"))
+    db_session.commit()
+    
+    db_session.add(Submission(assignment_id=999, student_id=999, content="Second"))
+    with pytest.raises(IntegrityError):
+        db_session.commit()
+
+def test_get_assignments_constant_queries(client: TestClient, auth_headers, trainer_headers, sql_queries):
+    """Test that listing assignments does not issue one count query per assignment"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={
+            "title": "Test Course",
+            "description": "Test course description",
+            "status": "published"
+        }
+    )
+    course_id = course_response.json()["id"]
+    
+    def create_assignment(title):
+        response = client.post("/assignments/", 
+            headers=trainer_headers,
+            json={"course_id": course_id, "title": title, "max_score": 100}
+        )
+        return response.json()["id"]
+    
+    first_id = create_assignment("Assignment 1")
+    client.post(f"/assignments/{first_id}/submissions",
+        headers=auth_headers,
+        data={"content": "My submission"}
+    )
+    
+    sql_queries.clear()
+    response = client.get(f"/assignments/?course_id={course_id}", headers=auth_headers)
+    queries_for_one = len(sql_queries)
+    
+    assert response.status_code == 200
+    assert response.json()[0]["submissions_count"] == 1
+    
+    for i in range(2, 6):
+        create_assignment(f"Assignment {i}")
+    
+    sql_queries.clear()
+    response = client.get(f"/assignments/?course_id={course_id}", headers=auth_headers)
+    
+    assert len(response.json()) == 5
+    assert len(sql_queries) == queries_for_one
+
+def test_assignment_list_omits_instructions(client: TestClient, auth_headers, trainer_headers):
+    """Test that the assignment list omits instructions but the detail includes them"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={
+            "title": "Test Course",
+            "description": "Test course description",
+            "status": "published"
+        }
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={
+            "course_id": course_id,
+            "title": "Test Assignment",
+            "instructions": "Step by step instructions",
+            "max_score": 100
+        }
+    )
+    assert assignment_response.json()["instructions"] == "Step by step instructions"
+    assignment_id = assignment_response.json()["id"]
+    
+    response = client.get(f"/assignments/?course_id={course_id}", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert "instructions" not in response.json()[0]
+    
+    response = client.get(f"/assignments/{assignment_id}", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.json()["instructions"] == "Step by step instructions"
+
+def test_submissions_cursor_pagination(client: TestClient, trainer_headers):
+    """Test that submissions support the cursor page envelope"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    student_ids = []
+    for i in range(3):
+        client.post("/auth/register", json={
+            "email": f"paged{i}@example.com",
+            "password": "password123",
+            "first_name": "Paged",
+            "last_name": "Student",
+            "role": "student"
+        })
+        token = client.post("/auth/login", json={
+            "email": f"paged{i}@example.com",
+            "password": "password123"
+        }).json()["access_token"]
+        client.post(f"/assignments/{assignment_id}/submissions",
+            headers={"Authorization": f"Bearer {token}"},
+            data={"content": f"Submission {i}"}
+        )
+    
+    response = client.get(f"/assignments/{assignment_id}/submissions",
+        headers=trainer_headers,
+        params={"cursor": "", "limit": 2}
+    )
+    first_page = response.json()
+    
+    assert response.status_code == 200
+    assert len(first_page["items"]) == 2
+    assert first_page["next_cursor"] is not None
+    
+    response = client.get(f"/assignments/{assignment_id}/submissions",
+        headers=trainer_headers,
+        params={"cursor": first_page["next_cursor"], "limit": 2}
+    )
+    second_page = response.json()
+    
+    assert [s["content"] for s in first_page["items"] + second_page["items"]] == [
+        "Submission 0", "Submission 1", "Submission 2"
+    ]
+    assert second_page["next_cursor"] is None
+
+def test_oversized_upload_is_rejected_without_size(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test that the size limit is enforced while streaming, not from UploadFile.size"""
+    from app.utils import file_handler
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    monkeypatch.setattr(file_handler, "MAX_FILE_SIZE", 1024)
+    monkeypatch.setattr(file_handler, "validate_file", lambda file: True)
+    files_before = set(file_handler.UPLOAD_DIR.rglob("*"))
+    
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("big.txt", io.BytesIO(b"x" * 2048), "text/plain")}
+    )
+    
+    assert response.status_code == 400
+    assert "too large" in response.json()["detail"]
+    assert {path for path in file_handler.UPLOAD_DIR.rglob("*") if path.is_file()} == {
+        path for path in files_before if path.is_file()
+    }
+    
+    response = client.get(f"/assignments/{assignment_id}/submissions", headers=trainer_headers)
+    assert response.json() == []
+
+def test_upload_is_hashed_while_it_is_written(tmp_path):
+    """Test that saving through HashingReader reads the upload once and reports its SHA-256"""
+    import hashlib
+    from app.utils.file_handler import HashingReader
+    from app.utils.storage import LocalStorage
+    
+    class CountingSource(io.BytesIO):
+        bytes_read = 0
+        
+        def read(self, size=-1):
+            chunk = super().read(size)
+            self.bytes_read += len(chunk)
+            return chunk
+    
+    payload = b"submission bytes " * 1000
+    source = CountingSource(payload)
+    storage = LocalStorage(tmp_path, "/uploads", "secret")
+    reader = HashingReader(source)
+    
+    storage.save("blobs/.incoming.part", reader)
+    storage.move("blobs/.incoming.part", f"blobs/{reader.sha256}.txt")
+    
+    assert source.bytes_read == len(payload)
+    assert reader.size == len(payload)
+    assert reader.sha256 == hashlib.sha256(payload).hexdigest()
+    assert reader.head == payload[:len(reader.head)]
+    assert (tmp_path / "blobs" / f"{reader.sha256}.txt").read_bytes() == payload
+    assert not (tmp_path / "blobs" / ".incoming.part").exists()
+
+def test_identical_uploads_share_one_blob(client: TestClient, trainer_headers, db_session):
+    """Test that identical files are stored once and deletes only drop the refcount"""
+    import hashlib
+    from app.models.assignment import Submission
+    from app.models.file_blob import FileBlob
+    from app.utils import file_handler
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    payload = b"PK\x03\x04starter project shared by the whole cohort"
+    submission_ids = []
+    for i in range(2):
+        client.post("/auth/register", json={
+            "email": f"cohort{i}@example.com",
+            "password": "password123",
+            "first_name": "Cohort",
+            "last_name": "Student",
+            "role": "student"
+        })
+        token = client.post("/auth/login", json={
+            "email": f"cohort{i}@example.com",
+            "password": "password123"
+        }).json()["access_token"]
+        response = client.post(f"/assignments/{assignment_id}/submissions",
+            headers={"Authorization": f"Bearer {token}"},
+            files={"file": (f"starter{i}.zip", io.BytesIO(payload), "application/zip")}
+        )
+        assert response.status_code == 200
+        assert response.json()["file_name"] == f"starter{i}.zip"
+        # clients only ever see the access-checked download endpoint, never the shared blob path
+        assert response.json()["file_url"] == f"/files/{response.json()['id']}"
+        submission_ids.append(response.json()["id"])
+    
+    assert {db_session.get(Submission, i).blob_sha256 for i in submission_ids} == {hashlib.sha256(payload).hexdigest()}
+    blob = db_session.get(FileBlob, hashlib.sha256(payload).hexdigest())
+    assert blob.ref_count == 2
+    assert blob.size == len(payload)
+    assert (file_handler.UPLOAD_DIR / blob.storage_path).read_bytes() == payload
+    assert client.get(f"/uploads/{blob.storage_path}").status_code == 404
+    
+    response = client.delete(f"/assignments/{assignment_id}", headers=trainer_headers)
+    assert response.status_code == 200
+    
+    db_session.refresh(blob)
+    assert blob.ref_count == 0
+    assert (file_handler.UPLOAD_DIR / blob.storage_path).exists()
+
+def test_direct_upload_with_presigned_url(client: TestClient, auth_headers, trainer_headers):
+    """Test uploading through a presigned URL and submitting only the metadata"""
+    import hashlib
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    payload = b"%PDF-1.4 report uploaded straight to storage"
+    sha256 = hashlib.sha256(payload).hexdigest()
+    response = client.post(f"/assignments/{assignment_id}/submissions/upload-url",
+        headers=auth_headers,
+        json={"file_name": "report.pdf", "size": len(payload), "sha256": sha256}
+    )
+    upload = response.json()
+    
+    assert response.status_code == 200
+    assert upload["upload_required"] is True
+    assert upload["method"] == "PUT"
+    
+    # bytes that do not match the signed checksum are rejected
+    response = client.put(upload["upload_url"], content=b"x" * len(payload), headers=upload["headers"])
+    assert response.status_code == 400
+    
+    response = client.put(upload["upload_url"], content=payload, headers=upload["headers"])
+    assert response.status_code == 200
+    
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        data={"upload_sha256": sha256, "upload_file_name": "report.pdf"}
+    )
+    submission = response.json()
+    
+    assert response.status_code == 200
+    assert submission["file_name"] == "report.pdf"
+    
+    response = client.get(f"/assignments/submissions/{submission['id']}/download-url", headers=trainer_headers)
+    assert response.status_code == 200
+    # local storage hands out the access-checked download endpoint, not a public /uploads path
+    assert response.json()["url"] == f"/files/{submission['id']}"
+    assert client.get(response.json()["url"]).status_code in (401, 403)
+    assert client.get(response.json()["url"], headers=trainer_headers).content == payload
+    
+    # the author already references the blob, so a later submission needs no upload
+    other_assignment_id = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Second Assignment", "max_score": 100}
+    ).json()["id"]
+    response = client.post(f"/assignments/{other_assignment_id}/submissions/upload-url",
+        headers=auth_headers,
+        json={"file_name": "report.pdf", "size": len(payload), "sha256": sha256}
+    )
+    assert response.json()["upload_required"] is False
+    
+    # knowing the hash is not enough: another student must upload the bytes themselves
+    client.post("/auth/register", json={
+        "email": "presigned@example.com",
+        "password": "password123",
+        "first_name": "Presigned",
+        "last_name": "Student",
+        "role": "student"
+    })
+    token = client.post("/auth/login", json={
+        "email": "presigned@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {token}"}
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=other_headers,
+        data={"upload_sha256": sha256, "upload_file_name": "copy.pdf"}
+    )
+    assert response.status_code == 400
+    
+    response = client.post(f"/assignments/{assignment_id}/submissions/upload-url",
+        headers=other_headers,
+        json={"file_name": "copy.pdf", "size": len(payload), "sha256": sha256}
+    )
+    upload = response.json()
+    assert upload["upload_required"] is True
+    assert client.put(upload["upload_url"], content=payload, headers=upload["headers"]).status_code == 200
+    
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=other_headers,
+        data={"upload_sha256": sha256, "upload_file_name": "copy.pdf"}
+    )
+    assert response.status_code == 200
+    assert response.json()["file_url"] == f"/files/{response.json()['id']}"
+    assert client.get(response.json()["file_url"], headers=other_headers).content == payload
+
+def test_presigned_url_rejects_tampered_signature(client: TestClient):
+    """Test that the local storage PUT endpoint checks the signature"""
+    sha256 = "0" * 64
+    response = client.put("/storage/blobs/evil.txt",
+        params={"size": 4, "sha256": sha256, "expires": 9999999999, "signature": "forged"},
+        content=b"evil"
+    )
+    
+    assert response.status_code == 403
+
+def test_s3_storage_presigns_checksum_and_length():
+    """Test that S3 presigned PUTs pin the size and checksum (no network needed)"""
+    import boto3
+    from botocore.config import Config
+    from app.utils.storage import S3Storage, sha256_to_base64
+    
+    client = boto3.client(
+        "s3",
+        region_name="ap-southeast-2",
+        endpoint_url="http://localhost:9000",
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        config=Config(signature_version="s3v4"),
+    )
+    storage = S3Storage("submissions", "ap-southeast-2", client=client)
+    sha256 = "ab" * 32
+    
+    upload = storage.presigned_put("blobs/report.pdf", 1234, sha256, 60)
+    
+    assert upload["url"].startswith("http://localhost:9000/submissions/blobs/report.pdf?")
+    assert "content-length%3Bhost%3Bx-amz-checksum-sha256" in upload["url"]
+    assert upload["headers"] == {"Content-Length": "1234", "x-amz-checksum-sha256": sha256_to_base64(sha256)}
+    
+    download = storage.presigned_get("blobs/report.pdf", "report.pdf", 60)
+    assert "response-content-disposition=attachment" in download
+    assert storage.file_url("blobs/report.pdf") == "s3://submissions/blobs/report.pdf"
+
+def test_resumable_upload_resends_only_missing_chunks(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test the chunked upload session: partial ranges, resume, then complete"""
+    from app.api import assignments
+    from app.utils.chunked_upload import staging_dir
+    
+    monkeypatch.setattr(assignments, "UPLOAD_SESSION_CHUNK_SIZE", 4)
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    payload = b"PK\x03\x04012345"
+    response = client.post(f"/assignments/{assignment_id}/submissions/uploads",
+        headers=auth_headers,
+        json={"file_name": "archive.zip", "size": len(payload)}
+    )
+    upload = response.json()
+    
+    assert response.status_code == 200
+    assert upload["chunk_size"] == 4
+    assert upload["missing_chunks"] == [0, 1, 2]
+    
+    upload_url = f"/assignments/submissions/uploads/{upload['id']}"
+    client.put(f"{upload_url}/chunks/0", headers=auth_headers, content=payload[0:4])
+    client.put(f"{upload_url}/chunks/2", headers=auth_headers, content=payload[8:10])
+    
+    # the connection dropped: ask what arrived
+    upload = client.get(upload_url, headers=auth_headers).json()
+    assert upload["received"] == [{"start": 0, "end": 4}, {"start": 8, "end": 10}]
+    assert upload["missing_chunks"] == [1]
+    
+    response = client.post(f"{upload_url}/complete", headers=auth_headers, json={})
+    assert response.status_code == 409
+    
+    response = client.put(f"{upload_url}/chunks/1", headers=auth_headers, content=b"45")
+    assert response.status_code == 400
+    response = client.put(f"{upload_url}/chunks/1", headers=auth_headers, params={"offset": 0}, content=payload[4:8])
+    assert response.status_code == 400
+    response = client.put(f"{upload_url}/chunks/1", headers=auth_headers, params={"offset": 4}, content=payload[4:8])
+    assert response.status_code == 200
+    assert response.json()["received"] == [{"start": 0, "end": 10}]
+    
+    response = client.post(f"{upload_url}/complete", headers=auth_headers, json={"content": "see attached"})
+    submission = response.json()
+    
+    assert response.status_code == 200
+    assert submission["file_name"] == "archive.zip"
+    assert submission["content"] == "see attached"
+    assert not staging_dir(upload["id"]).exists()
+    assert client.get(upload_url, headers=auth_headers).status_code == 404
+    
+    response = client.get(f"/assignments/submissions/{submission['id']}/download-url", headers=auth_headers)
+    assert client.get(response.json()["url"], headers=auth_headers).content == payload
+
+def test_resumable_uploads_need_shared_staging(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test that sessions are refused up front when there is no shared staging directory (Lambda)"""
+    from app.utils import chunked_upload
+    
+    course_id = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    ).json()["id"]
+    assignment_id = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    ).json()["id"]
+    
+    monkeypatch.setattr(chunked_upload, "RESUMABLE_UPLOADS_ENABLED", False)
+    response = client.post(f"/assignments/{assignment_id}/submissions/uploads",
+        headers=auth_headers,
+        json={"file_name": "notes.txt", "size": 4}
+    )
+    
+    assert response.status_code == 503
+    assert "UPLOAD_STAGING_DIR" in response.json()["detail"]
+
+def test_concurrent_chunk_resends_do_not_clobber_each_other(tmp_path, monkeypatch):
+    """Test that two in-flight uploads of the same chunk each write their own partial file"""
+    import asyncio
+    from types import SimpleNamespace
+    from app.utils import chunked_upload
+    
+    monkeypatch.setattr(chunked_upload, "UPLOAD_STAGING_DIR", tmp_path)
+    session = SimpleNamespace(id="retry", size=8, chunk_size=8)
+    
+    async def slow_body(payload: bytes):
+        for offset in range(0, len(payload), 2):
+            await asyncio.sleep(0)
+            yield payload[offset:offset + 2]
+    
+    async def resend_twice():
+        await asyncio.gather(
+            chunked_upload.write_chunk(session, 0, slow_body(b"AAAAAAAA")),
+            chunked_upload.write_chunk(session, 0, slow_body(b"BBBBBBBB")),
+        )
+    asyncio.run(resend_twice())
+    
+    assert (tmp_path / "retry" / "0.chunk").read_bytes() in (b"AAAAAAAA", b"BBBBBBBB")
+    assert [path.name for path in (tmp_path / "retry").iterdir()] == ["0.chunk"]
+
+def test_upload_session_completion_rechecks_submit_rules(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test that completing an upload re-runs the submission checks and the quota"""
+    from app.utils import quota
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_ids = [
+        client.post("/assignments/", 
+            headers=trainer_headers,
+            json={"course_id": course_id, "title": title, "max_score": 100}
+        ).json()["id"]
+        for title in ("Submitted Meanwhile", "Quota Used Meanwhile")
+    ]
+    
+    payload = b"uploaded in one chunk"
+    upload_urls = []
+    for assignment_id in assignment_ids:
+        upload = client.post(f"/assignments/{assignment_id}/submissions/uploads",
+            headers=auth_headers,
+            json={"file_name": "notes.txt", "size": len(payload)}
+        ).json()
+        upload_url = f"/assignments/submissions/uploads/{upload['id']}"
+        client.put(f"{upload_url}/chunks/0", headers=auth_headers, content=payload)
+        upload_urls.append(upload_url)
+    
+    # the student submitted through another path while the upload was open
+    client.post(f"/assignments/{assignment_ids[0]}/submissions", headers=auth_headers, data={"content": "typed answer"})
+    response = client.post(f"{upload_urls[0]}/complete", headers=auth_headers, json={})
+    assert response.status_code == 400
+    assert "already submitted" in response.json()["detail"]
+    
+    monkeypatch.setattr(quota, "STORAGE_QUOTA_USER_BYTES", len(payload) - 1)
+    response = client.post(f"{upload_urls[1]}/complete", headers=auth_headers, json={})
+    assert response.status_code == 400
+    assert "quota exceeded" in response.json()["detail"]
+    
+    response = client.get(f"/assignments/{assignment_ids[1]}/submissions", headers=trainer_headers)
+    assert response.json() == []
+
+def test_file_download_endpoint(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test authenticated downloads with validators, ranges and proxy offload"""
+    import hashlib
+    from app.api import files
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    payload = b"downloadable submission body"
+    submission_id = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("notes.txt", io.BytesIO(payload), "text/plain")}
+    ).json()["id"]
+    
+    response = client.get(f"/files/{submission_id}", headers=auth_headers)
+    etag = response.headers["etag"]
+    
+    assert response.status_code == 200
+    assert response.content == payload
+    assert etag == f'"{hashlib.sha256(payload).hexdigest()}"'
+    assert "last-modified" in response.headers
+    assert "notes.txt" in response.headers["content-disposition"]
+    
+    response = client.get(f"/files/{submission_id}", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    response = client.get(f"/files/{submission_id}", headers={**auth_headers, "Range": "bytes=0-11"})
+    assert response.status_code == 206
+    assert response.content == payload[:12]
+    assert response.headers["content-range"] == f"bytes 0-11/{len(payload)}"
+    
+    assert client.get(f"/files/{submission_id}", headers=trainer_headers).status_code == 200
+    assert client.get(f"/files/{submission_id}").status_code in (401, 403)
+    
+    monkeypatch.setattr(files, "FILE_SENDFILE_HEADER", "X-Accel-Redirect")
+    response = client.get(f"/files/{submission_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"].startswith("/protected-uploads/blobs/")
+    assert response.content == b""
+
+def test_file_download_forbidden_for_other_students(client: TestClient, auth_headers, trainer_headers):
+    """Test that students cannot download each other's files"""
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    submission_id = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("private.txt", io.BytesIO(b"private work"), "text/plain")}
+    ).json()["id"]
+    
+    client.post("/auth/register", json={
+        "email": "curious@example.com",
+        "password": "password123",
+        "first_name": "Curious",
+        "last_name": "Student",
+        "role": "student"
+    })
+    token = client.post("/auth/login", json={
+        "email": "curious@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    
+    response = client.get(f"/files/{submission_id}", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+
+def test_submissions_archive_streams_zip_with_manifest(client: TestClient, auth_headers, trainer_headers):
+    """Test exporting all submissions of an assignment as one ZIP"""
+    import csv
+    import zipfile
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("essay.txt", io.BytesIO(b"essay body"), "text/plain")}
+    )
+    client.post("/auth/register", json={
+        "email": "textonly@example.com",
+        "password": "password123",
+        "first_name": "Text",
+        "last_name": "Only",
+        "role": "student"
+    })
+    token = client.post("/auth/login", json={
+        "email": "textonly@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    client.post(f"/assignments/{assignment_id}/submissions",
+        headers={"Authorization": f"Bearer {token}"},
+        data={"content": "inline answer"}
+    )
+    
+    assert client.get(f"/assignments/{assignment_id}/submissions/archive", headers=auth_headers).status_code == 403
+    
+    response = client.get(f"/assignments/{assignment_id}/submissions/archive", headers=trainer_headers)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.content))
+    assert archive.testzip() is None
+    manifest = list(csv.DictReader(io.StringIO(archive.read("manifest.csv").decode("utf-8-sig"))))
+    assert [row["student_email"] for row in manifest] == ["testuser@example.com", "textonly@example.com"]
+    assert manifest[1]["archive_path"] == ""
+    assert archive.read(manifest[0]["archive_path"]) == b"essay body"
+
+def test_stream_zip_memory_is_bounded_by_chunk_size(tmp_path, monkeypatch):
+    """Test that large files are streamed through the ZIP in chunk-sized pieces"""
+    import zipfile
+    from app.utils import archive
+    from app.utils.storage import LocalStorage
+    
+    monkeypatch.setattr(archive, "UPLOAD_CHUNK_SIZE", 64 * 1024)
+    storage = LocalStorage(tmp_path, "/uploads", "secret")
+    payload = bytes(range(256)) * 8192  # 2MB
+    (tmp_path / "big.zip").write_bytes(payload)
+    entry = archive.ArchiveEntry(
+        submission_id=1, student_id=1, student_email="big@example.com", student_name="Big File",
+        status="submitted", score=None, submitted_at=None, file_name="big.zip", storage_key="big.zip",
+    )
+    
+    chunks = list(archive.stream_zip([entry], storage))
+    
+    assert max(len(chunk) for chunk in chunks) <= 64 * 1024 + 1024
+    result = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert result.read("submissions/1_big/big.zip") == payload
+
+def test_migrate_upload_layout_moves_legacy_and_flat_files(client: TestClient, auth_headers, trainer_headers, db_session):
+    """Test that the online migration shards old files and rewrites file_url"""
+    import hashlib
+    from app.models.assignment import Submission
+    from app.models.file_blob import FileBlob
+    from app.utils import file_handler
+    from app.utils.upload_migration import migrate_upload_layout
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    legacy_payload = b"uploaded before content addressing"
+    legacy_path = file_handler.SUBMISSIONS_DIR / "legacy-upload.txt"
+    legacy_path.write_bytes(legacy_payload)
+    flat_payload = b"uploaded into the flat blobs directory"
+    flat_sha256 = hashlib.sha256(flat_payload).hexdigest()
+    flat_path = file_handler.BLOBS_DIR / f"{flat_sha256}.txt"
+    flat_path.write_bytes(flat_payload)
+    
+    submission_ids = []
+    for title in ("Legacy Assignment", "Flat Assignment"):
+        assignment_id = client.post("/assignments/", 
+            headers=trainer_headers,
+            json={"course_id": course_id, "title": title, "max_score": 100}
+        ).json()["id"]
+        submission_ids.append(client.post(f"/assignments/{assignment_id}/submissions",
+            headers=auth_headers,
+            data={"content": "placeholder"}
+        ).json()["id"])
+    legacy_id, flat_id = submission_ids
+    
+    db_session.add(FileBlob(sha256=flat_sha256, size=len(flat_payload), storage_path=f"blobs/{flat_sha256}.txt", ref_count=1))
+    db_session.flush()
+    legacy = db_session.get(Submission, legacy_id)
+    legacy.file_url = "/uploads/submissions/legacy-upload.txt"
+    legacy.file_name = "legacy.txt"
+    flat = db_session.get(Submission, flat_id)
+    flat.file_url = f"/uploads/blobs/{flat_sha256}.txt"
+    flat.file_name = "flat.txt"
+    flat.blob_sha256 = flat_sha256
+    db_session.commit()
+    
+    result = migrate_upload_layout(db_session, file_handler.get_storage(), batch_size=1)
+    
+    assert result["blobs"]["migrated"] == 1
+    assert result["legacy"]["migrated"] == 1
+    assert result["legacy"]["bytes"] == len(legacy_payload)
+    assert not legacy_path.exists()
+    assert not flat_path.exists()
+    
+    legacy_sha256 = hashlib.sha256(legacy_payload).hexdigest()
+    db_session.expire_all()
+    assert db_session.get(Submission, legacy_id).blob_sha256 == legacy_sha256
+    assert db_session.get(Submission, legacy_id).file_url == (
+        f"/uploads/blobs/{legacy_sha256[:2]}/{legacy_sha256[2:4]}/{legacy_sha256}.txt"
+    )
+    assert db_session.get(Submission, flat_id).file_url == (
+        f"/uploads/blobs/{flat_sha256[:2]}/{flat_sha256[2:4]}/{flat_sha256}.txt"
+    )
+    assert db_session.get(FileBlob, flat_sha256).storage_path == f"blobs/{flat_sha256[:2]}/{flat_sha256[2:4]}/{flat_sha256}.txt"
+    
+    assert client.get(f"/files/{legacy_id}", headers=auth_headers).content == legacy_payload
+    assert client.get(f"/files/{flat_id}", headers=auth_headers).content == flat_payload
+    
+    assert migrate_upload_layout(db_session, file_handler.get_storage())["legacy"]["migrated"] == 0
+
+def test_gc_removes_orphaned_uploads_after_grace_period(client: TestClient, auth_headers, trainer_headers, db_session):
+    """Test that the upload GC deletes unreferenced files and reports reclaimed bytes"""
+    import hashlib
+    from datetime import datetime, timedelta
+    from app.models.file_blob import FileBlob
+    from app.models.upload_session import UploadSession
+    from app.utils import file_handler
+    from app.utils.chunked_upload import staging_dir
+    from app.utils.upload_gc import collect_garbage
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    # abandoned resumable upload
+    upload_id = client.post(f"/assignments/{assignment_id}/submissions/uploads",
+        headers=auth_headers,
+        json={"file_name": "late.txt", "size": 4}
+    ).json()["id"]
+    client.put(f"/assignments/submissions/uploads/{upload_id}/chunks/0", headers=auth_headers, content=b"late")
+    
+    kept_payload = b"still referenced by a submission"
+    submission_id = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("kept.txt", io.BytesIO(kept_payload), "text/plain")}
+    ).json()["id"]
+    
+    storage = file_handler.get_storage()
+    orphan_payload = b"saved but the submission rolled back"
+    orphan_key = file_handler.blob_key(hashlib.sha256(orphan_payload).hexdigest(), "orphan.txt")
+    storage.save(orphan_key, io.BytesIO(orphan_payload))
+    released_payload = b"its submission was deleted by a cascade"
+    released_sha256 = hashlib.sha256(released_payload).hexdigest()
+    released_key = file_handler.blob_key(released_sha256, "released.txt")
+    storage.save(released_key, io.BytesIO(released_payload))
+    db_session.add(FileBlob(
+        sha256=released_sha256, size=len(released_payload), storage_path=released_key,
+        ref_count=1, created_at=datetime.utcnow() - timedelta(days=2),
+    ))
+    legacy_path = file_handler.SUBMISSIONS_DIR / "never-referenced.pdf"
+    legacy_path.write_bytes(b"%PDF-1.4 legacy orphan")
+    
+    db_session.get(UploadSession, upload_id).expires_at = datetime.utcnow() - timedelta(hours=1)
+    db_session.commit()
+    
+    result = collect_garbage(db_session, storage)
+    assert storage.path(orphan_key).exists()
+    assert storage.path(released_key).exists()
+    assert legacy_path.exists()
+    assert result["staging"]["deleted"] == 1
+    assert not staging_dir(upload_id).exists()
+    
+    dry_run = collect_garbage(db_session, storage, grace_hours=0, dry_run=True)
+    assert dry_run["blobs"]["deleted"] == 0
+    assert dry_run["blobs"]["reclaimed_bytes"] >= len(orphan_payload) + len(released_payload)
+    assert storage.path(orphan_key).exists()
+    
+    # run_size=1 spills every listed name to its own sorted run before the merge
+    result = collect_garbage(db_session, storage, grace_hours=0, batch_size=2, run_size=1)
+    
+    assert not storage.path(orphan_key).exists()
+    assert not storage.path(released_key).exists()
+    assert not legacy_path.exists()
+    assert result["blobs"]["reclaimed_bytes"] >= len(orphan_payload) + len(released_payload)
+    db_session.expire_all()
+    assert db_session.get(FileBlob, released_sha256) is None
+    
+    response = client.get(f"/files/{submission_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.content == kept_payload
+
+def test_gc_sorts_large_directories_in_bounded_runs(tmp_path):
+    """Test that directory listings are merged from sorted runs instead of being sorted in memory"""
+    import random
+    from app.utils.upload_gc import iter_blob_files, iter_sorted_files
+    
+    names = [f"{random.getrandbits(256):064x}.txt" for _ in range(25)] + ["stale.part"]
+    for name in names:
+        (tmp_path / name).write_bytes(b"x")
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / ("ab" + "0" * 62 + ".pdf")).write_bytes(b"y")
+    
+    assert list(iter_sorted_files(tmp_path, str, run_size=4)) == [(name, name) for name in sorted(names)]
+    sort_keys = [disk_file.sort_key for disk_file in iter_blob_files(tmp_path, tmp_path, run_size=3)]
+    assert sort_keys == sorted(sort_keys) and len(sort_keys) == len(names) + 1
+    assert sort_keys[0] == ""
+
+def test_gc_and_concurrent_upload_keep_the_blob(client: TestClient, auth_headers, trainer_headers, db_session, monkeypatch):
+    """Test that a blob re-referenced while the GC runs keeps both its row and its file"""
+    import hashlib
+    from datetime import datetime, timedelta
+    from sqlalchemy import delete
+    from app.models.file_blob import FileBlob
+    from app.utils import file_handler
+    from app.utils.upload_gc import _unchanged_blob, collect_orphan_blobs, iter_blob_rows
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    assignment_id = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    ).json()["id"]
+    
+    storage = file_handler.get_storage()
+    payload = b"uploaded again while the collector was running"
+    sha256 = hashlib.sha256(payload).hexdigest()
+    key = file_handler.blob_key(sha256, "notes.txt")
+    storage.save(key, io.BytesIO(payload))
+    db_session.add(FileBlob(
+        sha256=sha256, size=len(payload), storage_path=key, ref_count=0,
+        created_at=datetime.utcnow() - timedelta(days=2),
+    ))
+    db_session.commit()
+    
+    # the grace window counts from the last reference, not from created_at
+    db_session.get(FileBlob, sha256).last_referenced_at = datetime.utcnow()
+    db_session.commit()
+    assert collect_orphan_blobs(db_session, storage, grace_seconds=3600)["deleted"] == 0
+    assert storage.path(key).exists()
+    
+    # a reference added after the collector read the row makes its DELETE match nothing
+    observed = next(row for row in iter_blob_rows(db_session, 10) if row.sha256 == sha256)
+    db_session.execute(file_handler.blob_reference_upsert("sqlite", sha256, len(payload), key))
+    db_session.commit()
+    assert db_session.execute(delete(FileBlob).where(_unchanged_blob(observed))).rowcount == 0
+    db_session.rollback()
+    observed = next(row for row in iter_blob_rows(db_session, 10) if row.sha256 == sha256)
+    assert db_session.execute(delete(FileBlob).where(_unchanged_blob(observed))).rowcount == 1
+    db_session.rollback()
+    
+    # the collector removed the blob between the dedup check and the reference upsert
+    add_reference = file_handler._add_blob_reference
+    
+    async def collected_meanwhile(db, sha256, size, key):
+        storage.delete(key)
+        await add_reference(db, sha256, size, key)
+    
+    monkeypatch.setattr(file_handler, "_add_blob_reference", collected_meanwhile)
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("notes.txt", io.BytesIO(payload), "text/plain")}
+    )
+    assert response.status_code == 200
+    assert storage.path(key).read_bytes() == payload
+    assert client.get(f"/files/{response.json()['id']}", headers=auth_headers).content == payload
+
+def test_storage_quota_counters(client: TestClient, auth_headers, trainer_headers, monkeypatch):
+    """Test that usage counters follow submissions and the quota is enforced at upload"""
+    import hashlib
+    from app.utils import file_handler, quota
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Quota Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_ids = [
+        client.post("/assignments/", 
+            headers=trainer_headers,
+            json={"course_id": course_id, "title": f"Quota Assignment {i}", "max_score": 100}
+        ).json()["id"]
+        for i in range(3)
+    ]
+    
+    client.post("/auth/register", json={
+        "email": "quotaadmin@example.com",
+        "password": "adminpass123",
+        "first_name": "Quota",
+        "last_name": "Admin",
+        "role": "admin"
+    })
+    token = client.post("/auth/login", json={
+        "email": "quotaadmin@example.com",
+        "password": "adminpass123"
+    }).json()["access_token"]
+    admin_headers = {"Authorization": f"Bearer {token}"}
+    
+    def usage():
+        report = client.get("/users/storage-usage", headers=admin_headers, params={"limit": 100}).json()
+        courses = {course["id"]: course["storage_used_bytes"] for course in report["courses"]}
+        return courses.get(course_id, 0)
+    
+    response = client.post(f"/assignments/{assignment_ids[0]}/submissions",
+        headers=auth_headers,
+        files={"file": ("first.txt", io.BytesIO(b"x" * 300), "text/plain")}
+    )
+    assert response.status_code == 200
+    assert response.json()["file_size"] == 300
+    assert usage() == 300
+    
+    student_used = client.get("/users/storage-usage", headers=admin_headers, params={"limit": 100}).json()["users"]
+    student_used = {user["name"]: user["storage_used_bytes"] for user in student_used}["Test User"]
+    monkeypatch.setattr(quota, "STORAGE_QUOTA_USER_BYTES", student_used + 500)
+    
+    response = client.post(f"/assignments/{assignment_ids[1]}/submissions/uploads",
+        headers=auth_headers,
+        json={"file_name": "big.txt", "size": 600}
+    )
+    assert response.status_code == 400
+    assert "quota" in response.json()["detail"]
+    
+    # the measured size is charged before the file becomes a blob, whatever UploadFile.size says
+    response = client.post(f"/assignments/{assignment_ids[1]}/submissions",
+        headers=auth_headers,
+        files={"file": ("big.txt", io.BytesIO(b"y" * 600), "text/plain")}
+    )
+    assert response.status_code == 400
+    assert usage() == 300
+    big_sha256 = hashlib.sha256(b"y" * 600).hexdigest()
+    assert not list(file_handler.BLOBS_DIR.rglob(f"{big_sha256}*"))
+    
+    response = client.post(f"/assignments/{assignment_ids[2]}/submissions",
+        headers=auth_headers,
+        files={"file": ("small.txt", io.BytesIO(b"z" * 400), "text/plain")}
+    )
+    assert response.status_code == 200
+    assert usage() == 700
+    
+    client.delete(f"/assignments/{assignment_ids[0]}", headers=trainer_headers)
+    assert usage() == 400
+    
+    assert client.get("/users/storage-usage", headers=auth_headers).status_code == 403
+
+def test_deleting_users_and_courses_releases_storage(client: TestClient, auth_headers, trainer_headers, admin_headers, db_session):
+    """Test that every path that deletes submissions returns quota and blob references"""
+    import hashlib
+    from app.models.assignment import Submission
+    from app.models.course import Course
+    from app.models.file_blob import FileBlob
+    from app.models.user import User
+    
+    courses = [
+        client.post("/courses/", headers=trainer_headers, json={"title": title, "status": "published"}).json()["id"]
+        for title in ("Kept Course", "Deleted Course")
+    ]
+    assignments = {
+        course_id: client.post("/assignments/", 
+            headers=trainer_headers,
+            json={"course_id": course_id, "title": "Shared Assignment", "max_score": 100}
+        ).json()["id"]
+        for course_id in courses
+    }
+    
+    client.post("/auth/register", json={
+        "email": "leaving@example.com",
+        "password": "password123",
+        "first_name": "Leaving",
+        "last_name": "Student",
+        "role": "student"
+    })
+    token = client.post("/auth/login", json={
+        "email": "leaving@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    leaving_headers = {"Authorization": f"Bearer {token}"}
+    leaving_id = client.get("/auth/me", headers=leaving_headers).json()["id"]
+    student_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+    
+    payload = b"the same notes from two students"
+    sha256 = hashlib.sha256(payload).hexdigest()
+    student_used = db_session.get(User, student_id).storage_used_bytes
+    for headers in (auth_headers, leaving_headers):
+        for assignment_id in assignments.values():
+            response = client.post(f"/assignments/{assignment_id}/submissions",
+                headers=headers,
+                files={"file": ("notes.txt", io.BytesIO(payload), "text/plain")}
+            )
+            assert response.status_code == 200
+    
+    def counters():
+        db_session.expire_all()
+        blob = db_session.get(FileBlob, sha256)
+        return (
+            blob.ref_count,
+            db_session.get(User, student_id).storage_used_bytes - student_used,
+            [db_session.get(Course, course_id).storage_used_bytes if db_session.get(Course, course_id) else None for course_id in courses],
+        )
+    
+    size = len(payload)
+    assert counters() == (4, 2 * size, [2 * size, 2 * size])
+    
+    assert client.delete(f"/users/{leaving_id}", headers=admin_headers).status_code == 200
+    assert counters() == (2, 2 * size, [size, size])
+    assert db_session.query(Submission).filter(Submission.student_id == leaving_id).count() == 0
+    
+    assert client.delete(f"/courses/{courses[1]}", headers=trainer_headers).status_code == 200
+    assert counters() == (1, size, [size, None])
+    assert client.get(f"/assignments/{assignments[courses[1]]}", headers=trainer_headers).status_code == 404
+
+def test_upload_content_must_match_extension(client: TestClient, auth_headers, trainer_headers):
+    """Test magic-byte sniffing: renamed executables are rejected, the detected type is served"""
+    from app.utils.content_type import DOCX, detect_content_type, sniff_content_type
+    
+    assert detect_content_type(b"\x89PNG\r\n\x1a\n....") == "image/png"
+    assert detect_content_type(b"\xff\xd8\xff\xe0") == "image/jpeg"
+    assert detect_content_type(b"GIF89a") == "image/gif"
+    assert detect_content_type("สวัสดี".encode()[:-1]) == "text/plain; charset=utf-8"  # cut mid-character
+    assert detect_content_type(b"MZ\x90\x00\x03\x00") is None
+    assert sniff_content_type(b"PK\x03\x04[Content_Types].xml", "essay.docx") == DOCX
+    
+    course_response = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Test Course", "status": "published"}
+    )
+    course_id = course_response.json()["id"]
+    
+    assignment_response = client.post("/assignments/", 
+        headers=trainer_headers,
+        json={"course_id": course_id, "title": "Test Assignment", "max_score": 100}
+    )
+    assignment_id = assignment_response.json()["id"]
+    
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("homework.pdf", io.BytesIO(b"MZ\x90\x00\x03\x00\x00\x00"), "application/pdf")}
+    )
+    assert response.status_code == 400
+    assert "does not match" in response.json()["detail"]
+    
+    payload = b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n1 0 obj"
+    response = client.post(f"/assignments/{assignment_id}/submissions",
+        headers=auth_headers,
+        files={"file": ("homework.pdf", io.BytesIO(payload), "application/octet-stream")}
+    )
+    assert response.status_code == 200
+    assert response.json()["content_type"] == "application/pdf"
+    
+    response = client.get(f"/files/{response.json()['id']}", headers=auth_headers)
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["x-content-type-options"] == "nosniff"
@@ -85,4 +85,242 @@ def test_duplicate_email_registration(client: TestClient):
     
     # Second registration with same email should fail
     response2 = client.post("/auth/register", json=user_data)
-    assert response2.status_code == 400
\ No newline at end of file
+    assert response2.status_code == 400
+def test_token_cache_skips_user_lookup(client: TestClient, auth_headers, sql_queries):
+    """Test that repeated requests with the same token reuse the cached principal"""
+    from app.utils.auth import token_cache
+    user_id = client.get("/auth/me", headers=auth_headers).json()["id"]
+    token_cache.clear()
+    sql_queries.clear()
+    
+    # get_user itself loads the requested user once; the principal lookup is extra on a miss
+    client.get(f"/users/{user_id}", headers=auth_headers)
+    first_lookups = [s for s in sql_queries if "FROM users" in s]
+    
+    sql_queries.clear()
+    client.get(f"/users/{user_id}", headers=auth_headers)
+    second_lookups = [s for s in sql_queries if "FROM users" in s]
+    
+    assert len(first_lookups) == 2
+    assert len(second_lookups) == 1
+
+def test_user_update_invalidates_token_cache(client: TestClient):
+    """Test that deactivating a user takes effect despite the token cache"""
+    user_id = client.post("/auth/register", json={
+        "email": "cacheuser@example.com",
+        "password": "password123",
+        "first_name": "Cache",
+        "last_name": "User",
+        "role": "student"
+    }).json()["id"]
+    token = client.post("/auth/login", json={
+        "email": "cacheuser@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    assert client.get("/courses/my/enrollments", headers=headers).status_code == 200
+    
+    response = client.put(f"/users/{user_id}", headers=headers, json={"is_active": False})
+    assert response.status_code == 200
+    
+    # deactivation bumps token_version, so the old token is revoked
+    response = client.get("/courses/my/enrollments", headers=headers)
+    assert response.status_code == 401
+    response = client.get(f"/users/{user_id}", headers=headers)
+    assert response.status_code == 401
+
+def test_claims_cache_does_not_bypass_write_checks(client: TestClient, db_session):
+    """Test that a claims-only cache entry from a read endpoint is not trusted by write endpoints"""
+    from app.models.user import User
+    user_id = client.post("/auth/register", json={
+        "email": "claimscache@example.com",
+        "password": "password123",
+        "first_name": "Claims",
+        "last_name": "Cache",
+        "role": "student"
+    }).json()["id"]
+    token = client.post("/auth/login", json={
+        "email": "claimscache@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/courses/my/enrollments", headers=headers).status_code == 200
+    
+    # deactivated by another worker: this process's cache is not invalidated
+    user = db_session.get(User, user_id)
+    user.is_active = False
+    user.token_version = (user.token_version or 0) + 1
+    db_session.commit()
+    
+    client.get("/courses/my/enrollments", headers=headers)
+    response = client.put(f"/users/{user_id}", headers=headers, json={"first_name": "Still"})
+    assert response.status_code == 401
+
+def test_access_token_carries_claims(client: TestClient):
+    """Test that login issues a token with id, role and version claims"""
+    from app.utils.auth import verify_token
+    user_id = client.post("/auth/register", json={
+        "email": "claimsuser@example.com",
+        "password": "password123",
+        "first_name": "Claims",
+        "last_name": "User",
+        "role": "trainer"
+    }).json()["id"]
+    token = client.post("/auth/login", json={
+        "email": "claimsuser@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    
+    payload = verify_token(token)
+    
+    assert payload["uid"] == user_id
+    assert payload["role"] == "trainer"
+    assert payload["ver"] == 0
+
+def test_claims_principal_skips_user_lookup(client: TestClient, auth_headers, sql_queries):
+    """Test that read-only endpoints authorize from token claims alone"""
+    from app.utils.auth import token_cache
+    token_cache.clear()
+    sql_queries.clear()
+    
+    response = client.get("/courses/my/enrollments", headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in sql_queries)
+
+def test_role_change_revokes_claims_token(client: TestClient):
+    """Test that changing a user's role rejects tokens carrying the old role"""
+    def register_and_login(email, role):
+        user_id = client.post("/auth/register", json={
+            "email": email,
+            "password": "password123",
+            "first_name": "Role",
+            "last_name": "User",
+            "role": role
+        }).json()["id"]
+        token = client.post("/auth/login", json={"email": email, "password": "password123"}).json()["access_token"]
+        return user_id, {"Authorization": f"Bearer {token}"}
+    
+    _, admin_headers = register_and_login("roleadmin@example.com", "admin")
+    user_id, user_headers = register_and_login("roletrainer@example.com", "trainer")
+    
+    assert client.get("/assignments/", headers=user_headers).status_code == 200
+    
+    response = client.put(f"/users/{user_id}", headers=admin_headers, json={"role": "student"})
+    assert response.status_code == 200
+    
+    assert client.get("/assignments/", headers=user_headers).status_code == 401
+    
+    # a fresh login carries the new role and version
+    token = client.post("/auth/login", json={
+        "email": "roletrainer@example.com",
+        "password": "password123"
+    }).json()["access_token"]
+    response = client.get("/assignments/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+def test_password_hash_executor_backpressure():
+    """Test that a full hashing queue is rejected with 503 and Retry-After"""
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from app.utils.hashing import PasswordHashExecutor
+    
+    hasher = PasswordHashExecutor(workers=1, queue_limit=0, retry_after=3)
+    release = threading.Event()
+    
+    async def scenario():
+        busy = asyncio.ensure_future(hasher.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc_info:
+            await hasher.run(lambda: None)
+        release.set()
+        await busy
+        return exc_info.value
+    
+    error = asyncio.run(scenario())
+    
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "3"
+    stats = hasher.stats()
+    assert stats["rejected"] == 1
+    assert stats["completed"] == 1
+    assert stats["in_flight"] == 0
+
+def test_password_hash_executor_counts_cancelled_requests_until_done():
+    """Test that a cancelled request keeps its slot until its bcrypt call has actually finished"""
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from app.utils.hashing import PasswordHashExecutor
+    
+    hasher = PasswordHashExecutor(workers=1, queue_limit=0, retry_after=3)
+    release = threading.Event()
+    
+    async def scenario():
+        busy = asyncio.ensure_future(hasher.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        busy.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await busy
+        # the worker thread is still hashing, so the queue is still full
+        assert hasher.stats()["in_flight"] == 1
+        with pytest.raises(HTTPException):
+            await hasher.run(lambda: None)
+        release.set()
+        while hasher.stats()["in_flight"]:
+            await asyncio.sleep(0.01)
+        return await hasher.run(lambda: "hashed")
+    
+    assert asyncio.run(scenario()) == "hashed"
+    assert hasher.stats()["in_flight"] == 0
+
+def test_metrics_reports_hash_queue(client: TestClient, auth_headers, admin_headers):
+    """Test that hashing metrics are exposed to admins only"""
+    assert client.get("/metrics").status_code in (401, 403)
+    assert client.get("/metrics", headers=auth_headers).status_code == 403
+    
+    response = client.get("/metrics", headers=admin_headers)
+    
+    assert response.status_code == 200
+    assert response.json()["password_hashing"]["completed"] > 0
+
+def test_login_rehashes_outdated_password_hash(client: TestClient, db_session):
+    """Test that a hash with an outdated bcrypt cost is upgraded on login"""
+    from passlib.hash import bcrypt
+    from app.models.user import User
+    from app.utils.auth import pwd_context
+    
+    user = User(
+        email="rehash@example.com",
+        hashed_password=bcrypt.using(rounds=4).hash("password123"),
+        first_name="Re",
+        last_name="Hash",
+    )
+    db_session.add(user)
+    db_session.commit()
+    assert pwd_context.needs_update(user.hashed_password)
+    
+    response = client.post("/auth/login", json={"email": "rehash@example.com", "password": "password123"})
+    assert response.status_code == 200
+    
+    db_session.refresh(user)
+    assert not pwd_context.needs_update(user.hashed_password)
+    assert pwd_context.verify("password123", user.hashed_password)
+    
+    # a failed login leaves the hash alone
+    current_hash = user.hashed_password
+    response = client.post("/auth/login", json={"email": "rehash@example.com", "password": "wrong"})
+    assert response.status_code == 401
+    db_session.refresh(user)
+    assert user.hashed_password == current_hash
+
+def test_calibrate_bcrypt_rounds():
+    """Test that calibration stops at the first cost above the target"""
+    from app.utils.hashing import calibrate_bcrypt_rounds
+    
+    result = calibrate_bcrypt_rounds(target_ms=0, samples=1, max_rounds=6)
+    
+    assert result["rounds"] == 4
+    assert list(result["timings_ms"]) == [4]
@@ -0,0 +1,54 @@
+"""
+Test CORS handling
+"""
+from fastapi.testclient import TestClient
+
+def test_cors_preflight_is_answered_before_routing(client: TestClient, monkeypatch):
+    """Test that preflights short-circuit with cached headers, in the app and through the Lambda adapter"""
+    preflight = {"Origin": "http://localhost:3000", "Access-Control-Request-Method": "GET"}
+    response = client.options("/users/me", headers=preflight)
+    
+    assert response.status_code == 204
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert int(response.headers["access-control-max-age"]) >= 3600
+    assert client.options("/users/me", headers={**preflight, "Origin": "https://evil.example"}).status_code == 400
+    
+    # range and conditional downloads need their request headers allowed
+    response = client.options("/files/1", headers={**preflight, "Access-Control-Request-Headers": "range, if-range, if-none-match"})
+    assert response.status_code == 204
+    allowed = {name.strip().lower() for name in response.headers["access-control-allow-headers"].split(",")}
+    assert {"range", "if-range", "if-none-match"} <= allowed
+    assert "Access-Control-Request-Headers" in response.headers["vary"]
+    
+    from app.utils.cors import CORSConfig
+    fixed = CORSConfig(allow_origins=["http://localhost:3000"], allow_headers="Authorization, Range")
+    headers = dict(fixed.preflight_response_headers(b"http://localhost:3000", b"x-other"))
+    assert headers[b"access-control-allow-headers"] == b"Authorization, Range"
+    
+    response = client.get("/health", headers={"Origin": "http://localhost:3000"})
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert "access-control-allow-origin" not in client.get("/health", headers={"Origin": "https://evil.example"}).headers
+    
+    # API Gateway (REST, payload v1) preflight through the Lambda entry point
+    monkeypatch.setenv("DATABASE_URL", "sqlite://")
+    monkeypatch.setenv("ALLOWED_ORIGINS", "http://localhost:3000")
+    import full_handler
+    event = {
+        "httpMethod": "OPTIONS", "path": "/courses/", "resource": "/{proxy+}",
+        "headers": {"origin": "http://localhost:3000", "access-control-request-method": "POST"},
+        "multiValueHeaders": {}, "queryStringParameters": None, "multiValueQueryStringParameters": None,
+        "requestContext": {"resourcePath": "/{proxy+}", "httpMethod": "OPTIONS", "stage": "prod", "identity": {"sourceIp": "127.0.0.1"}},
+        "body": None, "isBase64Encoded": False,
+    }
+    # Mangum runs on the thread's current event loop, as in a fresh Lambda process
+    import asyncio
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        result = full_handler.lambda_handler(event, None)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    assert result["statusCode"] == 204, result
+    headers = {key.lower(): value for key, value in {**result["headers"], **result.get("multiValueHeaders", {})}.items()}
+    assert "localhost:3000" in str(headers["access-control-allow-origin"])
@@ -160,4 +160,91 @@ def test_update_course(client: TestClient, trainer_headers):
     data = response.json()
     assert data["title"] == "Updated Title"
     assert data["description"] == "Updated description"
-    assert data["status"] == "published"
\ No newline at end of file
+    assert data["status"] == "published"
+
+
+def test_course_listings_constant_queries(client: TestClient, auth_headers, trainer_headers, db_session, sql_queries):
+    """Test that course and enrollment listings eager-load nested relationships"""
+    from app.models.course import Module
+    
+    def create_published_course(title):
+        course_id = client.post("/courses/", 
+            headers=trainer_headers,
+            json={"title": title, "description": "Course with modules"}
+        ).json()["id"]
+        client.put(f"/courses/{course_id}", headers=trainer_headers, json={"status": "published"})
+        db_session.add(Module(course_id=course_id, title="Module 1", order_index=1))
+        db_session.commit()
+        client.post(f"/courses/{course_id}/enroll", headers=auth_headers)
+    
+    create_published_course("Eager Course 1")
+    
+    sql_queries.clear()
+    client.get("/courses/")
+    course_queries = len(sql_queries)
+    
+    sql_queries.clear()
+    response = client.get("/courses/my/enrollments", headers=auth_headers)
+    enrollment_queries = len(sql_queries)
+    assert response.json()[-1]["course"]["modules"][0]["title"] == "Module 1"
+    
+    for i in range(2, 5):
+        create_published_course(f"Eager Course {i}")
+    
+    sql_queries.clear()
+    response = client.get("/courses/")
+    assert len(sql_queries) == course_queries
+    assert all("modules" in course for course in response.json())
+    
+    sql_queries.clear()
+    client.get("/courses/my/enrollments", headers=auth_headers)
+    assert len(sql_queries) == enrollment_queries
+
+def test_course_list_defers_description(client: TestClient, trainer_headers, sql_queries):
+    """Test that the catalog list omits the long description but the detail includes it"""
+    course_id = client.post("/courses/", 
+        headers=trainer_headers,
+        json={"title": "Deferred Course", "description": "Long description " * 100}
+    ).json()["id"]
+    client.put(f"/courses/{course_id}", headers=trainer_headers, json={"status": "published"})
+    
+    sql_queries.clear()
+    response = client.get("/courses/")
+    
+    assert response.status_code == 200
+    assert all("description" not in course for course in response.json())
+    assert not any("courses.description" in statement for statement in sql_queries)
+    
+    response = client.get(f"/courses/{course_id}")
+    
+    assert response.status_code == 200
+    assert response.json()["description"].startswith("Long description")
+
+def test_course_cursor_pagination(client: TestClient, trainer_headers):
+    """Test walking the course catalog with next_cursor"""
+    for i in range(3):
+        course_id = client.post("/courses/", 
+            headers=trainer_headers,
+            json={"title": f"Paged Course {i}"}
+        ).json()["id"]
+        client.put(f"/courses/{course_id}", headers=trainer_headers, json={"status": "published"})
+    
+    expected_ids = sorted(course["id"] for course in client.get("/courses/?limit=1000").json())
+    
+    seen_ids = []
+    cursor = ""
+    while cursor is not None:
+        response = client.get("/courses/", params={"cursor": cursor, "limit": 2})
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page["items"]) <= 2
+        seen_ids.extend(course["id"] for course in page["items"])
+        cursor = page["next_cursor"]
+    
+    assert seen_ids == expected_ids
+
+def test_invalid_cursor(client: TestClient):
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/courses/", params={"cursor": "not-a-cursor"})
+    
+    assert response.status_code == 400
@@ -0,0 +1,60 @@
+"""
+Test the Lambda entry points
+"""
+
+def test_lambda_cold_import_is_lazy(tmp_path):
+    """Test that the Lambda entry point defers the app and each router by default and preloads only on opt-in"""
+    import os
+    import subprocess
+    import sys
+    
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probe = (
+        "import sys, lambda_handler\n"
+        "from replay_lambda_events import LambdaContext, make_event\n"
+        "assert not {'app.main', 'sqlalchemy', 'fastapi'} & set(sys.modules)\n"
+        "handler = lambda_handler.get_handler()\n"
+        "assert lambda_handler.get_handler() is handler\n"
+        "assert handler(make_event(1, 'GET', '/health', {}, None), LambdaContext())['statusCode'] == 200\n"
+        "assert not [m for m in sys.modules if m.startswith('app.api.')]\n"
+        "assert handler(make_event(1, 'GET', '/auth/me', {}, None), LambdaContext())['statusCode'] in (401, 403)\n"
+        "print(sorted(m for m in ('jose', 'passlib', 'mangum', 'app.api.auth', 'app.api.assignments') if m in sys.modules))\n"
+    )
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path}/cold.sqlite",
+        "ALLOWED_ORIGINS": "http://localhost:3000",
+        "PYTHONPATH": backend_dir,
+    }
+    env.pop("LAMBDA_PRELOAD_APP", None)
+    result = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, cwd=tmp_path, env=env
+    )
+    
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['app.api.auth', 'mangum']"
+    assert not (tmp_path / "uploads").exists()
+    
+    # opting in builds the app and every router during the init phase
+    result = subprocess.run(
+        [sys.executable, "-c", "import sys, lambda_handler\nprint(sorted(m for m in sys.modules if m.startswith('app.api.')))"],
+        capture_output=True, text=True, cwd=tmp_path, env={**env, "LAMBDA_PRELOAD_APP": "true"}
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str([f"app.api.{name}" for name in sorted(
+        ("assignments", "auth", "courses", "files", "storage", "users")
+    )])
+    
+    # no credentials are baked in: a function without its configuration fails at init
+    for module in ("lambda_handler", "full_handler", "auto_setup_handler"):
+        env.pop("DATABASE_URL")
+        result = subprocess.run(
+            [sys.executable, "-c", f"import {module}"], capture_output=True, text=True, cwd=tmp_path, env=env
+        )
+        env["DATABASE_URL"] = f"sqlite:///{tmp_path}/cold.sqlite"
+        assert result.returncode != 0
+        assert "Missing Lambda environment variables: DATABASE_URL" in result.stderr
+    result = subprocess.run(
+        [sys.executable, "-c", "import auto_setup_handler"], capture_output=True, text=True, cwd=tmp_path, env=env
+    )
+    assert "BOOTSTRAP_ADMIN_EMAIL, BOOTSTRAP_ADMIN_PASSWORD_HASH" in result.stderr